@@ -6,6 +6,7 @@ import os.path
 import platform
 import shutil
 import sys
+import time
 import webbrowser as wb
 from functools import partial
 
@@ -22,10 +23,14 @@ from libs.settings import Settings
 from libs.shape import Shape, DEFAULT_LINE_COLOR, DEFAULT_FILL_COLOR
 from libs.stringBundle import StringBundle
 from libs.canvas import Canvas
+from libs.scene_canvas import SceneCanvas
 from libs.zoomWidget import ZoomWidget
 from libs.lightWidget import LightWidget
+from libs.adjustmentDialog import AdjustmentDialog
+from libs.image_adjust import adjustment_available
 from libs.labelDialog import LabelDialog
 from libs.colorDialog import ColorDialog
+from libs.annotation import Annotation
 from libs.labelFile import LabelFile, LabelFileError, LabelFileFormat
 from libs.toolBar import ToolBar
 from libs.pascal_voc_io import PascalVocReader
@@ -34,6 +39,10 @@ from libs.yolo_io import YoloReader
 from libs.yolo_io import TXT_EXT
 from libs.create_ml_io import CreateMLReader
 from libs.create_ml_io import JSON_EXT
+from libs.binary_io import BIN_EXT, BinaryReader
+from libs.coco_io import CocoReader, coco_path, is_coco_file
+from libs.project_db import DB_EXT, ProjectDatabase, ProjectDatabaseReader, project_db_path
+from libs.wal_store import WriteAheadLogStore
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
 
@@ -61,7 +70,8 @@ class LabelImgWidget(QWidget):
     """
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = list(range(3))
 
-    def __init__(self, default_filename=None, default_prefdef_class_file=None, default_save_dir=None, parent=None):
+    def __init__(self, default_filename=None, default_prefdef_class_file=None, default_save_dir=None, parent=None,
+                 canvas_engine=None):
         super(LabelImgWidget, self).__init__(parent)
         self.setWindowTitle(__appname__)
 
@@ -143,7 +153,8 @@ class LabelImgWidget(QWidget):
         self.label_list = QListWidget()
         self.label_list.itemActivated.connect(self.label_selection_changed)
         self.label_list.itemSelectionChanged.connect(self.label_selection_changed)
-        #self.label_list.itemDoubleClicked.connect(self.edit_label)
+        self.label_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.label_list.itemDoubleClicked.connect(self.edit_label)
         self.label_list.itemChanged.connect(self.label_item_changed)
 
         # Layout para la parte de etiquetado (labels)
@@ -190,16 +201,25 @@ class LabelImgWidget(QWidget):
         self.zoom_widget = ZoomWidget()
         self.light_widget = LightWidget(get_str('lightWidgetTitle'))
         self.color_dialog = ColorDialog(parent=self)
+        self.adjustment_dialog = AdjustmentDialog(parent=self, string_bundle=self.string_bundle)
+        self.adjustment_dialog.adjustmentChanged.connect(self.set_adjustment)
 
         # Canvas (área de dibujo)
-        self.canvas = Canvas(parent=self)
+        if canvas_engine is None:
+            canvas_engine = settings.get(SETTING_CANVAS_ENGINE, CANVAS_ENGINE_WIDGET)
+        if canvas_engine == CANVAS_ENGINE_SCENE:
+            # The graphics view scrolls by itself.
+            self.canvas = SceneCanvas(parent=self)
+            scroll = self.canvas
+        else:
+            self.canvas = Canvas(parent=self)
+            scroll = QScrollArea()
+            scroll.setWidget(self.canvas)
+            scroll.setWidgetResizable(True)
         self.canvas.zoomRequest.connect(self.zoom_request)
         self.canvas.lightRequest.connect(self.light_request)
         self.canvas.set_drawing_shape_to_square(settings.get(SETTING_DRAW_SQUARE, False))
 
-        scroll = QScrollArea()
-        scroll.setWidget(self.canvas)
-        scroll.setWidgetResizable(True)
         self.scroll_bars = {
             Qt.Vertical: scroll.verticalScrollBar(),
             Qt.Horizontal: scroll.horizontalScrollBar()
@@ -248,10 +268,13 @@ class LabelImgWidget(QWidget):
             self.default_save_dir = save_dir
             self.status("Annotation will be saved to %s" % self.default_save_dir)
 
-        Shape.line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
-        Shape.fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
+        Shape.default_line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
+        Shape.default_fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
         self.canvas.set_drawing_color(self.line_color)
-        Shape.difficult = self.difficult
+        # Level of detail thresholds, in screen pixels.
+        Shape.min_vertex_size = int(settings.get(SETTING_MIN_VERTEX_SIZE, Shape.min_vertex_size))
+        Shape.min_label_size = int(settings.get(SETTING_MIN_LABEL_SIZE, Shape.min_label_size))
+        Shape.min_outline_size = int(settings.get(SETTING_MIN_OUTLINE_SIZE, Shape.min_outline_size))
 
         def xbool(x):
             return bool(x)
@@ -379,11 +402,20 @@ class LabelImgWidget(QWidget):
                                   'Ctrl+Shift+=', 'light_reset', get_str('lightresetDetail'),
                                   checkable=True, enabled=False)
         light_org_action.setChecked(True)
+        adjust_image_action = action(get_str('adjustImage'), self.adjustment_dialog.show,
+                                     'Ctrl+Shift+J', None, get_str('adjustImageDetail'),
+                                     enabled=adjustment_available())
+
+        frame_stats_action = action(get_str('frameStats'), self.toggle_frame_stats,
+                                    'Ctrl+Shift+H', None, get_str('frameStatsDetail'),
+                                    checkable=True, enabled=hasattr(self.canvas, 'set_hud'))
+        save_frame_stats_action = action(get_str('saveFrameStats'), self.save_frame_stats,
+                                         None, None, get_str('saveFrameStatsDetail'), enabled=False)
 
-        """ edit_action = action(get_str('editLabel'), self.edit_label,
+        edit_action = action(get_str('editLabel'), self.edit_label,
                              'Ctrl+E', 'edit', get_str('editLabelDetail'),
-                             enabled=False) """
-        #self.edit_button.setDefaultAction(edit_action)
+                             enabled=False)
+        self.edit_button.setDefaultAction(edit_action)
 
         shape_line_color_action = action(get_str('shapeLineColor'), self.choose_shape_line_color,
                                          icon='color_line', tip=get_str('shapeLineColorDetail'),
@@ -443,6 +475,9 @@ class LabelImgWidget(QWidget):
             lightBrighten=light_brighten_action,
             lightDarken=light_darken_action,
             lightOrg=light_org_action,
+            adjustImage=adjust_image_action,
+            frameStats=frame_stats_action,
+            saveFrameStats=save_frame_stats_action,
             onShapesPresent=[],  # Se llenará luego
         )
 
@@ -490,7 +525,11 @@ class LabelImgWidget(QWidget):
             None,
             self.actions.lightBrighten,
             self.actions.lightDarken,
-            self.actions.lightOrg
+            self.actions.lightOrg,
+            adjust_image_action,
+            None,
+            frame_stats_action,
+            save_frame_stats_action
         ))
 
         # Menú "Ayuda"
@@ -576,7 +615,12 @@ class LabelImgWidget(QWidget):
         settings[SETTING_PAINT_LABEL] = self.display_label_option.isChecked()
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_LABEL_FILE_FORMAT] = self.label_file_format
+        settings[SETTING_MIN_VERTEX_SIZE] = Shape.min_vertex_size
+        settings[SETTING_MIN_LABEL_SIZE] = Shape.min_label_size
+        settings[SETTING_MIN_OUTLINE_SIZE] = Shape.min_outline_size
         settings.save()
+        WriteAheadLogStore.close_all()
+        ProjectDatabase.close_all()
 
         super(LabelImgWidget, self).close()
 
@@ -623,7 +667,10 @@ class LabelImgWidget(QWidget):
             if isinstance(self.image_data, QImage):
                 image = self.image_data
             else:
+                start = time.perf_counter()
                 image = QImage.fromData(self.image_data)
+                if getattr(self.canvas, 'stats', None) is not None:
+                    self.canvas.stats.add_decode(time.perf_counter() - start)
 
             if image.isNull():
                 self.error_message(u'Error opening file',
@@ -660,22 +707,40 @@ class LabelImgWidget(QWidget):
             xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
             txt_path = os.path.join(self.default_save_dir, basename + TXT_EXT)
             json_path = os.path.join(self.default_save_dir, basename + JSON_EXT)
+            bin_path = os.path.join(self.default_save_dir, basename + BIN_EXT)
+            instances_path = coco_path(self.default_save_dir)
+            db_path = project_db_path(self.default_save_dir)
             if os.path.isfile(xml_path):
                 self.load_pascal_xml_by_filename(xml_path)
             elif os.path.isfile(txt_path):
                 self.load_yolo_txt_by_filename(txt_path)
             elif os.path.isfile(json_path):
                 self.load_create_ml_json_by_filename(json_path, file_path)
+            elif os.path.isfile(bin_path):
+                self.load_binary_by_filename(bin_path)
+            elif os.path.isfile(instances_path):
+                self.load_coco_json_by_filename(instances_path, file_path)
+            elif os.path.isfile(db_path):
+                self.load_project_db_by_filename(db_path, file_path)
         else:
             xml_path = os.path.splitext(file_path)[0] + XML_EXT
             txt_path = os.path.splitext(file_path)[0] + TXT_EXT
             json_path = os.path.splitext(file_path)[0] + JSON_EXT
+            bin_path = os.path.splitext(file_path)[0] + BIN_EXT
+            instances_path = coco_path(os.path.dirname(file_path))
+            db_path = project_db_path(os.path.dirname(file_path))
             if os.path.isfile(xml_path):
                 self.load_pascal_xml_by_filename(xml_path)
             elif os.path.isfile(txt_path):
                 self.load_yolo_txt_by_filename(txt_path)
             elif os.path.isfile(json_path):
                 self.load_create_ml_json_by_filename(json_path, file_path)
+            elif os.path.isfile(bin_path):
+                self.load_binary_by_filename(bin_path)
+            elif os.path.isfile(instances_path):
+                self.load_coco_json_by_filename(instances_path, file_path)
+            elif os.path.isfile(db_path):
+                self.load_project_db_by_filename(db_path, file_path)
 
     def scan_all_images(self, folder_path):
         extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
@@ -867,6 +932,10 @@ class LabelImgWidget(QWidget):
     def light_request(self, delta):
         self.add_light(5 * delta // (8 * 15))
 
+    def set_adjustment(self, adjustment):
+        self.canvas.adjustment = adjustment
+        self.canvas.update()
+
     def set_fit_window(self, value=True):
         if value:
             self.actions.fitWidth.setChecked(False)
@@ -908,7 +977,7 @@ class LabelImgWidget(QWidget):
     def paint_canvas(self):
         if self.image.isNull():
             return
-        self.canvas.scale = 0.01 * self.zoom_widget.value()
+        self.canvas.set_scale(0.01 * self.zoom_widget.value())
         self.canvas.overlay_color = self.light_widget.color()
         self.canvas.label_font_size = int(0.02 * max(self.image.width(), self.image.height()))
         self.canvas.adjustSize()
@@ -929,11 +998,15 @@ class LabelImgWidget(QWidget):
         if self._no_selection_slot:
             self._no_selection_slot = False
         else:
-            shape = self.canvas.selected_shape
-            if shape:
+            # Mirror the whole selection in one go, without echoing it back
+            # to the canvas item by item.
+            self.label_list.blockSignals(True)
+            self.label_list.clearSelection()
+            for shape in self.canvas.selected_shapes:
                 self.shapes_to_items[shape].setSelected(True)
-            else:
-                self.label_list.clearSelection()
+            self.label_list.blockSignals(False)
+            if self.canvas.selected_shape:
+                self.show_difficult(self.canvas.selected_shape)
         self.actions.delete.setEnabled(selected)
         self.actions.copy.setEnabled(selected)
         self.actions.edit.setEnabled(selected)
@@ -941,49 +1014,53 @@ class LabelImgWidget(QWidget):
         self.actions.shapeFillColor.setEnabled(selected)
 
     def add_label(self, shape):
-        shape.paint_label = self.display_label_option.isChecked()
-        item = HashableQListWidgetItem(shape.label)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
-        self.items_to_shapes[item] = shape
-        self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
-        for action in self.actions.onShapesPresent:
-            action.setEnabled(True)
+        self.add_labels([shape])
+
+    def add_labels(self, shapes, colors=None):
+        """Add list items for shapes, refreshing the label filter once at the end."""
+        colors = {} if colors is None else colors
+        paint_label = self.display_label_option.isChecked()
+        for shape in shapes:
+            shape.paint_label = paint_label
+            item = HashableQListWidgetItem(shape.label)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            if shape.label not in colors:
+                colors[shape.label] = generate_color_by_text(shape.label)
+            item.setBackground(colors[shape.label])
+            self.items_to_shapes[item] = shape
+            self.shapes_to_items[shape] = item
+            self.label_list.addItem(item)
+        if shapes:
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(True)
         self.update_combo_box()
 
     def remove_label(self, shape):
-        if shape is None:
-            return
-        item = self.shapes_to_items[shape]
-        self.label_list.takeItem(self.label_list.row(item))
-        del self.shapes_to_items[shape]
-        del self.items_to_shapes[item]
+        if shape is not None:
+            self.remove_labels([shape])
+
+    def remove_labels(self, shapes):
+        for shape in shapes:
+            item = self.shapes_to_items.pop(shape)
+            self.label_list.takeItem(self.label_list.row(item))
+            del self.items_to_shapes[item]
         self.update_combo_box()
 
     def load_labels(self, shapes):
-        s = []
-        for label, points, line_color, fill_color, difficult in shapes:
-            shape = Shape(label=label)
-            for x, y in points:
-                x, y, snapped = self.canvas.snap_point_to_canvas(x, y)
-                if snapped:
-                    self.set_dirty()
-                shape.add_point(QPointF(x, y))
-            shape.difficult = difficult
-            shape.close()
-            s.append(shape)
-            if line_color:
-                shape.line_color = QColor(*line_color)
-            else:
-                shape.line_color = generate_color_by_text(label)
-            if fill_color:
-                shape.fill_color = QColor(*fill_color)
-            else:
-                shape.fill_color = generate_color_by_text(label)
-            self.add_label(shape)
-        self.canvas.load_shapes(s)
+        shapes = list(shapes)
+        loaded, snapped = self.canvas.load_boxes([(label, points, difficult)
+                                                  for label, points, _, _, difficult in shapes])
+        if snapped:
+            self.set_dirty()
+        # One colour per label text rather than a hash per shape.
+        colors = {}
+        for shape, (label, _, line_color, fill_color, _) in zip(loaded, shapes):
+            if label not in colors:
+                colors[label] = generate_color_by_text(label)
+            shape.line_color = QColor(*line_color) if line_color else colors[label]
+            shape.fill_color = QColor(*fill_color) if fill_color else colors[label]
+        self.add_labels(loaded, colors)
 
     def update_combo_box(self):
         items_text_list = [str(self.label_list.item(i).text()) for i in range(self.label_list.count())]
@@ -998,14 +1075,7 @@ class LabelImgWidget(QWidget):
             self.label_file = LabelFile()
             self.label_file.verified = self.canvas.verified
 
-        def format_shape(s):
-            return dict(label=s.label,
-                        line_color=s.line_color.getRgb(),
-                        fill_color=s.fill_color.getRgb(),
-                        points=[(p.x(), p.y()) for p in s.points],
-                        difficult=s.difficult)
-
-        shapes = [format_shape(shape) for shape in self.canvas.shapes]
+        shapes = Annotation.from_shapes(self.canvas.shapes)
         try:
             if self.label_file_format == LabelFileFormat.PASCAL_VOC:
                 if annotation_file_path[-4:].lower() != ".xml":
@@ -1028,6 +1098,27 @@ class LabelImgWidget(QWidget):
                     annotation_file_path, shapes, self.file_path, self.image_data,
                     self.label_hist, self.line_color.getRgb(), self.fill_color.getRgb()
                 )
+            elif self.label_file_format == LabelFileFormat.BINARY:
+                if annotation_file_path[-5:].lower() != BIN_EXT:
+                    annotation_file_path += BIN_EXT
+                self.label_file.save_binary_format(
+                    annotation_file_path, shapes, self.file_path, self.image_data,
+                    self.line_color.getRgb(), self.fill_color.getRgb()
+                )
+            elif self.label_file_format == LabelFileFormat.COCO:
+                # Every image of the folder shares one instances file.
+                annotation_file_path = coco_path(os.path.dirname(annotation_file_path))
+                self.label_file.save_coco_format(
+                    annotation_file_path, shapes, self.file_path, self.image_data,
+                    self.label_hist, self.line_color.getRgb(), self.fill_color.getRgb()
+                )
+            elif self.label_file_format == LabelFileFormat.PROJECT_DB:
+                # Every image of the folder is stored in one project database.
+                annotation_file_path = project_db_path(os.path.dirname(annotation_file_path))
+                self.label_file.save_project_db_format(
+                    annotation_file_path, shapes, self.file_path, self.image_data,
+                    self.label_hist, self.line_color.getRgb(), self.fill_color.getRgb()
+                )
             else:
                 self.label_file.save(
                     annotation_file_path, shapes, self.file_path, self.image_data,
@@ -1078,12 +1169,23 @@ class LabelImgWidget(QWidget):
         return None
 
     def label_selection_changed(self):
-        item = self.current_item()
-        if item and self.canvas.editing():
+        items = self.label_list.selectedItems()
+        if items and self.canvas.editing():
             self._no_selection_slot = True
-            self.canvas.select_shape(self.items_to_shapes[item])
-            shape = self.items_to_shapes[item]
-            self.diffc_button.setChecked(shape.difficult)
+            # The current item goes last, making it the canvas' selected_shape.
+            current = self.label_list.currentItem()
+            if current in items:
+                items.remove(current)
+                items.append(current)
+            shapes = [self.items_to_shapes[item] for item in items]
+            self.canvas.select_shapes(shapes)
+            self.show_difficult(shapes[-1])
+
+    def show_difficult(self, shape):
+        # Only reflect the flag; button_state would write it to the first selected item.
+        self.diffc_button.blockSignals(True)
+        self.diffc_button.setChecked(shape.difficult)
+        self.diffc_button.blockSignals(False)
 
     def label_item_changed(self, item):
         shape = self.items_to_shapes[item]
@@ -1092,6 +1194,7 @@ class LabelImgWidget(QWidget):
             shape.label = label
             shape.line_color = generate_color_by_text(shape.label)
             self.set_dirty()
+            self.canvas.update()
         else:
             self.canvas.set_shape_visible(shape, item.checkState() == Qt.Checked)
 
@@ -1160,12 +1263,37 @@ class LabelImgWidget(QWidget):
         else:
             pass
 
+    def edit_label(self, _item=None):
+        """Relabel every selected shape as one change to the label list."""
+        shapes = self.canvas.selected_shapes
+        if not self.canvas.editing() or not shapes:
+            return
+        text = self.label_dialog.pop_up(shapes[-1].label)
+        if text is None:
+            return
+        color = generate_color_by_text(text)
+        # itemChanged would otherwise relabel the shapes one by one.
+        self.label_list.blockSignals(True)
+        for shape in shapes:
+            shape.label = text
+            shape.line_color = color
+            shape.fill_color = color
+            item = self.shapes_to_items[shape]
+            item.setText(text)
+            item.setBackground(color)
+        self.label_list.blockSignals(False)
+        self.update_combo_box()
+        self.canvas.update()
+        self.set_dirty()
+        if text not in self.label_hist:
+            self.label_hist.append(text)
+
     def copy_selected_shape(self):
         self.add_label(self.canvas.copy_selected_shape())
         self.shape_selection_changed(True)
 
     def delete_selected_shape(self):
-        self.remove_label(self.canvas.delete_selected())
+        self.remove_labels(self.canvas.delete_selected())
         self.set_dirty()
         if self.no_shapes():
             for action in self.actions.onShapesPresent:
@@ -1176,7 +1304,7 @@ class LabelImgWidget(QWidget):
                                            default=DEFAULT_LINE_COLOR)
         if color:
             self.line_color = color
-            Shape.line_color = color
+            Shape.default_line_color = color
             self.canvas.set_drawing_color(color)
             self.canvas.update()
             self.set_dirty()
@@ -1305,6 +1433,39 @@ class LabelImgWidget(QWidget):
         self.load_labels(shapes)
         self.canvas.verified = create_ml_parse_reader.verified
 
+    def load_binary_by_filename(self, bin_path):
+        if self.file_path is None:
+            return
+        if not os.path.isfile(bin_path):
+            return
+        self.set_format(FORMAT_BINARY)
+        binary_parse_reader = BinaryReader(bin_path)
+        shapes = binary_parse_reader.get_shapes()
+        self.load_labels(shapes)
+        self.canvas.verified = binary_parse_reader.verified
+
+    def load_coco_json_by_filename(self, json_path, file_path):
+        if self.file_path is None:
+            return
+        if not os.path.isfile(json_path) or not is_coco_file(json_path):
+            return
+        self.set_format(FORMAT_COCO)
+        coco_parse_reader = CocoReader(json_path, file_path)
+        shapes = coco_parse_reader.get_shapes()
+        self.load_labels(shapes)
+        self.canvas.verified = coco_parse_reader.verified
+
+    def load_project_db_by_filename(self, db_path, file_path):
+        if self.file_path is None:
+            return
+        if not os.path.isfile(db_path) or file_path not in ProjectDatabase.open(db_path):
+            return
+        self.set_format(FORMAT_PROJECTDB)
+        project_db_parse_reader = ProjectDatabaseReader(db_path, file_path)
+        shapes = project_db_parse_reader.get_shapes()
+        self.load_labels(shapes)
+        self.canvas.verified = project_db_parse_reader.verified
+
     def set_format(self, save_format):
         if save_format == FORMAT_PASCALVOC:
             self.label_file_format = LabelFileFormat.PASCAL_VOC
@@ -1315,6 +1476,15 @@ class LabelImgWidget(QWidget):
         elif save_format == FORMAT_CREATEML:
             self.label_file_format = LabelFileFormat.CREATE_ML
             LabelFile.suffix = JSON_EXT
+        elif save_format == FORMAT_COCO:
+            self.label_file_format = LabelFileFormat.COCO
+            LabelFile.suffix = JSON_EXT
+        elif save_format == FORMAT_PROJECTDB:
+            self.label_file_format = LabelFileFormat.PROJECT_DB
+            LabelFile.suffix = DB_EXT
+        elif save_format == FORMAT_BINARY:
+            self.label_file_format = LabelFileFormat.BINARY
+            LabelFile.suffix = BIN_EXT
         else:
             raise ValueError('Unknown label file format.')
         self.set_dirty()
@@ -1358,6 +1528,20 @@ class LabelImgWidget(QWidget):
             shape.paint_label = self.display_label_option.isChecked()
         self.canvas.update()
 
+    def toggle_frame_stats(self, value):
+        self.canvas.set_hud(value)
+        self.actions.saveFrameStats.setEnabled(value)
+
+    def save_frame_stats(self, _value=False):
+        if self.canvas.stats is None:
+            return
+        path = os.path.join(os.path.dirname(self.file_path) if self.file_path else '.', 'frame_stats.json')
+        path, _ = QFileDialog.getSaveFileName(self, '%s - Save Frame Stats' % __appname__, path, 'JSON (*.json)')
+        if path:
+            path = ustr(path)
+            self.canvas.stats.dump(path)
+            self.status('Saved frame stats to %s' % path)
+
     def toggle_draw_square(self):
         self.canvas.set_drawing_shape_to_square(self.draw_squares_option.isChecked())
 
@@ -1402,7 +1586,11 @@ def add_actions(widget, actions):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    widget = LabelImgWidget()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--canvas-engine', choices=[CANVAS_ENGINE_WIDGET, CANVAS_ENGINE_SCENE],
+                        help='canvas implementation; defaults to the saved setting, else %s' % CANVAS_ENGINE_WIDGET)
+    args = parser.parse_args(app.arguments()[1:])
+    widget = LabelImgWidget(canvas_engine=args.canvas_engine)
     widget.show()
     sys.exit(app.exec())
 # -----------------------------------------------------------------------------
@@ -0,0 +1,96 @@
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+from libs.image_adjust import Adjustment
+from libs.stringBundle import StringBundle
+
+BB = QDialogButtonBox
+
+
+class AdjustmentDialog(QDialog):
+    """
+    Non-modal brightness, contrast, gamma and per-channel levels controls.
+    ``adjustmentChanged`` is emitted with the new Adjustment on every edit.
+    """
+    adjustmentChanged = Signal(object)
+
+    CHANNELS = ('adjustRed', 'adjustGreen', 'adjustBlue')
+
+    def __init__(self, parent=None, string_bundle=None):
+        super(AdjustmentDialog, self).__init__(parent)
+        string_bundle = string_bundle or StringBundle.get_bundle()
+        get_str = string_bundle.get_string
+        self.setWindowTitle(get_str('adjustImageTitle'))
+
+        self.brightness = self._slider()
+        self.contrast = self._slider()
+        self.gamma = QDoubleSpinBox()
+        self.gamma.setRange(0.1, 5.0)
+        self.gamma.setSingleStep(0.1)
+        self.gamma.setValue(1.0)
+        self.gamma.valueChanged.connect(self._changed)
+
+        form = QFormLayout()
+        form.addRow(get_str('adjustBrightness'), self.brightness)
+        form.addRow(get_str('adjustContrast'), self.contrast)
+        form.addRow(get_str('adjustGamma'), self.gamma)
+
+        levels = QGridLayout()
+        levels.addWidget(QLabel(get_str('adjustLevels')), 0, 0)
+        levels.addWidget(QLabel(get_str('adjustBlack')), 0, 1)
+        levels.addWidget(QLabel(get_str('adjustWhite')), 0, 2)
+        self.levels = []
+        for row, str_id in enumerate(self.CHANNELS, 1):
+            black, white = self._level(0), self._level(255)
+            levels.addWidget(QLabel(get_str(str_id)), row, 0)
+            levels.addWidget(black, row, 1)
+            levels.addWidget(white, row, 2)
+            self.levels.append((black, white))
+
+        self.button_box = bb = BB(BB.Reset | BB.Close, Qt.Horizontal, self)
+        bb.button(BB.Reset).clicked.connect(self.reset)
+        bb.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addLayout(levels)
+        layout.addWidget(bb)
+        self.setLayout(layout)
+
+    def _slider(self):
+        slider = QSlider(Qt.Horizontal)
+        slider.setRange(-100, 100)
+        slider.valueChanged.connect(self._changed)
+        return slider
+
+    def _level(self, value):
+        spin = QSpinBox()
+        spin.setRange(0, 255)
+        spin.setValue(value)
+        spin.valueChanged.connect(self._changed)
+        return spin
+
+    def adjustment(self):
+        # Contrast runs from a quarter to four times around the middle position.
+        return Adjustment(brightness=self.brightness.value() / 100.0,
+                          contrast=2.0 ** (self.contrast.value() / 50.0),
+                          gamma=self.gamma.value(),
+                          levels=[(black.value(), white.value()) for black, white in self.levels])
+
+    def reset(self):
+        widgets = [self.brightness, self.contrast, self.gamma] + [w for pair in self.levels for w in pair]
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.brightness.setValue(0)
+        self.contrast.setValue(0)
+        self.gamma.setValue(1.0)
+        for black, white in self.levels:
+            black.setValue(0)
+            white.setValue(255)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self._changed()
+
+    def _changed(self, _value=None):
+        self.adjustmentChanged.emit(self.adjustment())
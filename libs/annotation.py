@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from array import array
+
+
+class Annotation(object):
+    """
+    The boxes of one image, stored column-wise.
+
+    Labels are interned in ``labels`` and boxes are kept in flat typed arrays:
+    ``label_ids``, ``coords`` (x_min, y_min, x_max, y_max per box) and
+    ``difficult``. Every reader fills one and every writer consumes one, so
+    converting between formats does not build a dict or tuple per box.
+    """
+
+    def __init__(self, filename=None, img_size=None, verified=False, labels=None):
+        self.filename = filename
+        self.img_size = img_size
+        self.verified = verified
+        # A given label table (e.g. YOLO classes) keeps its indices as ids.
+        self.labels = list(labels or ())
+        self._label_index = {}
+        for label_id, label in enumerate(self.labels):
+            self._label_index.setdefault(label, label_id)
+        self.label_ids = array('i')
+        self.coords = array('d')
+        self.difficult = array('b')
+
+    def intern(self, label):
+        """Return the id of label, adding it to the label table if needed."""
+        label_id = self._label_index.get(label)
+        if label_id is None:
+            label_id = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def add_box(self, x_min, y_min, x_max, y_max, label, difficult=False):
+        self.add_box_id(x_min, y_min, x_max, y_max, self.intern(label), difficult)
+
+    def add_box_id(self, x_min, y_min, x_max, y_max, label_id, difficult=False):
+        self.label_ids.append(label_id)
+        self.coords.extend((x_min, y_min, x_max, y_max))
+        self.difficult.append(1 if difficult else 0)
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def label(self, i):
+        return self.labels[self.label_ids[i]]
+
+    def box(self, i):
+        return tuple(self.coords[4 * i:4 * i + 4])
+
+    def boxes(self):
+        """Iterate over (label, x_min, y_min, x_max, y_max, difficult) per box."""
+        labels = self.labels
+        coords = self.coords
+        for i, label_id in enumerate(self.label_ids):
+            j = 4 * i
+            yield labels[label_id], coords[j], coords[j + 1], coords[j + 2], coords[j + 3], bool(self.difficult[i])
+
+    def to_shapes(self):
+        """Return the boxes in the reader shape format used by the GUI."""
+        # shapes type:
+        # [label, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
+        return [(label, [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)], None, None, difficult)
+                for label, x_min, y_min, x_max, y_max, difficult in self.boxes()]
+
+    @classmethod
+    def from_shapes(cls, shapes, **kwargs):
+        """
+        Build an annotation from canvas shapes or from shape dicts with
+        'label', 'points' and optionally 'difficult' keys. Each shape becomes
+        the bounding box of its points. An annotation is returned as it is,
+        with the given attributes (filename, img_size, ...) set on it.
+        """
+        if isinstance(shapes, cls):
+            for name, value in kwargs.items():
+                setattr(shapes, name, value)
+            return shapes
+        annotation = cls(**kwargs)
+        for shape in shapes:
+            if isinstance(shape, dict):
+                label = shape['label']
+                points = shape['points']
+                difficult = shape.get('difficult', False)
+                xs = [p[0] for p in points]
+                ys = [p[1] for p in points]
+            else:
+                label = shape.label
+                difficult = shape.difficult
+                xs = [p.x() for p in shape.points]
+                ys = [p.y() for p in shape.points]
+            annotation.add_box(min(xs), min(ys), max(xs), max(ys), label, difficult)
+        return annotation
+
+
+def format_coord(value):
+    """Format a coordinate the way the writers always did for integer input."""
+    return str(int(value)) if value == int(value) else str(value)
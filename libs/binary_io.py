@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import struct
+import sys
+from array import array
+
+from libs.annotation import Annotation
+
+BIN_EXT = '.lbin'
+
+# Layout of a .lbin file, all little-endian:
+#   header      8s magic, I width, I height, B depth, B verified,
+#               H label count, I box count
+#   strings     H byte length + utf-8 bytes, for the file name and then
+#               every label
+#   label ids   H per box, index into the labels
+#   coords      d x_min, y_min, x_max, y_max per box
+#   difficult   b per box
+# The columns are the arrays of libs.annotation.Annotation, so reading and
+# writing is a handful of bulk copies whatever the number of boxes.
+BIN_MAGIC = b'LIMGBIN\x01'
+_HEADER = struct.Struct('<8sIIBBHI')
+_STRING_LENGTH = struct.Struct('<H')
+_SWAP = sys.byteorder != 'little'
+
+
+def _column(typecode, data, offset, count):
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    column.frombytes(data[offset:end])
+    if _SWAP:
+        column.byteswap()
+    return column, end
+
+
+def _column_bytes(column):
+    if _SWAP:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _string_bytes(text):
+    data = text.encode('utf-8')
+    return _STRING_LENGTH.pack(len(data)) + data
+
+
+def write_annotation(path, annotation):
+    height, width = annotation.img_size[0], annotation.img_size[1]
+    depth = annotation.img_size[2] if len(annotation.img_size) > 2 else 3
+    parts = [_HEADER.pack(BIN_MAGIC, width, height, depth, bool(annotation.verified),
+                          len(annotation.labels), len(annotation)),
+             _string_bytes(annotation.filename or '')]
+    parts.extend(_string_bytes(label) for label in annotation.labels)
+    parts.append(_column_bytes(array('H', annotation.label_ids)))
+    parts.append(_column_bytes(annotation.coords))
+    parts.append(_column_bytes(annotation.difficult))
+    with open(path, 'wb') as file:
+        file.write(b''.join(parts))
+
+
+def read_annotation(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, width, height, depth, verified, label_count, box_count = _HEADER.unpack_from(data)
+    if magic != BIN_MAGIC:
+        raise ValueError('Not a labelImg binary annotation: %s' % path)
+    offset = _HEADER.size
+    strings = []
+    for _ in range(label_count + 1):
+        length, = _STRING_LENGTH.unpack_from(data, offset)
+        offset += _STRING_LENGTH.size
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+    annotation = Annotation(strings[0] or None, [height, width, depth], bool(verified), strings[1:])
+    label_ids, offset = _column('H', data, offset, box_count)
+    annotation.label_ids = array('i', label_ids)
+    annotation.coords, offset = _column('d', data, offset, 4 * box_count)
+    annotation.difficult, offset = _column('b', data, offset, box_count)
+    return annotation
+
+
+class BinaryWriter:
+
+    def __init__(self, folder_name, filename, img_size, database_src='Unknown', local_img_path=None):
+        self.folder_name = folder_name
+        self.filename = filename
+        self.database_src = database_src
+        self.img_size = img_size
+        self.annotation = Annotation(filename, img_size)
+        self.local_img_path = local_img_path
+        self.verified = False
+
+    def add_bnd_box(self, x_min, y_min, x_max, y_max, name, difficult):
+        self.annotation.add_box(x_min, y_min, x_max, y_max, name, difficult)
+
+    def save(self, target_file=None):
+        if target_file is None:
+            target_file = self.filename + BIN_EXT
+        self.annotation.verified = self.verified
+        write_annotation(target_file, self.annotation)
+
+
+class BinaryReader:
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.annotation = read_annotation(file_path)
+        self.verified = self.annotation.verified
+
+    def get_annotation(self):
+        return self.annotation
+
+    def get_shapes(self):
+        return self.annotation.to_shapes()
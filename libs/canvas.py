@@ -1,9 +1,17 @@
 
 
+import time
+
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
+from libs.frame_stats import FrameStats, timed_event
+from libs.overlay_cache import OverlayCache
+from libs.scaled_pixmap_cache import ScaledPixmapCache
 from libs.shape import Shape
+from libs.shape_renderer import ShapeRenderer
+from libs.shape_store import ShapeStore
+from libs.status_throttle import StatusThrottle
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -29,9 +37,13 @@ class Canvas(QWidget):
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
-        self.shapes = []
+        # Columns of points, bounds, labels and flags behind the shapes,
+        # used for hit-testing and culling.
+        self.shapes = ShapeStore()
+        self.renderer = ShapeRenderer()
         self.current = None
-        self.selected_shape = None  # save the selected shape here
+        # The selection, in the order it was made; the last one is selected_shape.
+        self.selected_shapes = []
         self.selected_shape_copy = None
         self.drawing_line_color = QColor(0, 0, 255)
         self.drawing_rect_color = QColor(0, 0, 255)
@@ -40,9 +52,26 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.overlay_color = None
+        # Brightness, contrast, gamma and levels (libs.image_adjust.Adjustment).
+        self.adjustment = None
+        # Light-adjusted pixmaps, composited in the background.
+        self.overlay_cache = OverlayCache(self)
+        self.overlay_cache.ready.connect(self.update)
+        # The image smooth-scaled to the current zoom, rebuilt once zooming
+        # or scrolling settles.
+        self.scaled_cache = ScaledPixmapCache(self)
+        self.scaled_cache.ready.connect(self.update)
+        self._label_widths = {}
+        # Coordinate text and tooltips, coalesced across mouse moves.
+        self.status_throttle = StatusThrottle(self)
+        # Frame timings shown in the HUD; None while the HUD is off.
+        self.stats = None
+        self._hud_rect = QRect()
+        self._hud_timer = QTimer(self)
+        self._hud_timer.setInterval(250)
+        self._hud_timer.timeout.connect(self.update_hud)
         self.label_font_size = 8
         self.pixmap = QPixmap()
-        self.visible = {}
         self._hide_background = False
         self.hide_background = False
         self.h_shape = None
@@ -59,6 +88,16 @@ class Canvas(QWidget):
 
         # initialisation for panning
         self.pan_initial_pos = QPoint()
+        # Selection rectangle in image coordinates while it is dragged.
+        self.rubber_band = None
+
+    @property
+    def selected_shape(self):
+        return self.selected_shapes[-1] if self.selected_shapes else None
+
+    @selected_shape.setter
+    def selected_shape(self, shape):
+        self.selected_shapes = [] if shape is None else [shape]
 
     def set_drawing_color(self, qcolor):
         self.drawing_line_color = qcolor
@@ -74,7 +113,7 @@ class Canvas(QWidget):
         self.restore_cursor()
 
     def isVisible(self, shape):
-        return self.visible.get(shape, True)
+        return self.shapes.is_visible(shape)
 
     def drawing(self):
         return self.mode == self.CREATE
@@ -88,37 +127,52 @@ class Canvas(QWidget):
             self.un_highlight()
             self.de_select_shape()
         self.prev_point = QPointF()
-        self.repaint()
+        self.update()
 
     def un_highlight(self, shape=None):
         if shape == None or shape == self.h_shape:
             if self.h_shape:
                 self.h_shape.highlight_clear()
+                self.update_shape(self.h_shape)
             self.h_vertex = self.h_shape = None
 
+    def set_highlight(self, shape, vertex=None):
+        """Highlight shape, or one of its vertices, repainting only what changed."""
+        if shape is self.h_shape and vertex == self.h_vertex:
+            return
+        if self.h_shape is not None:
+            self.h_shape.highlight_clear()
+            self.update_shape(self.h_shape)
+        self.h_vertex, self.h_shape = vertex, shape
+        if shape is not None:
+            if vertex is not None:
+                shape.highlight_vertex(vertex, shape.MOVE_VERTEX)
+            self.update_shape(shape)
+
     def selected_vertex(self):
         return self.h_vertex is not None
 
     ## ============================================================================================
+    @timed_event
     def mouseMoveEvent(self, ev):
         """Update line with last point and current coordinates."""
         pos = self.transform_pos(ev.pos())
 
         # Update coordinates in status bar if image is opened
-        window = self.window()
-        if window.file_path is not None:
-            self.window().label_coordinates.setText(
-                'X: %d; Y: %d' % (pos.x(), pos.y())
-            )
+        if getattr(self.window(), 'file_path', None) is not None:
+            self.status_throttle.show('X: %d; Y: %d' % (pos.x(), pos.y()))
 
         # Polygon drawing
         if self.drawing():
             self.override_cursor(CURSOR_DRAW)
+            # Invalidate the rubber band and crosshair where they are now and
+            # where they are drawn next.
+            self.update_drawing_area()
             if self.current:
                 # Display annotation width and height while drawing
                 current_width = abs(self.current[0].x() - pos.x())
                 current_height = abs(self.current[0].y() - pos.y())
-                self.parent().window().label_coordinates.setText(
+                self.status_throttle.show(
                     'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
                 )
 
@@ -152,7 +206,11 @@ class Canvas(QWidget):
                 self.current.highlight_clear()
             else:
                 self.prev_point = pos
-            self.repaint()
+            self.update_drawing_area()
+            return
+
+        if self.rubber_band is not None:
+            self.update_rubber_band(pos)
             return
 
         # Polygon copy moving
@@ -160,10 +218,9 @@ class Canvas(QWidget):
             if self.selected_shape_copy and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
                 self.bounded_move_shape(self.selected_shape_copy, pos)
-                self.repaint()
             elif self.selected_shape:
                 self.selected_shape_copy = self.selected_shape.copy()
-                self.repaint()
+                self.update_shape(self.selected_shape_copy)
             return
 
         # Polygon/Vertex moving
@@ -171,92 +228,153 @@ class Canvas(QWidget):
             if self.selected_vertex():
                 self.bounded_move_vertex(pos)
                 self.shapeMoved.emit()
-                self.repaint()
 
                 # Display annotation width and height while moving vertex
                 point1 = self.h_shape[1]
                 point3 = self.h_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
+                self.status_throttle.show(
                     'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
                 )
             elif self.selected_shape and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
-                self.bounded_move_shape(self.selected_shape, pos)
+                self.bounded_move_shapes(self.selected_shapes, pos)
                 self.shapeMoved.emit()
-                self.repaint()
 
                 # Display annotation width and height while moving shape
                 point1 = self.selected_shape[1]
                 point3 = self.selected_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
+                self.status_throttle.show(
                     'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
                 )
             else:
                 # Pan
                 delta = ev.pos() - self.pan_initial_pos
+                # Scrolling repaints the newly exposed strips by itself.
                 self.scrollRequest.emit(delta.x(), Qt.Horizontal)
                 self.scrollRequest.emit(delta.y(), Qt.Vertical)
-                self.update()
             return
 
         # Hovering over the canvas
-        self.setToolTip("Image")
-        priority_list = self.shapes + ([self.selected_shape] if self.selected_shape else [])
-        for shape in reversed([s for s in priority_list if self.isVisible(s)]):
+        tip, status_tip = "Image", False
+        priority_list = self.shapes_at(pos, self.epsilon)
+        if self.selected_shape in priority_list:
+            priority_list.remove(self.selected_shape)
+            priority_list.insert(0, self.selected_shape)
+        for shape in priority_list:
             index = shape.nearest_vertex(pos, self.epsilon)
             if index is not None:
-                if self.selected_vertex():
-                    self.h_shape.highlight_clear()
-                self.h_vertex, self.h_shape = index, shape
-                shape.highlight_vertex(index, shape.MOVE_VERTEX)
+                self.set_highlight(shape, index)
                 self.override_cursor(CURSOR_POINT)
-                self.setToolTip("Click & drag to move point")
-                self.setStatusTip(self.toolTip())
-                self.update()
+                tip, status_tip = "Click & drag to move point", True
                 break
             elif shape.contains_point(pos):
-                if self.selected_vertex():
-                    self.h_shape.highlight_clear()
-                self.h_vertex, self.h_shape = None, shape
-                self.setToolTip(
-                    "Click & drag to move shape '%s'" % shape.label
-                )
-                self.setStatusTip(self.toolTip())
+                self.set_highlight(shape)
+                tip, status_tip = "Click & drag to move shape '%s'" % shape.label, True
                 self.override_cursor(CURSOR_GRAB)
-                self.update()
 
                 # Display annotation width and height while hovering
                 point1 = self.h_shape[1]
                 point3 = self.h_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
+                self.status_throttle.show(
                     'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
                 )
                 break
         else:
             # Clear highlights and reset state
-            if self.h_shape:
-                self.h_shape.highlight_clear()
-                self.update()
-            self.h_vertex, self.h_shape = None, None
+            self.set_highlight(None)
             self.override_cursor(CURSOR_DEFAULT)
+        self.status_throttle.set_tip(tip, status_tip)
 
     
     
     
     ## ============================================================================================
 
+    def shapes_at(self, pos, margin=0.0):
+        """Return the visible shapes whose bounding box grown by margin contains pos, topmost first."""
+        return self.shapes.query(pos.x(), pos.y(), margin)
+
+    def vertex_margin(self):
+        """How far, in image pixels, vertex markers and outlines reach beyond a shape's points."""
+        return (Shape.point_size * 2 + 2) / self.scale
+
+    def label_width(self, label):
+        key = (self.label_font_size, label)
+        width = self._label_widths.get(key)
+        if width is None:
+            font = Shape.label_font(self.label_font_size)
+            width = self._label_widths[key] = QFontMetricsF(font).horizontalAdvance(label or '')
+        return width
+
+    def shape_paint_rect(self, shape):
+        """Return the area, in image coordinates, that painting shape touches."""
+        margin = self.vertex_margin()
+        rect = shape.bounding_rect().adjusted(-margin, -margin, margin, margin)
+        if shape.paint_label:
+            # The label is drawn at the top-left point, pushed down when it
+            # would not fit above the image.
+            size = self.label_font_size * 2.5
+            top_left = shape.bounding_rect().topLeft()
+            rect = rect.united(QRectF(top_left.x(), top_left.y() - size,
+                                      self.label_width(shape.label), 2 * size))
+        return rect
+
+    def update_image_rect(self, rect):
+        """Schedule a repaint of rect, given in image coordinates."""
+        offset = self.offset_to_center()
+        s = self.scale
+        area = QRectF((rect.left() + offset.x()) * s, (rect.top() + offset.y()) * s,
+                      rect.width() * s, rect.height() * s)
+        self.update(area.toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def update_shape(self, shape):
+        if shape is not None and len(shape):
+            self.update_image_rect(self.shape_paint_rect(shape))
+
+    def shapes_paint_rect(self, shapes):
+        rect = QRectF()
+        for shape in shapes:
+            if len(shape):
+                rect = rect.united(self.shape_paint_rect(shape))
+        return rect
+
+    def update_shapes(self, shapes):
+        """Schedule one repaint covering all of shapes."""
+        rect = self.shapes_paint_rect(shapes)
+        if not rect.isEmpty():
+            self.update_image_rect(rect)
+
+    def update_drawing_area(self):
+        """Schedule a repaint of the shape being drawn, its rubber band and the crosshair."""
+        self.update_shape(self.current)
+        self.update_shape(self.line)
+        if not self.prev_point.isNull():
+            width, height = self.pixmap.width(), self.pixmap.height()
+            # paintEvent draws the crosshair at whole image pixels with a pen
+            # one image pixel wide, plus antialiasing on screen.
+            x, y = int(self.prev_point.x()), int(self.prev_point.y())
+            margin = 0.5 + 1 / self.scale
+            self.update_image_rect(QRectF(x - margin, 0, 2 * margin, height))
+            self.update_image_rect(QRectF(0, y - margin, width, 2 * margin))
+
+    @timed_event
     def mousePressEvent(self, ev):
         pos = self.transform_pos(ev.pos())
 
         if ev.button() == Qt.LeftButton:
             if self.drawing():
                 self.handle_drawing(pos)
+            elif ev.modifiers() & (Qt.ControlModifier | Qt.ShiftModifier):
+                # Add a shape to the selection or take it out, or drag a
+                # rectangle around the shapes to add.
+                if self.toggle_shape_point(pos) is None:
+                    self.rubber_band = QRectF(pos, pos)
             else:
                 selection = self.select_shape_point(pos)
                 self.prev_point = pos
@@ -269,8 +387,8 @@ class Canvas(QWidget):
         elif ev.button() == Qt.RightButton and self.editing():
             self.select_shape_point(pos)
             self.prev_point = pos
-        self.update()
 
+    @timed_event
     def mouseReleaseEvent(self, ev):
         if ev.button() == Qt.RightButton:
             menu = self.menus[bool(self.selected_shape_copy)]
@@ -278,8 +396,10 @@ class Canvas(QWidget):
             if not menu.exec_(self.mapToGlobal(ev.pos()))\
                and self.selected_shape_copy:
                 # Cancel the move by deleting the shadow copy.
+                self.update_shape(self.selected_shape_copy)
                 self.selected_shape_copy = None
-                self.repaint()
+        elif ev.button() == Qt.LeftButton and self.rubber_band is not None:
+            self.end_rubber_band()
         elif ev.button() == Qt.LeftButton and self.selected_shape:
             if self.selected_vertex():
                 self.override_cursor(CURSOR_POINT)
@@ -300,11 +420,14 @@ class Canvas(QWidget):
         # del shape.line_color
         if copy:
             self.shapes.append(shape)
-            self.selected_shape.selected = False
+            for selected in self.selected_shapes:
+                selected.selected = False
+            self.update_shapes(self.selected_shapes + [shape])
             self.selected_shape = shape
-            self.repaint()
         else:
-            self.selected_shape.points = [p for p in shape.points]
+            self.update_shape(self.selected_shape)
+            self.selected_shape.points = shape.points
+            self.update_shape(self.selected_shape)
         self.selected_shape_copy = None
 
     def hide_background_shapes(self, value):
@@ -313,7 +436,7 @@ class Canvas(QWidget):
             # Only hide other shapes if there is a current selection.
             # Otherwise the user will not be able to select a shape.
             self.set_hiding(True)
-            self.repaint()
+            self.update()
 
     def handle_drawing(self, pos):
         if self.current and self.current.reach_max_points() is False:
@@ -349,30 +472,78 @@ class Canvas(QWidget):
             self.finalise()
 
     def select_shape(self, shape):
-        self.de_select_shape()
-        shape.selected = True
-        self.selected_shape = shape
-        self.set_hiding()
-        self.selectionChanged.emit(True)
-        self.update()
+        self.select_shapes([shape])
+
+    def select_shapes(self, shapes):
+        """Make shapes the selection, with one selectionChanged and one repaint."""
+        previous = self.selected_shapes
+        for shape in previous:
+            shape.selected = False
+        for shape in shapes:
+            shape.selected = True
+        self.selected_shapes = list(shapes)
+        self.set_hiding(bool(shapes))
+        self.selectionChanged.emit(bool(shapes))
+        if self._hide_background:
+            self.update()
+        else:
+            self.update_shapes(previous + self.selected_shapes)
+
+    def toggle_shape_point(self, point):
+        """Add the topmost shape at point to the selection or take it out, and return it."""
+        for shape in self.shapes_at(point):
+            if shape.contains_point(point):
+                if shape.selected:
+                    self.select_shapes([s for s in self.selected_shapes if s is not shape])
+                else:
+                    self.select_shapes(self.selected_shapes + [shape])
+                return shape
+        return None
+
+    def update_rubber_band(self, pos):
+        self.update_image_rect(self.rubber_band.normalized())
+        self.rubber_band.setBottomRight(pos)
+        self.update_image_rect(self.rubber_band.normalized())
+
+    def end_rubber_band(self):
+        """Add the visible shapes lying wholly inside the rubber band to the selection."""
+        band = self.rubber_band.normalized()
+        self.rubber_band = None
+        self.update_image_rect(band)
+        shapes = [shape for shape in self.shapes.query_rect(band.left(), band.top(), band.right(), band.bottom())
+                  if not shape.selected and band.contains(shape.bounding_rect())]
+        if shapes:
+            self.select_shapes(self.selected_shapes + shapes)
 
     def select_shape_point(self, point):
         """Select the first shape created which contains this point."""
+        if len(self.selected_shapes) > 1 and not self.selected_vertex():
+            for shape in self.selected_shapes:
+                if shape.contains_point(point):
+                    # Keep the selection, to drag it as a group.
+                    self.calculate_offsets(self.selected_shapes, point)
+                    return shape
         self.de_select_shape()
         if self.selected_vertex():  # A vertex is marked for selection.
             index, shape = self.h_vertex, self.h_shape
             shape.highlight_vertex(index, shape.MOVE_VERTEX)
             self.select_shape(shape)
             return self.h_vertex
-        for shape in reversed(self.shapes):
-            if self.isVisible(shape) and shape.contains_point(point):
+        for shape in self.shapes_at(point):
+            if shape.contains_point(point):
                 self.select_shape(shape)
                 self.calculate_offsets(shape, point)
                 return self.selected_shape
         return None
 
     def calculate_offsets(self, shape, point):
-        rect = shape.bounding_rect()
+        """Measure from point to the bounding box of shape, or of a list of shapes."""
+        if isinstance(shape, list):
+            rect = QRectF()
+            for s in shape:
+                rect = rect.united(s.bounding_rect())
+        else:
+            rect = shape.bounding_rect()
         x1 = rect.x() - point.x()
         y1 = rect.y() - point.y()
         x2 = (rect.x() + rect.width()) - point.x()
@@ -396,6 +567,7 @@ class Canvas(QWidget):
     def bounded_move_vertex(self, pos):
         index, shape = self.h_vertex, self.h_shape
         point = shape[index]
+        self.update_shape(shape)
         if self.out_of_pixmap(pos):
             size = self.pixmap.size()
             clipped_x = min(max(0, pos.x()), size.width())
@@ -428,8 +600,13 @@ class Canvas(QWidget):
             right_shift = QPointF(0, shift_pos.y())
         shape.move_vertex_by(right_index, right_shift)
         shape.move_vertex_by(left_index, left_shift)
+        self.update_shape(shape)
 
     def bounded_move_shape(self, shape, pos):
+        return self.bounded_move_shapes([shape], pos)
+
+    def bounded_move_shapes(self, shapes, pos):
+        """Move shapes together with the cursor, keeping the box measured by calculate_offsets in the image."""
         if self.out_of_pixmap(pos):
             return False  # No need to move
         o1 = pos + self.offsets[0]
@@ -446,27 +623,45 @@ class Canvas(QWidget):
         # self.calculateOffsets(self.selectedShape, pos)
         dp = pos - self.prev_point
         if dp:
-            shape.move_by(dp)
+            rect = self.shapes_paint_rect(shapes)
+            self.move_shapes_by(shapes, dp)
+            self.update_image_rect(rect.united(rect.translated(dp)))
             self.prev_point = pos
             return True
         return False
 
+    def move_shapes_by(self, shapes, offset):
+        """Move shapes by offset, the ones on the canvas in a single pass over the store."""
+        self.shapes.move_rows([self.shapes.index(shape) for shape in shapes if shape in self.shapes],
+                              offset.x(), offset.y())
+        for shape in shapes:
+            if shape not in self.shapes:
+                shape.move_by(offset)
+
     def de_select_shape(self):
-        if self.selected_shape:
-            self.selected_shape.selected = False
-            self.selected_shape = None
+        if self.selected_shapes:
+            shapes = self.selected_shapes
+            for shape in shapes:
+                shape.selected = False
+            if self._hide_background:
+                self.update()
+            else:
+                self.update_shapes(shapes)
+            self.selected_shapes = []
             self.set_hiding(False)
             self.selectionChanged.emit(False)
-            self.update()
 
     def delete_selected(self):
-        if self.selected_shape:
-            shape = self.selected_shape
-            self.un_highlight(shape)
-            self.shapes.remove(self.selected_shape)
-            self.selected_shape = None
-            self.update()
-            return shape
+        """Remove the selected shapes from the canvas and return them."""
+        shapes = self.selected_shapes
+        if not shapes:
+            return []
+        if self.h_shape in shapes:
+            self.un_highlight()
+        self.shapes.remove_shapes(shapes)
+        self.selected_shapes = []
+        self.update_shapes(shapes)
+        return shapes
 
     def copy_selected_shape(self):
         if self.selected_shape:
@@ -476,6 +671,7 @@ class Canvas(QWidget):
             shape.selected = True
             self.selected_shape = shape
             self.bounded_shift_shape(shape)
+            self.update_shape(shape)
             return shape
 
     def bounded_shift_shape(self, shape):
@@ -491,6 +687,8 @@ class Canvas(QWidget):
     def paintEvent(self, event):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
+        if self.stats is not None:
+            start = time.perf_counter()
 
         p = self._painter
         p.begin(self)
@@ -501,26 +699,56 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        temp = self.pixmap
-        if self.overlay_color:
-            temp = QPixmap(self.pixmap)
-            painter = QPainter(temp)
-            painter.setCompositionMode(painter.CompositionMode_Overlay)
-            painter.fillRect(temp.rect(), self.overlay_color)
-            painter.end()
-
-        p.drawPixmap(0, 0, temp)
+        # Only the exposed part of the image and the shapes near it are painted.
+        exposed = QRectF(self.transform_pos(event.rect().topLeft()),
+                         self.transform_pos(event.rect().bottomRight() + QPoint(1, 1)))
+        temp = self.overlay_cache.pixmap(self.pixmap, self.overlay_color, self.adjustment)
+        offset = self.offset_to_center()
+        target = event.rect().intersected(self.image_area())
+        cached = None
+        if self.scale != 1.0 and not target.isEmpty():
+            cached = self.scaled_cache.pixmap(temp, self.scale, offset, target)
+            if cached is None:
+                self.scaled_cache.request(temp, self.scale, offset, self.scaled_cache_area())
+        if cached is not None:
+            scaled, area = cached
+            p.save()
+            p.resetTransform()
+            p.drawPixmap(target, scaled, target.translated(-area.topLeft()))
+            p.restore()
+        else:
+            source = exposed.adjusted(-1, -1, 1, 1).intersected(QRectF(temp.rect()))
+            if not source.isEmpty():
+                # Fast transform until the smooth rendering is cached.
+                p.setRenderHint(QPainter.SmoothPixmapTransform, False)
+                source = QRectF(source.toAlignedRect())
+                p.drawPixmap(source, temp, source)
+                p.setRenderHint(QPainter.SmoothPixmapTransform)
         Shape.scale = self.scale
         Shape.label_font_size = self.label_font_size
-        for shape in self.shapes:
-            if (shape.selected or not self._hide_background) and self.isVisible(shape):
+        margin = self.vertex_margin()
+        labels = self.shapes.painted_labels()
+        if labels:
+            # Labels reach outside the bounding box of their shape.
+            margin = max(margin, self.label_font_size * 2.5, max(map(self.label_width, labels)))
+        shapes = []
+        for shape in self.shapes.query_rect(exposed.left() - margin, exposed.top() - margin,
+                                            exposed.right() + margin, exposed.bottom() + margin):
+            if shape.selected or not self._hide_background:
                 shape.fill = shape.selected or shape == self.h_shape
-                shape.paint(p)
+                shapes.append(shape)
+        self.renderer.paint(p, shapes)
         if self.current:
             self.current.paint(p)
             self.line.paint(p)
         if self.selected_shape_copy:
             self.selected_shape_copy.paint(p)
+        if self.rubber_band is not None:
+            pen = QPen(QColor(0, 120, 215), 1, Qt.DashLine)
+            pen.setCosmetic(True)
+            p.setPen(pen)
+            p.setBrush(QColor(0, 120, 215, 40))
+            p.drawRect(self.rubber_band.normalized())
 
         # Paint rect
         if self.current is not None and len(self.line) == 2:
@@ -548,8 +776,70 @@ class Canvas(QWidget):
             pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
             self.setPalette(pal)
 
+        if self.stats is not None:
+            self.stats.add_paint(time.perf_counter() - start, len(shapes), len(self.shapes) - len(shapes))
+            self.paint_hud(p)
         p.end()
 
+    def set_scale(self, value):
+        """Set the zoom factor; call adjustSize and update afterwards."""
+        self.scale = value
+
+    def set_hud(self, enabled):
+        """Show or hide the frame-time HUD; timings are only taken while it is shown."""
+        if enabled == (self.stats is not None):
+            return
+        if enabled:
+            self.stats = FrameStats({'overlay': self.overlay_cache, 'scaled': self.scaled_cache})
+            self._hud_timer.start()
+        else:
+            self.stats = None
+            self._hud_timer.stop()
+        self.update()
+
+    def hud_rect(self, lines):
+        """Return the widget rectangle the HUD is drawn in, pinned to the visible top left."""
+        metrics = QFontMetrics(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        width = max(metrics.horizontalAdvance(line) for line in lines)
+        origin = self.visibleRegion().boundingRect().topLeft()
+        return QRect(origin, QSize(width + 12, metrics.height() * len(lines) + 8))
+
+    def update_hud(self):
+        # Also clear where the HUD was before the view scrolled.
+        rect = self.hud_rect(self.stats.hud_lines())
+        self.update(rect.united(self._hud_rect))
+        self._hud_rect = rect
+
+    def paint_hud(self, p):
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        metrics = QFontMetrics(font)
+        lines = self.stats.hud_lines()
+        rect = self.hud_rect(lines)
+        p.resetTransform()
+        p.setRenderHint(QPainter.Antialiasing, False)
+        p.fillRect(rect, QColor(0, 0, 0, 170))
+        p.setFont(font)
+        p.setPen(QColor(255, 255, 255))
+        y = rect.top() + 4 + metrics.ascent()
+        for line in lines:
+            p.drawText(rect.left() + 6, y, line)
+            y += metrics.height()
+
+    def image_area(self):
+        """Return the widget rectangle the image is drawn in."""
+        offset = self.offset_to_center()
+        s = self.scale
+        return QRectF(offset.x() * s, offset.y() * s,
+                      self.pixmap.width() * s, self.pixmap.height() * s).toAlignedRect()
+
+    def scaled_cache_area(self):
+        """Return the part of the image worth pre-scaling: what is visible plus a margin for scrolling."""
+        visible = self.visibleRegion().boundingRect()
+        if visible.isEmpty():
+            visible = self.rect()
+        dx, dy = visible.width() // 2, visible.height() // 2
+        return visible.adjusted(-dx, -dy, dx, dy).intersected(self.image_area())
+
     def transform_pos(self, point):
         """Transform a point's position based on the current scale and offset."""
         center_offset = self.offset_to_center()
@@ -602,6 +892,7 @@ class Canvas(QWidget):
             return self.scale * self.pixmap.size()
         return super(Canvas, self).minimumSizeHint()
 
+    @timed_event
     def wheelEvent(self, ev):
         qt_version = 4 if hasattr(ev, "delta") else 5
         if qt_version == 4:
@@ -626,6 +917,7 @@ class Canvas(QWidget):
             h_delta and self.scrollRequest.emit(h_delta, Qt.Horizontal)
         ev.accept()
 
+    @timed_event
     def keyPressEvent(self, ev):
         key = ev.key()
         if key == Qt.Key_Escape and self.current:
@@ -645,36 +937,16 @@ class Canvas(QWidget):
             self.move_one_pixel('Down')
 
     def move_one_pixel(self, direction):
-        # print(self.selectedShape.points)
-        if direction == 'Left' and not self.move_out_of_bound(QPointF(-1.0, 0)):
-            # print("move Left one pixel")
-            self.selected_shape.points[0] += QPointF(-1.0, 0)
-            self.selected_shape.points[1] += QPointF(-1.0, 0)
-            self.selected_shape.points[2] += QPointF(-1.0, 0)
-            self.selected_shape.points[3] += QPointF(-1.0, 0)
-        elif direction == 'Right' and not self.move_out_of_bound(QPointF(1.0, 0)):
-            # print("move Right one pixel")
-            self.selected_shape.points[0] += QPointF(1.0, 0)
-            self.selected_shape.points[1] += QPointF(1.0, 0)
-            self.selected_shape.points[2] += QPointF(1.0, 0)
-            self.selected_shape.points[3] += QPointF(1.0, 0)
-        elif direction == 'Up' and not self.move_out_of_bound(QPointF(0, -1.0)):
-            # print("move Up one pixel")
-            self.selected_shape.points[0] += QPointF(0, -1.0)
-            self.selected_shape.points[1] += QPointF(0, -1.0)
-            self.selected_shape.points[2] += QPointF(0, -1.0)
-            self.selected_shape.points[3] += QPointF(0, -1.0)
-        elif direction == 'Down' and not self.move_out_of_bound(QPointF(0, 1.0)):
-            # print("move Down one pixel")
-            self.selected_shape.points[0] += QPointF(0, 1.0)
-            self.selected_shape.points[1] += QPointF(0, 1.0)
-            self.selected_shape.points[2] += QPointF(0, 1.0)
-            self.selected_shape.points[3] += QPointF(0, 1.0)
+        step = {'Left': QPointF(-1.0, 0), 'Right': QPointF(1.0, 0),
+                'Up': QPointF(0, -1.0), 'Down': QPointF(0, 1.0)}[direction]
+        if not self.move_out_of_bound(step):
+            rect = self.shapes_paint_rect(self.selected_shapes)
+            self.move_shapes_by(self.selected_shapes, step)
+            self.update_image_rect(rect.united(rect.translated(step)))
         self.shapeMoved.emit()
-        self.repaint()
 
     def move_out_of_bound(self, step):
-        points = [p1 + p2 for p1, p2 in zip(self.selected_shape.points, [step] * 4)]
+        points = [p + step for shape in self.selected_shapes for p in shape.points]
         return True in map(self.out_of_pixmap, points)
 
     def set_last_label(self, text, line_color=None, fill_color=None):
@@ -686,6 +958,7 @@ class Canvas(QWidget):
         if fill_color:
             self.shapes[-1].fill_color = fill_color
 
+        self.update_shape(self.shapes[-1])
         return self.shapes[-1]
 
     def undo_last_line(self):
@@ -707,17 +980,29 @@ class Canvas(QWidget):
 
     def load_pixmap(self, pixmap):
         self.pixmap = pixmap
-        self.shapes = []
-        self.repaint()
+        self.shapes.clear()
+        self.scaled_cache.clear()
+        self.update()
 
     def load_shapes(self, shapes):
-        self.shapes = list(shapes)
+        self.shapes.load(shapes)
         self.current = None
-        self.repaint()
+        self.update()
+
+    def load_boxes(self, boxes):
+        """
+        Replace the shapes with new closed ones, built from (label, points,
+        difficult) tuples and snapped into the image in one pass.
+        :return: (shapes, snapped) where snapped is True if any point was moved.
+        """
+        shapes, snapped = self.shapes.load_boxes(boxes, self.pixmap.width(), self.pixmap.height())
+        self.current = None
+        self.update()
+        return shapes, snapped
 
     def set_shape_visible(self, shape, value):
-        self.visible[shape] = value
-        self.repaint()
+        self.shapes.set_visible(shape, value)
+        self.update_shape(shape)
 
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
@@ -739,9 +1024,11 @@ class Canvas(QWidget):
         self.de_select_shape()
         self.un_highlight()
         self.selected_shape_copy = None
+        self.rubber_band = None
 
         self.restore_cursor()
         self.pixmap = None
+        self.scaled_cache.clear()
         self.update()
 
     def set_drawing_shape_to_square(self, status):
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import json
+import os
+
+from libs.annotation import Annotation
+from libs.constants import DEFAULT_ENCODING
+from libs.wal_store import WriteAheadLogStore
+
+COCO_FILENAME = 'instances.json'
+ENCODE_METHOD = DEFAULT_ENCODING
+
+
+def coco_path(annotation_dir):
+    return os.path.join(annotation_dir, COCO_FILENAME)
+
+
+def is_coco_file(json_path):
+    """Tell a COCO dataset (a JSON object) from a CreateML one (a JSON list)."""
+    with open(json_path, 'rb') as file:
+        return file.read(256).lstrip()[:1] == b'{'
+
+
+class CocoStore(WriteAheadLogStore):
+    """
+    In-memory index of a COCO instances file.
+
+    The dataset is parsed once into id maps: ``images`` (image id -> image),
+    ``image_ids`` (file name -> image id), ``categories`` (category id ->
+    category), ``category_ids`` (name -> category id) and ``annotations``
+    (image id -> its annotations), so reading or replacing the boxes of one
+    image never walks the whole dataset. Updates are journaled per image as
+    described in ``WriteAheadLogStore`` and compacted back into a standard
+    COCO file; top-level keys other than images, annotations and categories
+    (info, licenses, ...) are kept as they were.
+    """
+
+    def __len__(self):
+        return len(self.images)
+
+    def _load_file(self):
+        self.dataset = {}
+        self.images = {}
+        self.image_ids = {}
+        self.categories = {}
+        self.category_ids = {}
+        self.annotations = {}
+        self.next_image_id = 1
+        self.next_annotation_id = 1
+        if not os.path.isfile(self.json_path):
+            return
+        with open(self.json_path, 'r', encoding=ENCODE_METHOD) as file:
+            dataset = json.load(file)
+        for category in dataset.pop('categories', []):
+            self._add_category(category)
+        for image in dataset.pop('images', []):
+            self._add_image(image)
+        for annotation in dataset.pop('annotations', []):
+            self.annotations.setdefault(annotation['image_id'], []).append(annotation)
+            self.next_annotation_id = max(self.next_annotation_id, annotation['id'] + 1)
+        self.dataset = dataset
+
+    def _add_category(self, category):
+        self.categories[category['id']] = category
+        self.category_ids.setdefault(category['name'], category['id'])
+
+    def _add_image(self, image):
+        self.images[image['id']] = image
+        self.image_ids[image['file_name']] = image['id']
+        self.next_image_id = max(self.next_image_id, image['id'] + 1)
+
+    def _apply(self, record):
+        for category in record['categories']:
+            self._add_category(category)
+        self._add_image(record['image'])
+        self.annotations[record['image']['id']] = record['annotations']
+        for annotation in record['annotations']:
+            self.next_annotation_id = max(self.next_annotation_id, annotation['id'] + 1)
+
+    def category_id(self, name, new_categories):
+        category_id = self.category_ids.get(name)
+        if category_id is None:
+            category_id = max(self.categories, default=0) + 1
+            category = {'id': category_id, 'name': name, 'supercategory': 'none'}
+            self._add_category(category)
+            new_categories.append(category)
+        return category_id
+
+    def get(self, file_name):
+        """Return the Annotation of file_name, or None if it is not in the dataset."""
+        with self._lock:
+            image_id = self.image_ids.get(file_name)
+            if image_id is None:
+                return None
+            image = self.images[image_id]
+            annotation = Annotation(file_name, [image['height'], image['width'], 3],
+                                    image.get('verified', False))
+            for item in self.annotations.get(image_id, ()):
+                x, y, width, height = item['bbox']
+                annotation.add_box(x, y, x + width, y + height,
+                                   self.categories[item['category_id']]['name'])
+            return annotation
+
+    def put(self, file_name, img_size, annotation, verified=False):
+        """Replace the boxes of file_name with the ones of annotation."""
+        with self._lock:
+            image_id = self.image_ids.get(file_name)
+            if image_id is None:
+                image_id = self.next_image_id
+            image = dict(self.images.get(image_id, {}))
+            image.update({'id': image_id, 'file_name': file_name,
+                          'width': img_size[1], 'height': img_size[0], 'verified': verified})
+            new_categories = []
+            category_ids = [self.category_id(label, new_categories) for label in annotation.labels]
+            coords = annotation.coords
+            items = []
+            # Caveat: COCO has no difficult flag, it is discarded.
+            for i, label_id in enumerate(annotation.label_ids):
+                x_min, y_min, x_max, y_max = coords[4 * i:4 * i + 4]
+                width, height = x_max - x_min, y_max - y_min
+                items.append({'id': self.next_annotation_id + i, 'image_id': image_id,
+                              'category_id': category_ids[label_id],
+                              'bbox': [x_min, y_min, width, height], 'area': width * height,
+                              'iscrowd': 0})
+            record = {'image': image, 'annotations': items, 'categories': new_categories}
+            self._apply(record)
+            self._log(record)
+
+    def _write(self, path):
+        # Written piece by piece so a large dataset is never held as one string.
+        with open(path, 'w', encoding=ENCODE_METHOD) as file:
+            file.write('{')
+            for key, value in self.dataset.items():
+                file.write('%s: %s, ' % (json.dumps(key), json.dumps(value)))
+            self._write_list(file, 'images', self.images.values())
+            file.write(', ')
+            self._write_list(file, 'annotations',
+                             (item for image_id in self.images for item in self.annotations.get(image_id, ())))
+            file.write(', ')
+            self._write_list(file, 'categories', self.categories.values())
+            file.write('}')
+
+    @staticmethod
+    def _write_list(file, key, items):
+        file.write('%s: [' % json.dumps(key))
+        for i, item in enumerate(items):
+            if i:
+                file.write(', ')
+            file.write(json.dumps(item))
+        file.write(']')
+
+
+def load_coco_index(json_path):
+    """Return a read-only CocoStore snapshot of json_path, shared by the process."""
+    return CocoStore.snapshot(json_path)
+
+
+class CocoWriter:
+    def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown', local_img_path=None):
+        self.folder_name = folder_name
+        self.filename = filename
+        self.database_src = database_src
+        self.img_size = img_size
+        self.local_img_path = local_img_path
+        self.verified = False
+        self.annotation = Annotation.from_shapes(shapes)
+        self.output_file = output_file
+
+    def write(self):
+        CocoStore.open(self.output_file).put(self.filename, self.img_size, self.annotation, self.verified)
+
+
+class CocoReader:
+    def __init__(self, json_path, file_path):
+        self.json_path = json_path
+        self.filename = os.path.basename(file_path)
+        # The open store includes updates that are not compacted into the
+        # file yet; otherwise use the parsed index shared by the process.
+        store = CocoStore.find(json_path) or load_coco_index(json_path)
+        self.annotation = store.get(self.filename)
+        if self.annotation is None:
+            self.annotation = Annotation(self.filename)
+        self.verified = self.annotation.verified
+
+    def get_annotation(self):
+        return self.annotation
+
+    def get_shapes(self):
+        return self.annotation.to_shapes()
@@ -15,6 +15,15 @@ SETTING_SINGLE_CLASS = 'singleclass'
 FORMAT_PASCALVOC='PascalVOC'
 FORMAT_YOLO='YOLO'
 FORMAT_CREATEML='CreateML'
+FORMAT_COCO='COCO'
+FORMAT_PROJECTDB='ProjectDB'
+FORMAT_BINARY='Binary'
 SETTING_DRAW_SQUARE = 'draw/square'
 SETTING_LABEL_FILE_FORMAT= 'labelFileFormat'
+SETTING_CANVAS_ENGINE = 'canvas/engine'
+SETTING_MIN_VERTEX_SIZE = 'detail/minVertexSize'
+SETTING_MIN_LABEL_SIZE = 'detail/minLabelSize'
+SETTING_MIN_OUTLINE_SIZE = 'detail/minOutlineSize'
+CANVAS_ENGINE_WIDGET = 'widget'
+CANVAS_ENGINE_SCENE = 'scene'
 DEFAULT_ENCODING = 'utf-8'
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Convert a dataset between label formats without the GUI.
+
+    python -m libs.convert --from PascalVOC --to YOLO --images data/images \
+        --labels data/annotations --output data/labels --jobs 8
+
+Images are converted in a process pool. A single-file source (CreateML, COCO
+or project database) is read once by the parent, which hands each worker the
+annotation of its image, and a single-file target is written in one batch:
+one compaction or one transaction for the whole run, committed every
+JOURNAL_CHUNK images. Progress is reported on stderr and converted images are
+recorded in a journal inside the output after each commit, so an interrupted
+run continues where it stopped when started again.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+from libs.binary_io import BIN_EXT, BinaryReader, BinaryWriter
+from libs.coco_io import CocoReader, CocoStore, load_coco_index
+from libs.constants import FORMAT_BINARY, FORMAT_COCO, FORMAT_CREATEML, FORMAT_PASCALVOC, FORMAT_PROJECTDB
+from libs.constants import FORMAT_YOLO
+from libs.create_ml_io import CreateMLReader, CreateMLStore, CreateMLWriter, load_create_ml_index
+from libs.image_meta import read_image_size
+from libs.labelFile import LabelFile
+from libs.pascal_voc_io import PascalVocReader, PascalVocWriter, XML_EXT
+from libs.project_db import ProjectDatabase, ProjectDatabaseReader
+from libs.yolo_io import CLASSES_FILENAME, IMAGE_EXTS, TXT_EXT, YoloReader, YOLOWriter
+from libs.yolo_io import load_class_list, update_label_cache
+
+FORMATS = (FORMAT_PASCALVOC, FORMAT_YOLO, FORMAT_CREATEML, FORMAT_COCO, FORMAT_PROJECTDB, FORMAT_BINARY)
+# Extension of the label file of each image, for the other formats.
+SIDECAR_EXTS = {FORMAT_PASCALVOC: XML_EXT, FORMAT_YOLO: TXT_EXT, FORMAT_BINARY: BIN_EXT}
+# Formats that keep a whole dataset in one file.
+SINGLE_FILE_FORMATS = (FORMAT_CREATEML, FORMAT_COCO, FORMAT_PROJECTDB)
+JOURNAL_FILENAME = '.labelImg-convert.journal'
+# Converted images are committed to a single-file target and journaled in
+# chunks of this many, so an interrupted run loses at most one chunk.
+JOURNAL_CHUNK = 256
+
+SKIPPED, CONVERTED, FAILED = range(3)
+
+# Per worker process job settings, see _init_worker.
+_job = None
+
+
+class ConvertJob(object):
+
+    def __init__(self, source_format, target_format, labels, output, classes=None):
+        self.source_format = source_format
+        self.target_format = target_format
+        self.labels = labels
+        self.output = output
+        self.classes = classes
+
+    def source_path(self, image_path):
+        if self.source_format in SINGLE_FILE_FORMATS:
+            return self.labels
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        return os.path.join(self.labels, stem + SIDECAR_EXTS[self.source_format])
+
+    def read(self, image_path):
+        """Return the Annotation of image_path, or None if it has no annotation."""
+        source_path = self.source_path(image_path)
+        if not os.path.isfile(source_path):
+            return None
+        if self.source_format == FORMAT_PASCALVOC:
+            reader = PascalVocReader(source_path)
+        elif self.source_format == FORMAT_YOLO:
+            reader = YoloReader(source_path, image_path)
+        elif self.source_format == FORMAT_BINARY:
+            reader = BinaryReader(source_path)
+        elif self.source_format == FORMAT_COCO:
+            if os.path.basename(image_path) not in load_coco_index(source_path).image_ids:
+                return None
+            reader = CocoReader(source_path, image_path)
+        elif self.source_format == FORMAT_PROJECTDB:
+            if image_path not in ProjectDatabase.open(source_path):
+                return None
+            reader = ProjectDatabaseReader(source_path, image_path)
+        else:
+            if os.path.basename(image_path) not in load_create_ml_index(source_path).entries:
+                return None
+            reader = CreateMLReader(source_path, image_path)
+        annotation = reader.get_annotation()
+        annotation.verified = reader.verified
+        return annotation
+
+    def convert(self, image_path, annotation=None):
+        """
+        Convert one image, with its annotation if it was already read.
+        Returns (status, result) where result is the CreateML entry to store,
+        the arguments of CocoStore.put or ProjectDatabase.put, or the
+        (txt_path, img_size, boxes) record for the YOLO label cache.
+        """
+        if annotation is None:
+            annotation = self.read(image_path)
+        if annotation is None:
+            return SKIPPED, None
+        img_size = read_image_size(image_path)
+        folder_name = os.path.basename(os.path.dirname(image_path))
+        file_name = os.path.basename(image_path)
+        stem = os.path.splitext(file_name)[0]
+
+        if self.target_format == FORMAT_CREATEML:
+            writer = CreateMLWriter(folder_name, file_name, img_size, annotation, self.output,
+                                    local_img_path=image_path)
+            writer.verified = annotation.verified
+            return CONVERTED, writer.gen_entry()
+
+        if self.target_format == FORMAT_COCO:
+            return CONVERTED, (file_name, img_size, annotation, annotation.verified)
+        if self.target_format == FORMAT_PROJECTDB:
+            return CONVERTED, (image_path, img_size, annotation, annotation.verified)
+
+        if self.target_format == FORMAT_BINARY:
+            writer = BinaryWriter(folder_name, file_name, img_size, local_img_path=image_path)
+            writer.verified = annotation.verified
+            writer.annotation = annotation
+            annotation.filename = file_name
+            annotation.img_size = img_size
+            writer.save(target_file=os.path.join(self.output, stem + BIN_EXT))
+            return CONVERTED, None
+
+        if self.target_format == FORMAT_PASCALVOC:
+            writer = PascalVocWriter(folder_name, file_name, img_size, local_img_path=image_path)
+        else:
+            writer = YOLOWriter(folder_name, file_name, img_size, local_img_path=image_path)
+        writer.verified = annotation.verified
+        LabelFile.to_bnd_box_annotation(annotation, writer.annotation)
+
+        if self.target_format == FORMAT_PASCALVOC:
+            writer.save(target_file=os.path.join(self.output, stem + XML_EXT))
+            return CONVERTED, None
+        # The label cache is appended to by the parent process only.
+        txt_path = os.path.join(self.output, stem + TXT_EXT)
+        boxes = writer.save(class_list=list(self.classes), target_file=txt_path, update_cache=False)
+        return CONVERTED, (txt_path, img_size, boxes)
+
+
+def _init_worker(job):
+    global _job
+    _job = job
+
+
+def _convert_worker(task):
+    image_path, annotation = task
+    try:
+        status, entry = _job.convert(image_path, annotation)
+        return image_path, status, entry
+    except Exception as e:
+        return image_path, FAILED, _error(e)
+
+
+def _error(e):
+    return '%s: %s' % (type(e).__name__, e)
+
+
+def _used_labels(job, image_path):
+    try:
+        annotation = job.read(image_path)
+    except Exception:
+        return set()
+    if annotation is None:
+        return set()
+    return set(annotation.labels[label_id] for label_id in set(annotation.label_ids))
+
+
+def _labels_worker(image_path):
+    return _used_labels(_job, image_path)
+
+
+def scan_images(images_dir):
+    images = []
+    for root, _, files in os.walk(images_dir):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTS:
+                images.append(os.path.join(root, file_name))
+    images.sort()
+    return images
+
+
+def journal_path(job):
+    if job.target_format in SINGLE_FILE_FORMATS:
+        return job.output + JOURNAL_FILENAME
+    return os.path.join(job.output, JOURNAL_FILENAME)
+
+
+def read_journal(path):
+    if not os.path.isfile(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as journal:
+        return set(line.rstrip('\n') for line in journal if line.endswith('\n'))
+
+
+class Progress(object):
+
+    def __init__(self, total, stream=sys.stderr, interval=0.5):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.counts = [0, 0, 0]
+        self.start = self.last = time.time()
+
+    def add(self, status):
+        self.counts[status] += 1
+        now = time.time()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report()
+
+    def report(self, end=''):
+        done = sum(self.counts)
+        rate = done / max(time.time() - self.start, 1e-6)
+        self.stream.write('\r%d/%d images, %d converted, %d skipped, %d failed (%.0f/s)%s' % (
+            done, self.total, self.counts[CONVERTED], self.counts[SKIPPED], self.counts[FAILED], rate, end))
+        self.stream.flush()
+
+
+def collect_classes(job, images, jobs=None):
+    """Return the YOLO class list: the source's own, or every label used, sorted."""
+    if job.source_format == FORMAT_YOLO:
+        return load_class_list(os.path.join(job.labels, CLASSES_FILENAME))
+    labels = set()
+    if job.source_format in SINGLE_FILE_FORMATS:
+        # Reads come from the dataset parsed once in this process; workers
+        # would each parse it again.
+        for image_path in images:
+            labels |= _used_labels(job, image_path)
+        return sorted(labels)
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(job,)) as pool:
+        for found in pool.imap_unordered(_labels_worker, images, chunksize=256):
+            labels |= found
+    return sorted(labels)
+
+
+def convert(job, images, jobs=None, resume=True, progress=None):
+    """
+    Convert images with job in a pool of jobs processes (default: CPU count).
+    Returns the [skipped, converted, failed] counts and the list of
+    (image_path, error) failures.
+    """
+    if job.target_format not in SINGLE_FILE_FORMATS and not os.path.isdir(job.output):
+        os.makedirs(job.output)
+    journal_file = journal_path(job)
+    done = read_journal(journal_file) if resume else set()
+    if not resume and os.path.isfile(journal_file):
+        os.remove(journal_file)
+    pending = [image for image in images if image not in done]
+    if progress is None:
+        progress = Progress(len(pending))
+
+    if job.target_format == FORMAT_YOLO and job.classes is None:
+        classes_path = os.path.join(job.output, CLASSES_FILENAME)
+        if done and os.path.isfile(classes_path):
+            # Keep the class indices of the files converted before.
+            job.classes = load_class_list(classes_path)
+        else:
+            job.classes = collect_classes(job, images, jobs)
+
+    failures = []
+    store = None
+    if job.target_format == FORMAT_CREATEML:
+        store = CreateMLStore.open(job.output)
+    elif job.target_format == FORMAT_COCO:
+        store = CocoStore.open(job.output)
+    elif job.target_format == FORMAT_PROJECTDB:
+        store = ProjectDatabase.open(job.output)
+    # Images whose results are written but not journaled yet.
+    unjournaled = []
+    try:
+        with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(job,)) as pool, \
+                open(journal_file, 'a', encoding='utf-8') as journal:
+
+            def write_journal():
+                if store is not None:
+                    store.commit()
+                journal.writelines(image_path + '\n' for image_path in unjournaled)
+                journal.flush()
+                del unjournaled[:]
+
+            def record_done(image_path, status):
+                unjournaled.append(image_path)
+                if len(unjournaled) >= JOURNAL_CHUNK:
+                    write_journal()
+                progress.add(status)
+
+            if job.source_format in SINGLE_FILE_FORMATS:
+                tasks = []
+                for image_path in pending:
+                    try:
+                        annotation = job.read(image_path)
+                    except Exception as e:
+                        failures.append((image_path, _error(e)))
+                        progress.add(FAILED)
+                        continue
+                    if annotation is None:
+                        record_done(image_path, SKIPPED)
+                    else:
+                        tasks.append((image_path, annotation))
+            else:
+                tasks = [(image_path, None) for image_path in pending]
+
+            with store.batch() if store is not None else nullcontext():
+                for image_path, status, result in pool.imap_unordered(_convert_worker, tasks, chunksize=64):
+                    if status == FAILED:
+                        failures.append((image_path, result))
+                        progress.add(status)
+                        continue
+                    if result is not None and job.target_format == FORMAT_CREATEML:
+                        store.put(result)
+                    elif result is not None and job.target_format in (FORMAT_COCO, FORMAT_PROJECTDB):
+                        store.put(*result)
+                    elif result is not None:
+                        update_label_cache(*result)
+                    record_done(image_path, status)
+                write_journal()
+    finally:
+        if store is not None:
+            store.close()
+    progress.report(end='\n')
+    return progress.counts, failures
+
+
+def format_arg(value):
+    for name in FORMATS:
+        if name.lower() == value.lower():
+            return name
+    raise argparse.ArgumentTypeError('unknown format %r, expected one of %s' % (value, ', '.join(FORMATS)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert annotations between label formats.')
+    parser.add_argument('--from', dest='source_format', type=format_arg, required=True,
+                        help='source format: %s' % ', '.join(FORMATS))
+    parser.add_argument('--to', dest='target_format', type=format_arg, required=True,
+                        help='target format: %s' % ', '.join(FORMATS))
+    parser.add_argument('--images', required=True, help='directory of the images')
+    parser.add_argument('--labels', help='directory of the source annotations, or the CreateML or '
+                                         'COCO JSON file or project database (default: the images directory)')
+    parser.add_argument('--output', required=True,
+                        help='output directory, or the CreateML or COCO JSON file or project database')
+    parser.add_argument('--classes', help='YOLO class list to use (default: collected from the source)')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--restart', action='store_true', help='ignore the journal of a previous run')
+    args = parser.parse_args(argv)
+
+    job = ConvertJob(args.source_format, args.target_format, args.labels or args.images, args.output,
+                     load_class_list(args.classes) if args.classes else None)
+    images = scan_images(args.images)
+    counts, failures = convert(job, images, jobs=args.jobs, resume=not args.restart)
+    for image_path, error in failures:
+        sys.stderr.write('%s: %s\n' % (image_path, error))
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
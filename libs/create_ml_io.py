@@ -1,14 +1,177 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
+import codecs
 import json
-from pathlib import Path
+import re
+from collections import namedtuple
 
+from libs.annotation import Annotation
 from libs.constants import DEFAULT_ENCODING
+from libs.wal_store import WAL_EXT, WriteAheadLogStore
 import os
 
 JSON_EXT = '.json'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+# Location of one image entry inside a CreateML file, in bytes.
+EntrySpan = namedtuple('EntrySpan', ['offset', 'length'])
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_create_ml_entries(json_path, chunk_size=1 << 20):
+    """
+    Yield (EntrySpan, entry) for every image entry of a CreateML file.
+    The file is read in chunks, so memory stays bounded by the chunk size
+    plus the largest single entry regardless of the file size.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(ENCODE_METHOD)()
+    with open(json_path, 'rb') as file:
+        buf = ''
+        pos = 0
+        byte_pos = 0
+        started = False
+        eof = False
+        while True:
+            end = _SEPARATORS.match(buf, pos).end()
+            byte_pos += len(buf[pos:end].encode(ENCODE_METHOD))
+            pos = end
+            if pos < len(buf):
+                if not started:
+                    if buf[pos] != '[':
+                        raise ValueError('CreateML file must contain a JSON list')
+                    started = True
+                    pos += 1
+                    byte_pos += 1
+                    continue
+                if buf[pos] == ']':
+                    return
+                try:
+                    entry, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # The entry continues past the buffer, unless the file is done.
+                    if eof:
+                        raise
+                else:
+                    length = len(buf[pos:end].encode(ENCODE_METHOD))
+                    yield EntrySpan(byte_pos, length), entry
+                    byte_pos += length
+                    pos = end
+                    continue
+            elif eof:
+                return
+            data = file.read(max(chunk_size, len(buf) - pos))
+            eof = not data
+            buf = buf[pos:] + text_decoder.decode(data, final=eof)
+            pos = 0
+
+
+def read_create_ml_entry(json_path, span):
+    """Read the single entry found at span without parsing the rest of the file."""
+    with open(json_path, 'rb') as file:
+        file.seek(span.offset)
+        return json.loads(file.read(span.length).decode(ENCODE_METHOD))
+
+
+class CreateMLStore(WriteAheadLogStore):
+    """
+    In-memory index of a CreateML dataset file, keyed by image name.
+
+    Updated entries are journaled as described in ``WriteAheadLogStore`` and
+    compacted back into the standard CreateML JSON.
+
+    Files of ``streaming_threshold`` bytes or more are never loaded whole:
+    they are scanned once with ``iter_create_ml_entries`` and the index keeps
+    only the byte span of each untouched entry, which ``get`` reads on demand
+    and ``compact`` copies over verbatim.
+    """
+    streaming_threshold = 64 * 1024 * 1024
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _load_file(self):
+        self.entries = {}
+        self.streaming = (os.path.isfile(self.json_path) and
+                          os.path.getsize(self.json_path) >= self.streaming_threshold)
+        if self.streaming:
+            for span, entry in iter_create_ml_entries(self.json_path):
+                self.entries[entry['image']] = span
+        elif os.path.isfile(self.json_path):
+            with open(self.json_path, 'r', encoding=ENCODE_METHOD) as file:
+                for entry in json.loads(file.read()):
+                    self.entries[entry['image']] = entry
+
+    def _apply(self, entry):
+        self.entries[entry['image']] = entry
+
+    def _resolve(self, entry):
+        if isinstance(entry, EntrySpan):
+            return read_create_ml_entry(self.json_path, entry)
+        return entry
+
+    def get(self, image):
+        with self._lock:
+            return self._resolve(self.entries.get(image))
+
+    def first(self):
+        with self._lock:
+            return self._resolve(next(iter(self.entries.values()), None))
+
+    def put(self, entry):
+        with self._lock:
+            self._apply(entry)
+            self._log(entry)
+
+    def _write(self, path):
+        # Same bytes as json.dumps(list_of_entries); untouched entries of a
+        # streamed file are copied from the old file without being parsed.
+        spans = {}
+        source = open(self.json_path, 'rb') if self.streaming else None
+        try:
+            with open(path, 'wb') as file:
+                file.write(b'[')
+                for i, (image, entry) in enumerate(self.entries.items()):
+                    if i:
+                        file.write(b', ')
+                    if isinstance(entry, EntrySpan):
+                        source.seek(entry.offset)
+                        data = source.read(entry.length)
+                    else:
+                        data = json.dumps(entry).encode(ENCODE_METHOD)
+                    spans[image] = EntrySpan(file.tell(), len(data))
+                    file.write(data)
+                file.write(b']')
+        finally:
+            if source is not None:
+                source.close()
+        return spans
+
+    def _compacted(self, spans):
+        was_streaming = self.streaming
+        self.streaming = os.path.getsize(self.json_path) >= self.streaming_threshold
+        if self.streaming:
+            self.entries.update(spans)
+        elif was_streaming:
+            # The file shrank below the threshold: spans of the old file are
+            # stale, so read the untouched entries back from the new one.
+            with open(self.json_path, 'rb') as source:
+                for image, entry in self.entries.items():
+                    if isinstance(entry, EntrySpan):
+                        span = spans[image]
+                        source.seek(span.offset)
+                        self.entries[image] = json.loads(source.read(span.length).decode(ENCODE_METHOD))
+
+
+def load_create_ml_index(json_path):
+    """
+    Return a read-only CreateMLStore snapshot of json_path, shared by the
+    process. The file is only parsed again when the mtime or size of the file
+    or of its write-ahead log changes.
+    """
+    return CreateMLStore.snapshot(json_path)
+
 
 class CreateMLWriter:
     def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown', local_img_path=None):
@@ -16,38 +179,29 @@ class CreateMLWriter:
         self.filename = filename
         self.database_src = database_src
         self.img_size = img_size
-        self.box_list = []
         self.local_img_path = local_img_path
         self.verified = False
-        self.shapes = shapes
+        self.annotation = Annotation.from_shapes(shapes)
         self.output_file = output_file
 
     def write(self):
-        if os.path.isfile(self.output_file):
-            with open(self.output_file, "r") as file:
-                input_data = file.read()
-                output_dict = json.loads(input_data)
-        else:
-            output_dict = []
+        CreateMLStore.open(self.output_file).put(self.gen_entry())
 
+    def gen_entry(self):
+        """
+            Return the dataset entry of this image
+        """
         output_image_dict = {
             "image": self.filename,
             "verified": self.verified,
             "annotations": []
         }
 
-        for shape in self.shapes:
-            points = shape["points"]
-
-            x1 = points[0][0]
-            y1 = points[0][1]
-            x2 = points[1][0]
-            y2 = points[2][1]
-
+        for label, x1, y1, x2, y2, _ in self.annotation.boxes():
             height, width, x, y = self.calculate_coordinates(x1, x2, y1, y2)
 
             shape_dict = {
-                "label": shape["label"],
+                "label": label,
                 "coordinates": {
                     "x": x,
                     "y": y,
@@ -57,18 +211,7 @@ class CreateMLWriter:
             }
             output_image_dict["annotations"].append(shape_dict)
 
-        # check if image already in output
-        exists = False
-        for i in range(0, len(output_dict)):
-            if output_dict[i]["image"] == output_image_dict["image"]:
-                exists = True
-                output_dict[i] = output_image_dict
-                break
-
-        if not exists:
-            output_dict.append(output_image_dict)
-
-        Path(self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
+        return output_image_dict
 
     def calculate_coordinates(self, x1, x2, y1, y2):
         if x1 < x2:
@@ -96,30 +239,28 @@ class CreateMLWriter:
 class CreateMLReader:
     def __init__(self, json_path, file_path):
         self.json_path = json_path
-        self.shapes = []
         self.verified = False
         self.filename = os.path.basename(file_path)
+        self.annotation = Annotation(self.filename)
         try:
             self.parse_json()
         except ValueError:
             print("JSON decoding failed")
 
     def parse_json(self):
-        with open(self.json_path, "r") as file:
-            input_data = file.read()
-
-        # Returns a list
-        output_list = json.loads(input_data)
+        # The open store includes updates that are not compacted into the
+        # file yet; otherwise use the parsed index shared by the process.
+        store = CreateMLStore.find(self.json_path) or load_create_ml_index(self.json_path)
 
-        if output_list:
-            self.verified = output_list[0].get("verified", False)
+        first = store.first()
+        if first is not None:
+            self.verified = first.get("verified", False)
+        self.annotation = Annotation(self.filename, verified=self.verified)
 
-        if len(self.shapes) > 0:
-            self.shapes = []
-        for image in output_list:
-            if image["image"] == self.filename:
-                for shape in image["annotations"]:
-                    self.add_shape(shape["label"], shape["coordinates"])
+        image = store.get(self.filename)
+        if image is not None:
+            for shape in image["annotations"]:
+                self.add_shape(shape["label"], shape["coordinates"])
 
     def add_shape(self, label, bnd_box):
         x_min = bnd_box["x"] - (bnd_box["width"] / 2)
@@ -128,8 +269,10 @@ class CreateMLReader:
         x_max = bnd_box["x"] + (bnd_box["width"] / 2)
         y_max = bnd_box["y"] + (bnd_box["height"] / 2)
 
-        points = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
-        self.shapes.append((label, points, None, None, True))
+        self.annotation.add_box(x_min, y_min, x_max, y_max, label, True)
+
+    def get_annotation(self):
+        return self.annotation
 
     def get_shapes(self):
-        return self.shapes
+        return self.annotation.to_shapes()
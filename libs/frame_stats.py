@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import functools
+import json
+import time
+from collections import deque
+
+# Histogram bucket upper bounds, in milliseconds; the last bucket is open.
+BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+
+
+def timed_event(method):
+    """Record how long an event handler of a widget with a ``stats`` attribute takes."""
+    @functools.wraps(method)
+    def wrapper(self, ev):
+        stats = self.stats
+        if stats is None:
+            return method(self, ev)
+        start = time.perf_counter()
+        try:
+            return method(self, ev)
+        finally:
+            stats.add_event(time.perf_counter() - start)
+    return wrapper
+
+
+class RollingTimes(object):
+    """The last ``size`` durations of one kind, in milliseconds."""
+
+    def __init__(self, size=600):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds * 1000.0)
+        self.count += 1
+
+    def last(self):
+        return self.samples[-1] if self.samples else 0.0
+
+    def mean(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def histogram(self):
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for ms in self.samples:
+            for i, bound in enumerate(BUCKETS_MS):
+                if ms <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.mean(),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': max(self.samples) if self.samples else 0.0,
+            'histogram': dict(zip(['<=%g ms' % b for b in BUCKETS_MS] + ['>%g ms' % BUCKETS_MS[-1]],
+                                  self.histogram())),
+        }
+
+
+class FrameStats(object):
+    """
+    Timings behind the canvas HUD: paint time per frame, mouse and key
+    event handling time and image decode time, each over a rolling window,
+    plus how many shapes the last frame drew and culled. ``caches`` maps a
+    name to an object with ``hits`` and ``misses`` counters.
+    """
+
+    def __init__(self, caches=None, size=600):
+        self.paint = RollingTimes(size)
+        self.events = RollingTimes(size)
+        self.decode = RollingTimes(size)
+        self.drawn = 0
+        self.culled = 0
+        self.caches = caches or {}
+        self._cache_start = dict((name, (cache.hits, cache.misses)) for name, cache in self.caches.items())
+
+    def add_paint(self, seconds, drawn, culled):
+        self.paint.add(seconds)
+        self.drawn = drawn
+        self.culled = culled
+
+    def add_event(self, seconds):
+        self.events.add(seconds)
+
+    def add_decode(self, seconds):
+        self.decode.add(seconds)
+
+    def hit_rates(self):
+        """Return name -> (hits, misses) since the stats were started."""
+        rates = {}
+        for name, cache in self.caches.items():
+            hits, misses = self._cache_start[name]
+            rates[name] = cache.hits - hits, cache.misses - misses
+        return rates
+
+    def hud_lines(self):
+        lines = [
+            'paint  %6.1f ms  (mean %.1f, p95 %.1f)' % (self.paint.last(), self.paint.mean(),
+                                                         self.paint.percentile(0.95)),
+            'events %6.2f ms  (mean %.2f, p95 %.2f)' % (self.events.last(), self.events.mean(),
+                                                         self.events.percentile(0.95)),
+            'decode %6.1f ms' % self.decode.last(),
+            'shapes %d drawn, %d culled' % (self.drawn, self.culled),
+        ]
+        for name, (hits, misses) in sorted(self.hit_rates().items()):
+            total = hits + misses
+            lines.append('%s cache %3.0f%% of %d' % (name, 100.0 * hits / total if total else 0, total))
+        return lines
+
+    def to_dict(self):
+        return {
+            'paint': self.paint.to_dict(),
+            'events': self.events.to_dict(),
+            'decode': self.decode.to_dict(),
+            'last_frame': {'drawn': self.drawn, 'culled': self.culled},
+            'caches': dict((name, {'hits': hits, 'misses': misses})
+                           for name, (hits, misses) in self.hit_rates().items()),
+        }
+
+    def dump(self, path):
+        """Write the rolling histograms to path as JSON, for bug reports."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
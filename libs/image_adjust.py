@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from PySide6.QtGui import QImage
+
+IDENTITY_LEVELS = ((0, 255),) * 3
+
+
+class Adjustment(namedtuple('Adjustment', ['brightness', 'contrast', 'gamma', 'levels'])):
+    """
+    A display adjustment of the image, applied through one lookup table
+    per channel: levels first, then contrast around mid grey, brightness
+    and finally gamma.
+
+    ``brightness`` is added to the normalised intensity (-1 to 1),
+    ``contrast`` and ``gamma`` are factors (1 leaves the image as is) and
+    ``levels`` holds the (black, white) input points of red, green and
+    blue, between 0 and 255.
+    """
+    __slots__ = ()
+
+    def __new__(cls, brightness=0.0, contrast=1.0, gamma=1.0, levels=IDENTITY_LEVELS):
+        levels = tuple((int(black), int(white)) for black, white in levels)
+        return super(Adjustment, cls).__new__(cls, float(brightness), float(contrast), float(gamma), levels)
+
+    def is_identity(self):
+        return self == Adjustment()
+
+    def lut(self):
+        """Return the lookup tables as a (3, 256) uint8 array, for red, green and blue."""
+        x = np.arange(256, dtype=np.float64)
+        tables = []
+        for black, white in self.levels:
+            value = np.clip((x - black) / max(white - black, 1), 0.0, 1.0)
+            value = (value - 0.5) * self.contrast + 0.5 + self.brightness
+            value = np.clip(value, 0.0, 1.0) ** (1.0 / max(self.gamma, 0.01))
+            tables.append(np.rint(value * 255.0))
+        return np.array(tables, dtype=np.uint8)
+
+
+def adjustment_available():
+    """Adjustments need NumPy; without it only the light overlay is offered."""
+    return np is not None
+
+
+def image_array(image):
+    """Return a writable (height, width, channels) uint8 view of the pixel buffer of image, without copying."""
+    channels = 1 if image.format() == QImage.Format_Grayscale8 else 4
+    return np.ndarray((image.height(), image.width(), channels), dtype=np.uint8, buffer=image.bits(),
+                      strides=(image.bytesPerLine(), channels, 1))
+
+
+def adjust_image(image, adjustment):
+    """
+    Return a copy of image with adjustment applied. Grey images stay grey
+    while the levels of all channels are equal; anything else is converted
+    to 8 bit RGB(A), whose byte order does not depend on the platform.
+    """
+    lut = adjustment.lut()
+    grey = (lut[0] == lut[1]).all() and (lut[0] == lut[2]).all()
+    if grey and image.format() == QImage.Format_Grayscale8:
+        result = image.copy()
+    elif image.hasAlphaChannel():
+        result = image.convertToFormat(QImage.Format_RGBA8888)
+    else:
+        result = image.convertToFormat(QImage.Format_RGBX8888)
+    # bits() detaches result when the conversion shared the source buffer.
+    pixels = image_array(result)
+    if pixels.shape[2] == 1:
+        np.take(lut[0], pixels, out=pixels)
+        return result
+    # Look up two channels at a time: red and green, then blue and alpha,
+    # through 65536 entry tables indexed by the bytes as they lie in memory.
+    pairs = np.arange(65536, dtype=np.uint16).view(np.uint8).reshape(-1, 2)
+    words = pixels.reshape(pixels.shape[0], -1).view(np.uint16)
+    for first, tables in ((0, (lut[0], lut[1])), (1, (lut[2], np.arange(256, dtype=np.uint8)))):
+        table = np.stack([tables[0][pairs[:, 0]], tables[1][pairs[:, 1]]], axis=1).view(np.uint16).ravel()
+        words[:, first::2] = np.take(table, words[:, first::2])
+    return result
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Read image dimensions from the file header without decoding pixels.
+
+The result uses the same ``[height, width, depth]`` layout the readers and
+writers expect (depth is 1 for grayscale images, 3 otherwise), and matches
+what ``QImageReader`` with auto-transform enabled reports for the image.
+Depth comes from the header's colour model: true-colour images are always
+reported as 3 channels, even when every decoded pixel happens to be gray.
+"""
+import os
+import struct
+
+# EXIF orientations 5-8 rotate the image by 90 degrees, swapping width/height.
+_TRANSPOSING_ORIENTATIONS = (5, 6, 7, 8)
+
+_size_cache = {}
+
+
+def read_image_size(image_path):
+    """
+    Return ``[height, width, depth]`` for the image at ``image_path``.
+    Results are cached per path and refreshed when the file's mtime or size changes.
+    """
+    stat = os.stat(image_path)
+    key = os.path.realpath(image_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _size_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return list(cached[1])
+
+    with open(image_path, 'rb') as f:
+        img_size = _probe_header(f)
+    if img_size is None:
+        img_size = _probe_with_qt(image_path)
+    if img_size is None:
+        raise ValueError('Unsupported image format: %s' % image_path)
+
+    _size_cache[key] = (stamp, tuple(img_size))
+    return list(img_size)
+
+
+def _probe_header(f):
+    head = f.read(32)
+    f.seek(0)
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _probe_png(f)
+    if head.startswith(b'\xff\xd8'):
+        return _probe_jpeg(f)
+    if head.startswith(b'BM'):
+        return _probe_bmp(f)
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return _probe_gif(f)
+    return None
+
+
+def _is_gray_palette(palette, entry_size):
+    for i in range(0, len(palette) - entry_size + 1, entry_size):
+        c0, c1, c2 = palette[i], palette[i + 1], palette[i + 2]
+        if not (c0 == c1 == c2):
+            return False
+    return True
+
+
+def _probe_png(f):
+    f.seek(8)
+    length, chunk_type = struct.unpack('>I4s', f.read(8))
+    if chunk_type != b'IHDR':
+        return None
+    width, height, _, color_type = struct.unpack('>IIBB', f.read(10))
+    f.seek(length - 10 + 4, os.SEEK_CUR)
+
+    if color_type == 0:
+        depth = 1
+    elif color_type == 3:
+        # Paletted images decode to Indexed8, which Qt reports as grayscale
+        # only when every palette entry is gray.
+        depth = 3
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type == b'PLTE':
+                depth = 1 if _is_gray_palette(f.read(length), 3) else 3
+                break
+            if chunk_type == b'IDAT':
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    else:
+        depth = 3
+    return [height, width, depth]
+
+
+def _probe_jpeg(f):
+    f.seek(2)
+    orientation = 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if code == 0xE1:
+            orientation = _exif_orientation(f.read(length - 2)) or orientation
+            continue
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            _, height, width, components = struct.unpack('>BHHB', f.read(6))
+            if orientation in _TRANSPOSING_ORIENTATIONS:
+                width, height = height, width
+            return [height, width, 1 if components == 1 else 3]
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _exif_orientation(data):
+    if not data.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = data[6:]
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    try:
+        offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, _, _, value = struct.unpack(endian + 'HHI4s', tiff[entry:entry + 12])
+            if tag == 0x0112:
+                return struct.unpack(endian + 'H', value[:2])[0]
+    except struct.error:
+        pass
+    return None
+
+
+def _probe_bmp(f):
+    f.seek(14)
+    header_size = struct.unpack('<I', f.read(4))[0]
+    if header_size == 12:
+        width, height, _, bit_count = struct.unpack('<hhHH', f.read(8))
+        colors_used = 0
+        entry_size = 3
+    else:
+        width, height, _, bit_count = struct.unpack('<iiHH', f.read(12))
+        f.seek(14 + 32)
+        colors_used = struct.unpack('<I', f.read(4))[0]
+        entry_size = 4
+    depth = 3
+    if bit_count <= 8:
+        f.seek(14 + header_size)
+        count = colors_used or (1 << bit_count)
+        depth = 1 if _is_gray_palette(f.read(count * entry_size), entry_size) else 3
+    return [abs(height), abs(width), depth]
+
+
+def _probe_gif(f):
+    f.seek(6)
+    width, height, flags = struct.unpack('<HHB', f.read(5))
+    depth = 3
+    if flags & 0x80:
+        f.seek(13)
+        depth = 1 if _is_gray_palette(f.read(3 * (2 << (flags & 0x07))), 3) else 3
+    return [height, width, depth]
+
+
+def _probe_with_qt(image_path):
+    try:
+        from PySide6.QtGui import QImage, QImageIOHandler, QImageReader
+    except ImportError:
+        return None
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if not size.isValid():
+        return None
+    width, height = size.width(), size.height()
+    if reader.transformation() & QImageIOHandler.TransformationRotate90:
+        width, height = height, width
+    gray_formats = (QImage.Format_Grayscale8, QImage.Format_Grayscale16)
+    return [height, width, 1 if reader.imageFormat() in gray_formats else 3]
@@ -4,11 +4,17 @@
 from PySide6.QtGui import QImage
 
 import os.path
+import sqlite3
 from enum import Enum
 
+from libs.annotation import Annotation
+from libs.binary_io import BinaryWriter
+from libs.coco_io import CocoWriter
 from libs.create_ml_io import CreateMLWriter
+from libs.image_meta import read_image_size
 from libs.pascal_voc_io import PascalVocWriter
 from libs.pascal_voc_io import XML_EXT
+from libs.project_db import ProjectDatabaseWriter
 from libs.yolo_io import YOLOWriter
 
 
@@ -16,6 +22,9 @@ class LabelFileFormat(Enum):
     PASCAL_VOC = 1
     YOLO = 2
     CREATE_ML = 3
+    COCO = 4
+    PROJECT_DB = 5
+    BINARY = 6
 
 
 class LabelFileError(Exception):
@@ -42,11 +51,35 @@ class LabelFile(object):
         image_shape = [image.height(), image.width(),
                        1 if image.isGrayscale() else 3]
         writer = CreateMLWriter(img_folder_name, img_file_name,
-                                image_shape, shapes, filename, local_img_path=image_path)
+                                image_shape, Annotation.from_shapes(shapes), filename, local_img_path=image_path)
         writer.verified = self.verified
         writer.write()
         return
 
+    def save_coco_format(self, filename, shapes, image_path, image_data, class_list, line_color=None, fill_color=None, database_src=None):
+        img_folder_name = os.path.basename(os.path.dirname(image_path))
+        img_file_name = os.path.basename(image_path)
+
+        image_shape = LabelFile.image_shape(image_path, image_data)
+        writer = CocoWriter(img_folder_name, img_file_name,
+                            image_shape, Annotation.from_shapes(shapes), filename, local_img_path=image_path)
+        writer.verified = self.verified
+        writer.write()
+        return
+
+    def save_project_db_format(self, filename, shapes, image_path, image_data, class_list, line_color=None, fill_color=None, database_src=None):
+        img_folder_name = os.path.basename(os.path.dirname(image_path))
+        img_file_name = os.path.basename(image_path)
+
+        image_shape = LabelFile.image_shape(image_path, image_data)
+        writer = ProjectDatabaseWriter(img_folder_name, img_file_name,
+                                       image_shape, Annotation.from_shapes(shapes), filename, local_img_path=image_path)
+        writer.verified = self.verified
+        try:
+            writer.write()
+        except sqlite3.Error as e:
+            raise LabelFileError(e)
+        return
 
     def save_pascal_voc_format(self, filename, shapes, image_path, image_data,
                                line_color=None, fill_color=None, database_src=None):
@@ -66,15 +99,26 @@ class LabelFile(object):
         writer = PascalVocWriter(img_folder_name, img_file_name,
                                  image_shape, local_img_path=image_path)
         writer.verified = self.verified
+        LabelFile.to_bnd_box_annotation(shapes, writer.annotation)
 
-        for shape in shapes:
-            points = shape['points']
-            label = shape['label']
-            # Add Chris
-            difficult = int(shape['difficult'])
-            bnd_box = LabelFile.convert_points_to_bnd_box(points)
-            writer.add_bnd_box(bnd_box[0], bnd_box[1], bnd_box[2], bnd_box[3], label, difficult)
+        writer.save(target_file=filename)
+        return
 
+    def save_binary_format(self, filename, shapes, image_path, image_data,
+                           line_color=None, fill_color=None, database_src=None):
+        img_folder_name = os.path.basename(os.path.dirname(image_path))
+        img_file_name = os.path.basename(image_path)
+        if isinstance(image_data, QImage):
+            image = image_data
+        else:
+            image = QImage()
+            image.load(image_path)
+        image_shape = [image.height(), image.width(),
+                       1 if image.isGrayscale() else 3]
+        writer = BinaryWriter(img_folder_name, img_file_name,
+                              image_shape, local_img_path=image_path)
+        writer.verified = self.verified
+        writer.annotation = Annotation.from_shapes(shapes, filename=img_file_name, img_size=image_shape)
         writer.save(target_file=filename)
         return
 
@@ -96,18 +140,28 @@ class LabelFile(object):
         writer = YOLOWriter(img_folder_name, img_file_name,
                             image_shape, local_img_path=image_path)
         writer.verified = self.verified
-
-        for shape in shapes:
-            points = shape['points']
-            label = shape['label']
-            # Add Chris
-            difficult = int(shape['difficult'])
-            bnd_box = LabelFile.convert_points_to_bnd_box(points)
-            writer.add_bnd_box(bnd_box[0], bnd_box[1], bnd_box[2], bnd_box[3], label, difficult)
+        LabelFile.to_bnd_box_annotation(shapes, writer.annotation)
 
         writer.save(target_file=filename, class_list=class_list)
         return
 
+    @staticmethod
+    def image_shape(image_path, image_data):
+        """
+        Return [height, width, depth] of the image, from image_data when it is
+        the decoded QImage, else from the file header without decoding it.
+        """
+        if isinstance(image_data, QImage):
+            return [image_data.height(), image_data.width(),
+                    1 if image_data.isGrayscale() else 3]
+        try:
+            return read_image_size(image_path)
+        except (OSError, ValueError):
+            image = QImage()
+            image.load(image_path)
+            return [image.height(), image.width(),
+                    1 if image.isGrayscale() else 3]
+
     def toggle_verify(self):
         self.verified = not self.verified
 
@@ -159,6 +213,10 @@ class LabelFile(object):
             x_max = max(x, x_max)
             y_max = max(y, y_max)
 
+        return LabelFile.clamp_bnd_box(x_min, y_min, x_max, y_max)
+
+    @staticmethod
+    def clamp_bnd_box(x_min, y_min, x_max, y_max):
         # Martin Kersner, 2015/11/12
         # 0-valued coordinates of BB caused an error while
         # training faster-rcnn object detector.
@@ -169,3 +227,13 @@ class LabelFile(object):
             y_min = 1
 
         return int(x_min), int(y_min), int(x_max), int(y_max)
+
+    @staticmethod
+    def to_bnd_box_annotation(shapes, annotation):
+        """Add the clamped integer bounding box of every shape to annotation."""
+        shapes = Annotation.from_shapes(shapes)
+        coords = shapes.coords
+        for i, label_id in enumerate(shapes.label_ids):
+            x_min, y_min, x_max, y_max = LabelFile.clamp_bnd_box(*coords[4 * i:4 * i + 4])
+            annotation.add_box(x_min, y_min, x_max, y_max, shapes.labels[label_id], shapes.difficult[i])
+        return annotation
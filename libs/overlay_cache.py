@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+from libs.image_adjust import adjust_image
+
+
+class _OverlaySignals(QObject):
+    finished = Signal(object, QImage)
+
+
+class _OverlayTask(QRunnable):
+    """Adjust a copy of the image and composite the light overlay on it, off the GUI thread."""
+
+    def __init__(self, key, image, color, adjustment, owner):
+        super(_OverlayTask, self).__init__()
+        self.key = key
+        self.image = image
+        self.color = color
+        self.adjustment = adjustment
+        self.owner = owner
+
+    def run(self):
+        if self.key != self.owner._wanted:
+            # Superseded while queued, e.g. by further slider moves.
+            self.owner._signals.finished.emit(self.key, QImage())
+            return
+        image = self.image
+        if self.adjustment is not None:
+            image = adjust_image(image, self.adjustment)
+        if self.color is not None:
+            image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+            painter = QPainter(image)
+            painter.setCompositionMode(QPainter.CompositionMode_Overlay)
+            painter.fillRect(image.rect(), self.color)
+            painter.end()
+        self.owner._signals.finished.emit(self.key, image)
+
+
+class OverlayCache(QObject):
+    """
+    Display versions of the canvas pixmap, one per light value and image
+    adjustment (see libs.image_adjust).
+
+    ``pixmap(source, color, adjustment)`` returns what the canvas should
+    draw right away: the cached version if there is one, otherwise
+    whatever was shown last while the requested version is made in the
+    thread pool. ``ready`` is emitted once it can be drawn.
+    """
+    ready = Signal()
+
+    def __init__(self, parent=None, max_entries=4):
+        super(OverlayCache, self).__init__(parent)
+        self.max_entries = max_entries
+        self._signals = _OverlaySignals()
+        self._signals.finished.connect(self._finished)
+        self._source_key = None
+        self._source_image = None
+        self._cache = OrderedDict()
+        self._pending = set()
+        self._wanted = None
+        self._shown = None
+        # Lookups for an adjusted version, for the canvas frame stats.
+        self.hits = self.misses = 0
+
+    def _set_source(self, source):
+        self._source_key = source.cacheKey()
+        self._source_image = None
+        self._cache.clear()
+        self._pending.clear()
+        self._shown = source
+
+    def pixmap(self, source, color, adjustment=None):
+        if source.cacheKey() != self._source_key:
+            self._set_source(source)
+        if adjustment is not None and adjustment.is_identity():
+            adjustment = None
+        if color is None and adjustment is None:
+            self._wanted = None
+            self._shown = source
+            return source
+        key = (self._source_key, color.rgba() if color is not None else None, adjustment)
+        self._wanted = key
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            self._shown = cached
+            return cached
+        self.misses += 1
+        if key not in self._pending:
+            if self._source_image is None:
+                self._source_image = source.toImage()
+            self._pending.add(key)
+            QThreadPool.globalInstance().start(_OverlayTask(key, self._source_image, color, adjustment, self))
+        return self._shown
+
+    def _finished(self, key, image):
+        self._pending.discard(key)
+        if key[0] != self._source_key or image.isNull():
+            # Finished after another image was loaded, or skipped.
+            return
+        self._cache[key] = QPixmap.fromImage(image)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        if key == self._wanted:
+            self.ready.emit()
@@ -5,6 +5,7 @@ from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement
 from lxml import etree
 import codecs
+from libs.annotation import Annotation, format_coord
 from libs.constants import DEFAULT_ENCODING
 from libs.ustr import ustr
 
@@ -19,7 +20,7 @@ class PascalVocWriter:
         self.filename = filename
         self.database_src = database_src
         self.img_size = img_size
-        self.box_list = []
+        self.annotation = Annotation(filename, img_size)
         self.local_img_path = local_img_path
         self.verified = False
 
@@ -78,36 +79,35 @@ class PascalVocWriter:
         return top
 
     def add_bnd_box(self, x_min, y_min, x_max, y_max, name, difficult):
-        bnd_box = {'xmin': x_min, 'ymin': y_min, 'xmax': x_max, 'ymax': y_max}
-        bnd_box['name'] = name
-        bnd_box['difficult'] = difficult
-        self.box_list.append(bnd_box)
+        self.annotation.add_box(x_min, y_min, x_max, y_max, name, difficult)
 
     def append_objects(self, top):
-        for each_object in self.box_list:
+        img_height = int(float(self.img_size[0]))
+        img_width = int(float(self.img_size[1]))
+        for label, box_x_min, box_y_min, box_x_max, box_y_max, box_difficult in self.annotation.boxes():
             object_item = SubElement(top, 'object')
             name = SubElement(object_item, 'name')
-            name.text = ustr(each_object['name'])
+            name.text = ustr(label)
             pose = SubElement(object_item, 'pose')
             pose.text = "Unspecified"
             truncated = SubElement(object_item, 'truncated')
-            if int(float(each_object['ymax'])) == int(float(self.img_size[0])) or (int(float(each_object['ymin'])) == 1):
+            if int(box_y_max) == img_height or int(box_y_min) == 1:
                 truncated.text = "1"  # max == height or min
-            elif (int(float(each_object['xmax'])) == int(float(self.img_size[1]))) or (int(float(each_object['xmin'])) == 1):
+            elif int(box_x_max) == img_width or int(box_x_min) == 1:
                 truncated.text = "1"  # max == width or min
             else:
                 truncated.text = "0"
             difficult = SubElement(object_item, 'difficult')
-            difficult.text = str(bool(each_object['difficult']) & 1)
+            difficult.text = str(box_difficult & 1)
             bnd_box = SubElement(object_item, 'bndbox')
             x_min = SubElement(bnd_box, 'xmin')
-            x_min.text = str(each_object['xmin'])
+            x_min.text = format_coord(box_x_min)
             y_min = SubElement(bnd_box, 'ymin')
-            y_min.text = str(each_object['ymin'])
+            y_min.text = format_coord(box_y_min)
             x_max = SubElement(bnd_box, 'xmax')
-            x_max.text = str(each_object['xmax'])
+            x_max.text = format_coord(box_x_max)
             y_max = SubElement(bnd_box, 'ymax')
-            y_max.text = str(each_object['ymax'])
+            y_max.text = format_coord(box_y_max)
 
     def save(self, target_file=None):
         root = self.gen_xml()
@@ -127,9 +127,7 @@ class PascalVocWriter:
 class PascalVocReader:
 
     def __init__(self, file_path):
-        # shapes type:
-        # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
-        self.shapes = []
+        self.annotation = Annotation()
         self.file_path = file_path
         self.verified = False
         try:
@@ -137,28 +135,32 @@ class PascalVocReader:
         except:
             pass
 
+    def get_annotation(self):
+        return self.annotation
+
     def get_shapes(self):
-        return self.shapes
+        return self.annotation.to_shapes()
 
     def add_shape(self, label, bnd_box, difficult):
         x_min = int(float(bnd_box.find('xmin').text))
         y_min = int(float(bnd_box.find('ymin').text))
         x_max = int(float(bnd_box.find('xmax').text))
         y_max = int(float(bnd_box.find('ymax').text))
-        points = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
-        self.shapes.append((label, points, None, None, difficult))
+        self.annotation.add_box(x_min, y_min, x_max, y_max, label, difficult)
 
     def parse_xml(self):
         assert self.file_path.endswith(XML_EXT), "Unsupported file format"
         parser = etree.XMLParser(encoding=ENCODE_METHOD)
         xml_tree = ElementTree.parse(self.file_path, parser=parser).getroot()
         filename = xml_tree.find('filename').text
+        self.annotation.filename = filename
         try:
             verified = xml_tree.attrib['verified']
             if verified == 'yes':
                 self.verified = True
         except KeyError:
             self.verified = False
+        self.annotation.verified = self.verified
 
         for object_iter in xml_tree.findall('object'):
             bnd_box = object_iter.find("bndbox")
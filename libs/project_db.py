@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+
+from libs.annotation import Annotation
+
+DB_EXT = '.db'
+PROJECT_DB_FILENAME = 'labelImg' + DB_EXT
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    verified INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    id INTEGER PRIMARY KEY,
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    class_id INTEGER NOT NULL REFERENCES classes(id),
+    x_min REAL NOT NULL,
+    y_min REAL NOT NULL,
+    x_max REAL NOT NULL,
+    y_max REAL NOT NULL,
+    difficult INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS annotations_image ON annotations(image_id);
+CREATE INDEX IF NOT EXISTS annotations_class ON annotations(class_id);
+CREATE INDEX IF NOT EXISTS images_verified ON images(verified);
+"""
+
+
+def project_db_path(annotation_dir):
+    return os.path.join(annotation_dir, PROJECT_DB_FILENAME)
+
+
+class ProjectDatabase(object):
+    """
+    Images, classes, boxes and verified flags of a whole project in a single
+    SQLite file, as an alternative to one label file per image.
+
+    Images are keyed by their path relative to the database's folder. The
+    database runs in WAL mode, every ``put`` is one transaction (or part of
+    the one of an enclosing ``with database.batch():``), and boxes
+    are indexed by image and by class so loading an image or listing the
+    images of a class never scans the whole project.
+
+    Use ``ProjectDatabase.open(path)`` to share one connection per file in
+    the process.
+    """
+
+    _databases = {}
+    _databases_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.root = os.path.dirname(os.path.abspath(db_path))
+        self._lock = threading.RLock()
+        self._batch = 0
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    @classmethod
+    def open(cls, db_path):
+        # Connections must not be shared with forked worker processes.
+        key = (os.getpid(), os.path.realpath(db_path))
+        with cls._databases_lock:
+            database = cls._databases.get(key)
+            if database is None:
+                database = cls._databases[key] = cls(db_path)
+            return database
+
+    @classmethod
+    def close_all(cls):
+        with cls._databases_lock:
+            databases = [database for (pid, _), database in cls._databases.items() if pid == os.getpid()]
+        for database in databases:
+            database.close()
+
+    def close(self):
+        with self._databases_lock:
+            key = (os.getpid(), os.path.realpath(self.db_path))
+            if self._databases.get(key) is self:
+                del self._databases[key]
+        self.connection.close()
+
+    def image_key(self, image_path):
+        return os.path.relpath(os.path.abspath(image_path), self.root).replace(os.sep, '/')
+
+    def __contains__(self, image_path):
+        with self._lock:
+            row = self.connection.execute('SELECT 1 FROM images WHERE path = ?',
+                                          (self.image_key(image_path),)).fetchone()
+        return row is not None
+
+    def get(self, image_path):
+        """Return the Annotation of image_path, or None if it is not in the project."""
+        key = self.image_key(image_path)
+        with self._lock:
+            image = self.connection.execute(
+                'SELECT id, width, height, depth, verified FROM images WHERE path = ?', (key,)).fetchone()
+            if image is None:
+                return None
+            image_id, width, height, depth, verified = image
+            annotation = Annotation(os.path.basename(image_path), [height, width, depth], bool(verified))
+            for row in self.connection.execute(
+                    'SELECT classes.name, x_min, y_min, x_max, y_max, difficult FROM annotations '
+                    'JOIN classes ON classes.id = annotations.class_id '
+                    'WHERE image_id = ? ORDER BY annotations.id', (image_id,)):
+                name, x_min, y_min, x_max, y_max, difficult = row
+                annotation.add_box(x_min, y_min, x_max, y_max, name, difficult)
+            return annotation
+
+    @contextmanager
+    def batch(self):
+        """Run the puts made inside the block in a single transaction."""
+        with self._lock, self.connection:
+            self._batch += 1
+            try:
+                yield self
+            finally:
+                self._batch -= 1
+
+    def commit(self):
+        """Commit the puts made so far, also inside a batch."""
+        with self._lock:
+            self.connection.commit()
+
+    def put(self, image_path, img_size, annotation, verified=False):
+        """Replace the boxes and verified flag of image_path in one transaction."""
+        key = self.image_key(image_path)
+        depth = img_size[2] if len(img_size) > 2 else 3
+        with self._lock, nullcontext() if self._batch else self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute('INSERT INTO images (path, width, height, depth, verified) VALUES (?, ?, ?, ?, ?) '
+                           'ON CONFLICT(path) DO UPDATE SET width = excluded.width, height = excluded.height, '
+                           'depth = excluded.depth, verified = excluded.verified',
+                           (key, img_size[1], img_size[0], depth, int(bool(verified))))
+            image_id = cursor.execute('SELECT id FROM images WHERE path = ?', (key,)).fetchone()[0]
+            cursor.execute('DELETE FROM annotations WHERE image_id = ?', (image_id,))
+            class_ids = [self._class_id(cursor, label) for label in annotation.labels]
+            coords = annotation.coords
+            cursor.executemany(
+                'INSERT INTO annotations (image_id, class_id, x_min, y_min, x_max, y_max, difficult) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((image_id, class_ids[label_id], coords[4 * i], coords[4 * i + 1], coords[4 * i + 2],
+                  coords[4 * i + 3], annotation.difficult[i])
+                 for i, label_id in enumerate(annotation.label_ids)))
+
+    @staticmethod
+    def _class_id(cursor, name):
+        cursor.execute('INSERT OR IGNORE INTO classes (name) VALUES (?)', (name,))
+        return cursor.execute('SELECT id FROM classes WHERE name = ?', (name,)).fetchone()[0]
+
+    def remove(self, image_path):
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM images WHERE path = ?', (self.image_key(image_path),))
+
+    def classes(self):
+        """Return the class names in the order they were first used."""
+        with self._lock:
+            return [name for name, in self.connection.execute('SELECT name FROM classes ORDER BY id')]
+
+    def images(self, label=None, verified=None):
+        """Return the image paths of the project, optionally only those with label or that verified flag."""
+        query = 'SELECT path FROM images'
+        conditions = []
+        params = []
+        if label is not None:
+            conditions.append('id IN (SELECT image_id FROM annotations JOIN classes '
+                              'ON classes.id = annotations.class_id WHERE classes.name = ?)')
+            params.append(label)
+        if verified is not None:
+            conditions.append('verified = ?')
+            params.append(int(bool(verified)))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        with self._lock:
+            rows = self.connection.execute(query + ' ORDER BY path', params).fetchall()
+        return [os.path.join(self.root, *path.split('/')) for path, in rows]
+
+
+atexit.register(ProjectDatabase.close_all)
+
+
+class ProjectDatabaseWriter:
+    def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown', local_img_path=None):
+        self.folder_name = folder_name
+        self.filename = filename
+        self.database_src = database_src
+        self.img_size = img_size
+        self.local_img_path = local_img_path
+        self.verified = False
+        self.annotation = Annotation.from_shapes(shapes)
+        self.output_file = output_file
+
+    def write(self):
+        ProjectDatabase.open(self.output_file).put(self.local_img_path, self.img_size, self.annotation, self.verified)
+
+
+class ProjectDatabaseReader:
+    def __init__(self, db_path, file_path):
+        self.db_path = db_path
+        self.filename = os.path.basename(file_path)
+        self.annotation = ProjectDatabase.open(db_path).get(file_path)
+        if self.annotation is None:
+            self.annotation = Annotation(self.filename)
+        self.verified = self.annotation.verified
+
+    def get_annotation(self):
+        return self.annotation
+
+    def get_shapes(self):
+        return self.annotation.to_shapes()
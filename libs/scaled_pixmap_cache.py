@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from PySide6.QtCore import QObject, QPointF, QRect, QRunnable, QThreadPool, QTimer, Signal
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+
+class _ScaledSignals(QObject):
+    finished = Signal(object, QRect, QImage)
+
+
+class _ScaleTask(QRunnable):
+    """Render part of the image at the canvas zoom, off the GUI thread."""
+
+    def __init__(self, key, image, area, signals):
+        super(_ScaleTask, self).__init__()
+        self.key = key
+        self.image = image
+        self.area = area
+        self.signals = signals
+
+    def run(self):
+        _, scale, offset = self.key
+        result = QImage(self.area.size(), QImage.Format_ARGB32_Premultiplied)
+        result.fill(0)
+        # The same transform as Canvas.paintEvent, so the result lines up
+        # with the shapes pixel for pixel.
+        painter = QPainter(result)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(-self.area.left(), -self.area.top())
+        painter.scale(scale, scale)
+        painter.translate(QPointF(*offset))
+        painter.drawImage(0, 0, self.image)
+        painter.end()
+        self.signals.finished.emit(self.key, self.area, result)
+
+
+class ScaledPixmapCache(QObject):
+    """
+    The canvas image pre-scaled to the current zoom, for the area around
+    what is visible.
+
+    ``pixmap(source, scale, offset, exposed)`` returns ``(pixmap, area)``
+    when the cached rendering covers the widget rectangle ``exposed``; the
+    canvas then copies it 1:1 instead of smooth-scaling the full image.
+    Otherwise it returns None and the canvas draws the source with a fast
+    transform; ``request`` schedules a rebuild once zooming or scrolling
+    has been quiet for ``delay`` milliseconds, and ``ready`` is emitted
+    when it can be drawn.
+    """
+    ready = Signal()
+
+    def __init__(self, parent=None, delay=150, max_pixels=4096 * 4096):
+        super(ScaledPixmapCache, self).__init__(parent)
+        self.max_pixels = max_pixels
+        self._signals = _ScaledSignals()
+        self._signals.finished.connect(self._finished)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start)
+        self._source_key = None
+        self._source_image = None
+        self._source = None
+        self._key = None
+        self._area = QRect()
+        self._pixmap = None
+        self._wanted = None
+        # Lookups, for the canvas frame stats.
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def make_key(source, scale, offset):
+        return source.cacheKey(), scale, (offset.x(), offset.y())
+
+    def pixmap(self, source, scale, offset, exposed):
+        if self._key == self.make_key(source, scale, offset) and self._area.contains(exposed):
+            self.hits += 1
+            return self._pixmap, self._area
+        self.misses += 1
+        return None
+
+    def request(self, source, scale, offset, area):
+        """Rebuild the cache for area, in widget coordinates, after a quiet period."""
+        key = self.make_key(source, scale, offset)
+        if key == self._key and self._area.contains(area) or (key, area) == self._wanted:
+            return
+        if area.isEmpty() or area.width() * area.height() > self.max_pixels:
+            return
+        if source.cacheKey() != self._source_key:
+            self._source_key = source.cacheKey()
+            self._source_image = None
+        self._source = source
+        self._wanted = key, QRect(area)
+        self._timer.start()
+
+    def clear(self):
+        self._timer.stop()
+        self._source_key = self._source_image = self._source = None
+        self._key = self._wanted = self._pixmap = None
+        self._area = QRect()
+
+    def _start(self):
+        if self._wanted is None or self._wanted[0][0] != self._source_key:
+            return
+        if self._source_image is None:
+            self._source_image = self._source.toImage()
+        key, area = self._wanted
+        QThreadPool.globalInstance().start(_ScaleTask(key, self._source_image, area, self._signals))
+
+    def _finished(self, key, area, image):
+        if self._wanted is None or (key, area) != self._wanted:
+            # Zoom, scroll or image changed while rendering.
+            return
+        self._key, self._area = key, area
+        self._pixmap = QPixmap.fromImage(image)
+        self.ready.emit()
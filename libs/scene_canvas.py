@@ -0,0 +1,794 @@
+from PySide6.QtGui import *
+from PySide6.QtCore import *
+from PySide6.QtWidgets import *
+import time
+
+from libs.canvas import CURSOR_DEFAULT, CURSOR_DRAW, CURSOR_GRAB, CURSOR_MOVE, CURSOR_POINT
+from libs.frame_stats import FrameStats, timed_event
+from libs.overlay_cache import OverlayCache
+from libs.shape import Shape
+from libs.status_throttle import StatusThrottle
+from libs.utils import distance
+
+
+class ShapeItem(QGraphicsItem):
+    """Scene item drawing one Shape; the scene's BSP tree indexes its bounds."""
+
+    def __init__(self, shape, canvas):
+        super(ShapeItem, self).__init__()
+        self.shape_ = shape
+        self.canvas = canvas
+
+    def boundingRect(self):
+        return self.canvas.shape_paint_rect(self.shape_)
+
+    def geometry_changing(self):
+        """Call before the points of the shape change."""
+        self.prepareGeometryChange()
+
+    def paint(self, painter, option, widget=None):
+        canvas, shape = self.canvas, self.shape_
+        if not len(shape) or not canvas.isVisible(shape):
+            return
+        if canvas._hide_background and not shape.selected:
+            return
+        Shape.scale = canvas.view_scale
+        Shape.label_font_size = canvas.label_font_size
+        canvas.painted_items += 1
+        shape.fill = shape.selected or shape == canvas.h_shape
+        if shape.is_tiny():
+            painter.setPen(QPen(shape.pen_color(), Shape.pen_width()))
+            painter.drawRect(shape.bounding_rect())
+        else:
+            shape.paint(painter)
+
+
+class SceneCanvas(QGraphicsView):
+    """
+    Canvas engine on the graphics view framework.
+
+    A drop-in alternative to Canvas with the same signals and methods: the
+    view does the zooming and scrolling, every shape is a ShapeItem in the
+    scene and hit-testing goes through the scene's BSP index. The shape
+    being drawn, the move preview and the crosshair are painted in the
+    foreground.
+    """
+    zoomRequest = Signal(int)
+    lightRequest = Signal(int)
+    scrollRequest = Signal(int, int)
+    newShape = Signal()
+    selectionChanged = Signal(bool)
+    shapeMoved = Signal()
+    drawingPolygon = Signal(bool)
+
+    CREATE, EDIT = list(range(2))
+
+    epsilon = 24.0
+
+    def __init__(self, *args, **kwargs):
+        super(SceneCanvas, self).__init__(*args, **kwargs)
+        self.mode = self.EDIT
+        self.shapes = []
+        self.shape_items = {}
+        self.current = None
+        self.selected_shape = None
+        self.selected_shape_copy = None
+        self.drawing_line_color = QColor(0, 0, 255)
+        self.drawing_rect_color = QColor(0, 0, 255)
+        self.line = Shape(line_color=self.drawing_line_color)
+        self.prev_point = QPointF()
+        self.offsets = QPointF(), QPointF()
+        self.view_scale = 1.0
+        self.overlay_color = None
+        self.adjustment = None
+        self.overlay_cache = OverlayCache(self)
+        self.overlay_cache.ready.connect(self.refresh_pixmap)
+        self._label_widths = {}
+        self.status_throttle = StatusThrottle(self)
+        self.label_font_size = 8
+        self.pixmap = QPixmap()
+        self.visible = {}
+        self._hide_background = False
+        self.hide_background = False
+        self.h_shape = None
+        self.h_vertex = None
+        self._cursor = CURSOR_DEFAULT
+        self.menus = (QMenu(), QMenu())
+        self.verified = False
+        self.draw_square = False
+        self.pan_initial_pos = QPoint()
+        self.stats = None
+        self.painted_items = 0
+        self._hud_timer = QTimer(self)
+        self._hud_timer.setInterval(250)
+        self._hud_timer.timeout.connect(self.viewport().update)
+
+        scene = QGraphicsScene(self)
+        scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.setScene(scene)
+        self.pixmap_item = scene.addPixmap(QPixmap())
+        self.pixmap_item.setZValue(-1)
+        self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+        self.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+        self.setMouseTracking(True)
+        self.viewport().setMouseTracking(True)
+        self.setFocusPolicy(Qt.WheelFocus)
+
+    def set_scale(self, value):
+        """Zoom the view; it is transformed instead of resized like Canvas."""
+        if value == self.view_scale:
+            return
+        # Vertex and label margins are in screen pixels.
+        self.geometry_changing()
+        self.view_scale = value
+        self.setTransform(QTransform.fromScale(value, value))
+
+    def adjustSize(self):
+        """The view scrolls its scene itself; there is nothing to resize."""
+
+    def update(self, *args):
+        """Repaint after changes made from outside: image, light, labels or their visibility."""
+        if not args:
+            self.geometry_changing()
+        self.refresh_pixmap()
+        self.viewport().update(*args)
+
+    def refresh_pixmap(self):
+        pixmap = self.overlay_cache.pixmap(self.pixmap, self.overlay_color, self.adjustment) if self.pixmap else QPixmap()
+        if pixmap.cacheKey() != self.pixmap_item.pixmap().cacheKey():
+            self.pixmap_item.setPixmap(pixmap)
+        self.viewport().update()
+
+    def geometry_changing(self, shape=None):
+        """Call before the painted bounds of shape, or of all shapes, change."""
+        items = self.shape_items.values() if shape is None else [self.shape_items.get(shape)]
+        for item in items:
+            if item is not None:
+                item.geometry_changing()
+
+    def set_drawing_color(self, qcolor):
+        self.drawing_line_color = qcolor
+        self.drawing_rect_color = qcolor
+
+    def enterEvent(self, ev):
+        self.override_cursor(self._cursor)
+
+    def leaveEvent(self, ev):
+        self.restore_cursor()
+
+    def focusOutEvent(self, ev):
+        self.restore_cursor()
+
+    def isVisible(self, shape):
+        return self.visible.get(shape, True)
+
+    def drawing(self):
+        return self.mode == self.CREATE
+
+    def editing(self):
+        return self.mode == self.EDIT
+
+    def set_editing(self, value=True):
+        self.mode = self.EDIT if value else self.CREATE
+        if not value:  # Create
+            self.un_highlight()
+            self.de_select_shape()
+        self.prev_point = QPointF()
+        self.viewport().update()
+
+    def un_highlight(self, shape=None):
+        if shape is None or shape == self.h_shape:
+            if self.h_shape:
+                self.h_shape.highlight_clear()
+                self.update_shape(self.h_shape)
+            self.h_vertex = self.h_shape = None
+
+    def set_highlight(self, shape, vertex=None):
+        if shape is self.h_shape and vertex == self.h_vertex:
+            return
+        if self.h_shape is not None:
+            self.h_shape.highlight_clear()
+            self.update_shape(self.h_shape)
+        self.h_vertex, self.h_shape = vertex, shape
+        if shape is not None:
+            if vertex is not None:
+                shape.highlight_vertex(vertex, shape.MOVE_VERTEX)
+            self.update_shape(shape)
+
+    def selected_vertex(self):
+        return self.h_vertex is not None
+
+    # Geometry and repaint helpers, in scene (image) coordinates.
+
+    def transform_pos(self, point):
+        return self.mapToScene(point)
+
+    def vertex_margin(self):
+        return (Shape.point_size * 2 + 2) / self.view_scale
+
+    def shape_paint_rect(self, shape):
+        if not len(shape):
+            return QRectF()
+        margin = self.vertex_margin()
+        rect = shape.bounding_rect().adjusted(-margin, -margin, margin, margin)
+        if shape.paint_label:
+            size = self.label_font_size * 2.5
+            top_left = shape.bounding_rect().topLeft()
+            rect = rect.united(QRectF(top_left.x(), top_left.y() - size,
+                                      self.label_width(shape.label), 2 * size))
+        return rect
+
+    def label_width(self, label):
+        key = (self.label_font_size, label)
+        width = self._label_widths.get(key)
+        if width is None:
+            font = Shape.label_font(self.label_font_size)
+            width = self._label_widths[key] = QFontMetricsF(font).horizontalAdvance(label or '')
+        return width
+
+    def update_scene_rect(self, rect):
+        self.viewport().update(self.mapFromScene(rect).boundingRect().adjusted(-2, -2, 2, 2))
+
+    def update_shape(self, shape):
+        item = self.shape_items.get(shape)
+        if item is not None:
+            item.update()
+        elif shape is not None and len(shape):
+            self.update_scene_rect(self.shape_paint_rect(shape))
+
+    def update_drawing_area(self):
+        self.update_shape(self.current)
+        self.update_shape(self.line)
+        if not self.prev_point.isNull():
+            margin = 2 / self.view_scale
+            self.update_scene_rect(QRectF(self.prev_point.x() - margin, 0, 2 * margin, self.pixmap.height()))
+            self.update_scene_rect(QRectF(0, self.prev_point.y() - margin, self.pixmap.width(), 2 * margin))
+
+    def shapes_at(self, pos, margin=0.0):
+        """Return the shapes whose item bounds lie within margin of pos, topmost first."""
+        if margin:
+            area = QRectF(pos.x() - margin, pos.y() - margin, 2 * margin, 2 * margin)
+        else:
+            area = pos
+        items = self.scene().items(area, Qt.IntersectsItemBoundingRect, Qt.DescendingOrder)
+        return [item.shape_ for item in items if isinstance(item, ShapeItem)]
+
+    def _add_item(self, shape):
+        item = ShapeItem(shape, self)
+        self.shape_items[shape] = item
+        self.scene().addItem(item)
+
+    def _remove_item(self, shape):
+        item = self.shape_items.pop(shape, None)
+        if item is not None:
+            self.scene().removeItem(item)
+
+    # Mouse and keyboard handling, following Canvas.
+
+    @timed_event
+    def mouseMoveEvent(self, ev):
+        pos = self.transform_pos(ev.pos())
+
+        if getattr(self.window(), 'file_path', None) is not None:
+            self.status_throttle.show('X: %d; Y: %d' % (pos.x(), pos.y()))
+
+        if self.drawing():
+            self.override_cursor(CURSOR_DRAW)
+            self.update_drawing_area()
+            if self.current:
+                current_width = abs(self.current[0].x() - pos.x())
+                current_height = abs(self.current[0].y() - pos.y())
+                self.status_throttle.show(
+                    'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
+
+                color = self.drawing_line_color
+                if self.out_of_pixmap(pos):
+                    size = self.pixmap.size()
+                    pos = QPointF(min(max(0, pos.x()), size.width()), min(max(0, pos.y()), size.height()))
+                elif len(self.current) > 1 and self.close_enough(pos, self.current[0]):
+                    pos = self.current[0]
+                    color = self.current.line_color
+                    self.override_cursor(CURSOR_POINT)
+                    self.current.highlight_vertex(0, Shape.NEAR_VERTEX)
+
+                if self.draw_square:
+                    init_pos = self.current[0]
+                    min_size = min(abs(pos.x() - init_pos.x()), abs(pos.y() - init_pos.y()))
+                    direction_x = -1 if pos.x() - init_pos.x() < 0 else 1
+                    direction_y = -1 if pos.y() - init_pos.y() < 0 else 1
+                    self.line[1] = QPointF(init_pos.x() + direction_x * min_size,
+                                           init_pos.y() + direction_y * min_size)
+                else:
+                    self.line[1] = pos
+
+                self.line.line_color = color
+                self.prev_point = QPointF()
+                self.current.highlight_clear()
+            else:
+                self.prev_point = pos
+            self.update_drawing_area()
+            return
+
+        if Qt.RightButton & ev.buttons():
+            if self.selected_shape_copy and self.prev_point:
+                self.override_cursor(CURSOR_MOVE)
+                self.bounded_move_shape(self.selected_shape_copy, pos)
+            elif self.selected_shape:
+                self.selected_shape_copy = self.selected_shape.copy()
+                self.update_shape(self.selected_shape_copy)
+            return
+
+        if Qt.LeftButton & ev.buttons():
+            if self.selected_vertex():
+                self.bounded_move_vertex(pos)
+                self.shapeMoved.emit()
+            elif self.selected_shape and self.prev_point:
+                self.override_cursor(CURSOR_MOVE)
+                self.bounded_move_shape(self.selected_shape, pos)
+                self.shapeMoved.emit()
+            else:
+                # Pan
+                delta = ev.pos() - self.pan_initial_pos
+                self.pan_initial_pos = ev.pos()
+                h_bar, v_bar = self.horizontalScrollBar(), self.verticalScrollBar()
+                h_bar.setValue(h_bar.value() - delta.x())
+                v_bar.setValue(v_bar.value() - delta.y())
+            return
+
+        # Hovering over the canvas
+        tip, status_tip = "Image", False
+        priority_list = self.shapes_at(pos, self.epsilon)
+        if self.selected_shape in priority_list:
+            priority_list.remove(self.selected_shape)
+            priority_list.insert(0, self.selected_shape)
+        for shape in [s for s in priority_list if self.isVisible(s)]:
+            index = shape.nearest_vertex(pos, self.epsilon)
+            if index is not None:
+                self.set_highlight(shape, index)
+                self.override_cursor(CURSOR_POINT)
+                tip, status_tip = "Click & drag to move point", True
+                break
+            elif shape.contains_point(pos):
+                self.set_highlight(shape)
+                tip, status_tip = "Click & drag to move shape '%s'" % shape.label, True
+                self.override_cursor(CURSOR_GRAB)
+                break
+        else:
+            self.set_highlight(None)
+            self.override_cursor(CURSOR_DEFAULT)
+        self.status_throttle.set_tip(tip, status_tip)
+
+    @timed_event
+    def mousePressEvent(self, ev):
+        pos = self.transform_pos(ev.pos())
+        if ev.button() == Qt.LeftButton:
+            if self.drawing():
+                self.handle_drawing(pos)
+            else:
+                selection = self.select_shape_point(pos)
+                self.prev_point = pos
+                if selection is None:
+                    QApplication.setOverrideCursor(QCursor(Qt.OpenHandCursor))
+                    self.pan_initial_pos = ev.pos()
+        elif ev.button() == Qt.RightButton and self.editing():
+            self.select_shape_point(pos)
+            self.prev_point = pos
+
+    @timed_event
+    def mouseReleaseEvent(self, ev):
+        if ev.button() == Qt.RightButton:
+            menu = self.menus[bool(self.selected_shape_copy)]
+            self.restore_cursor()
+            if not menu.exec_(self.mapToGlobal(ev.pos())) and self.selected_shape_copy:
+                self.update_shape(self.selected_shape_copy)
+                self.selected_shape_copy = None
+        elif ev.button() == Qt.LeftButton and self.selected_shape:
+            self.override_cursor(CURSOR_POINT if self.selected_vertex() else CURSOR_GRAB)
+        elif ev.button() == Qt.LeftButton and not self.drawing():
+            QApplication.restoreOverrideCursor()
+
+    def mouseDoubleClickEvent(self, ev):
+        if self.can_close_shape() and len(self.current) > 3:
+            self.current.pop_point()
+            self.finalise()
+
+    @timed_event
+    def wheelEvent(self, ev):
+        v_delta = ev.angleDelta().y()
+        mods = ev.modifiers()
+        if int(Qt.ControlModifier) | int(Qt.ShiftModifier) == int(mods) and v_delta:
+            self.lightRequest.emit(v_delta)
+            ev.accept()
+        elif Qt.ControlModifier == int(mods) and v_delta:
+            self.zoomRequest.emit(v_delta)
+            ev.accept()
+        else:
+            super(SceneCanvas, self).wheelEvent(ev)
+
+    @timed_event
+    def keyPressEvent(self, ev):
+        key = ev.key()
+        if key == Qt.Key_Escape and self.current:
+            self.update_drawing_area()
+            self.current = None
+            self.drawingPolygon.emit(False)
+        elif key == Qt.Key_Return and self.can_close_shape():
+            self.finalise()
+        elif key in self.KEY_DIRECTIONS and self.selected_shape:
+            self.move_one_pixel(self.KEY_DIRECTIONS[key])
+
+    KEY_DIRECTIONS = {Qt.Key_Left: 'Left', Qt.Key_Right: 'Right', Qt.Key_Up: 'Up', Qt.Key_Down: 'Down'}
+
+    # Editing operations, as in Canvas.
+
+    def handle_drawing(self, pos):
+        if self.current and self.current.reach_max_points() is False:
+            init_pos = self.current[0]
+            target_pos = self.line[1]
+            self.current.add_point(QPointF(target_pos.x(), init_pos.y()))
+            self.current.add_point(target_pos)
+            self.current.add_point(QPointF(init_pos.x(), target_pos.y()))
+            self.finalise()
+        elif not self.out_of_pixmap(pos):
+            self.current = Shape()
+            self.current.add_point(pos)
+            self.line.points = [pos, pos]
+            self.set_hiding()
+            self.drawingPolygon.emit(True)
+            self.viewport().update()
+
+    def finalise(self):
+        assert self.current
+        self.update_drawing_area()
+        if self.current.points[0] == self.current.points[-1]:
+            self.current = None
+            self.drawingPolygon.emit(False)
+            return
+        self.current.close()
+        self.shapes.append(self.current)
+        self._add_item(self.current)
+        self.current = None
+        self.set_hiding(False)
+        self.newShape.emit()
+        self.viewport().update()
+
+    def can_close_shape(self):
+        return self.drawing() and self.current and len(self.current) > 2
+
+    def close_enough(self, p1, p2):
+        return distance(p1 - p2) < self.epsilon
+
+    def out_of_pixmap(self, p):
+        w, h = self.pixmap.width(), self.pixmap.height()
+        return not (0 <= p.x() <= w and 0 <= p.y() <= h)
+
+    def set_hiding(self, enable=True):
+        self._hide_background = self.hide_background if enable else False
+
+    def hide_background_shapes(self, value):
+        self.hide_background = value
+        if self.selected_shape:
+            self.set_hiding(True)
+            self.viewport().update()
+
+    def select_shape(self, shape):
+        self.de_select_shape()
+        shape.selected = True
+        self.selected_shape = shape
+        self.set_hiding()
+        self.selectionChanged.emit(True)
+        if self._hide_background:
+            self.viewport().update()
+        else:
+            self.update_shape(shape)
+
+    # The scene engine keeps a single selection; these follow the Canvas API.
+    @property
+    def selected_shapes(self):
+        return [self.selected_shape] if self.selected_shape else []
+
+    def select_shapes(self, shapes):
+        if shapes:
+            self.select_shape(shapes[-1])
+        else:
+            self.de_select_shape()
+
+    def select_shape_point(self, point):
+        """Select the first shape created which contains this point."""
+        self.de_select_shape()
+        if self.selected_vertex():
+            index, shape = self.h_vertex, self.h_shape
+            shape.highlight_vertex(index, shape.MOVE_VERTEX)
+            self.select_shape(shape)
+            return self.h_vertex
+        for shape in self.shapes_at(point):
+            if self.isVisible(shape) and shape.contains_point(point):
+                self.select_shape(shape)
+                self.calculate_offsets(shape, point)
+                return self.selected_shape
+        return None
+
+    def calculate_offsets(self, shape, point):
+        rect = shape.bounding_rect()
+        self.offsets = (QPointF(rect.x() - point.x(), rect.y() - point.y()),
+                        QPointF(rect.x() + rect.width() - point.x(), rect.y() + rect.height() - point.y()))
+
+    def snap_point_to_canvas(self, x, y):
+        """
+        Moves a point x,y to within the boundaries of the canvas.
+        :return: (x,y,snapped) where snapped is True if x or y were changed, False if not.
+        """
+        if x < 0 or x > self.pixmap.width() or y < 0 or y > self.pixmap.height():
+            x = min(max(x, 0), self.pixmap.width())
+            y = min(max(y, 0), self.pixmap.height())
+            return x, y, True
+        return x, y, False
+
+    def bounded_move_vertex(self, pos):
+        index, shape = self.h_vertex, self.h_shape
+        point = shape[index]
+        if self.out_of_pixmap(pos):
+            size = self.pixmap.size()
+            pos = QPointF(min(max(0, pos.x()), size.width()), min(max(0, pos.y()), size.height()))
+
+        if self.draw_square:
+            opposite_point = shape[(index + 2) % 4]
+            min_size = min(abs(pos.x() - opposite_point.x()), abs(pos.y() - opposite_point.y()))
+            direction_x = -1 if pos.x() - opposite_point.x() < 0 else 1
+            direction_y = -1 if pos.y() - opposite_point.y() < 0 else 1
+            shift_pos = QPointF(opposite_point.x() + direction_x * min_size - point.x(),
+                                opposite_point.y() + direction_y * min_size - point.y())
+        else:
+            shift_pos = pos - point
+
+        # Keep the box rectangular: the neighbours follow along one axis each.
+        if index % 2 == 0:
+            right_shift, left_shift = QPointF(shift_pos.x(), 0), QPointF(0, shift_pos.y())
+        else:
+            left_shift, right_shift = QPointF(shift_pos.x(), 0), QPointF(0, shift_pos.y())
+
+        self.geometry_changing(shape)
+        shape.move_vertex_by(index, shift_pos)
+        shape.move_vertex_by((index + 3) % 4, right_shift)
+        shape.move_vertex_by((index + 1) % 4, left_shift)
+        self.update_shape(shape)
+
+    def bounded_move_shape(self, shape, pos):
+        if self.out_of_pixmap(pos):
+            return False
+        o1 = pos + self.offsets[0]
+        if self.out_of_pixmap(o1):
+            pos -= QPointF(min(0, o1.x()), min(0, o1.y()))
+        o2 = pos + self.offsets[1]
+        if self.out_of_pixmap(o2):
+            pos += QPointF(min(0, self.pixmap.width() - o2.x()),
+                           min(0, self.pixmap.height() - o2.y()))
+        dp = pos - self.prev_point
+        if dp:
+            self.update_shape(shape)
+            self.geometry_changing(shape)
+            shape.move_by(dp)
+            self.update_shape(shape)
+            self.prev_point = pos
+            return True
+        return False
+
+    def end_move(self, copy=False):
+        assert self.selected_shape and self.selected_shape_copy
+        shape = self.selected_shape_copy
+        if copy:
+            self.shapes.append(shape)
+            self._add_item(shape)
+            self.selected_shape.selected = False
+            self.update_shape(self.selected_shape)
+            self.selected_shape = shape
+            self.update_shape(shape)
+        else:
+            self.update_shape(shape)
+            self.geometry_changing(self.selected_shape)
+            self.selected_shape.points = shape.points
+            self.update_shape(self.selected_shape)
+        self.selected_shape_copy = None
+
+    def de_select_shape(self):
+        if self.selected_shape:
+            self.selected_shape.selected = False
+            self.viewport().update() if self._hide_background else self.update_shape(self.selected_shape)
+            self.selected_shape = None
+            self.set_hiding(False)
+            self.selectionChanged.emit(False)
+
+    def delete_selected(self):
+        if self.selected_shape:
+            shape = self.selected_shape
+            self.un_highlight(shape)
+            self.shapes.remove(shape)
+            self._remove_item(shape)
+            self.selected_shape = None
+            return [shape]
+        return []
+
+    def copy_selected_shape(self):
+        if self.selected_shape:
+            shape = self.selected_shape.copy()
+            self.de_select_shape()
+            self.shapes.append(shape)
+            self._add_item(shape)
+            shape.selected = True
+            self.selected_shape = shape
+            # Shift the copy so it does not hide the original.
+            point = shape[0]
+            offset = QPointF(2.0, 2.0)
+            self.calculate_offsets(shape, point)
+            self.prev_point = point
+            if not self.bounded_move_shape(shape, point - offset):
+                self.bounded_move_shape(shape, point + offset)
+            return shape
+
+    def move_one_pixel(self, direction):
+        step = {'Left': QPointF(-1.0, 0), 'Right': QPointF(1.0, 0),
+                'Up': QPointF(0, -1.0), 'Down': QPointF(0, 1.0)}[direction]
+        points = [p + step for p in self.selected_shape.points]
+        if not any(map(self.out_of_pixmap, points)):
+            self.geometry_changing(self.selected_shape)
+            self.selected_shape.move_by(step)
+            self.update_shape(self.selected_shape)
+        self.shapeMoved.emit()
+
+    def set_last_label(self, text, line_color=None, fill_color=None):
+        assert text
+        shape = self.shapes[-1]
+        self.geometry_changing(shape)
+        shape.label = text
+        if line_color:
+            shape.line_color = line_color
+        if fill_color:
+            shape.fill_color = fill_color
+        self.update_shape(shape)
+        return shape
+
+    def undo_last_line(self):
+        assert self.shapes
+        self.current = self.shapes.pop()
+        self._remove_item(self.current)
+        self.current.set_open()
+        self.line.points = [self.current[-1], self.current[0]]
+        self.drawingPolygon.emit(True)
+
+    def reset_all_lines(self):
+        self.undo_last_line()
+        self.current = None
+        self.drawingPolygon.emit(False)
+        self.viewport().update()
+
+    def load_pixmap(self, pixmap):
+        self.pixmap = pixmap
+        self.load_shapes([])
+        self.scene().setSceneRect(QRectF(pixmap.rect()))
+        self.update()
+
+    def load_shapes(self, shapes):
+        for shape in list(self.shape_items):
+            self._remove_item(shape)
+        self.shapes = list(shapes)
+        for shape in self.shapes:
+            self._add_item(shape)
+        self.current = None
+        self.update()
+
+    def load_boxes(self, boxes):
+        """
+        Replace the shapes with new closed ones, built from (label, points,
+        difficult) tuples and snapped into the image.
+        :return: (shapes, snapped) where snapped is True if any point was moved.
+        """
+        shapes = []
+        snapped = False
+        for label, points, difficult in boxes:
+            shape = Shape(label=label, difficult=difficult)
+            for x, y in points:
+                x, y, moved = self.snap_point_to_canvas(x, y)
+                snapped = snapped or moved
+                shape.add_point(QPointF(x, y))
+            shape.close()
+            shapes.append(shape)
+        self.load_shapes(shapes)
+        return shapes, snapped
+
+    def set_shape_visible(self, shape, value):
+        self.visible[shape] = value
+        self.update_shape(shape)
+
+    def current_cursor(self):
+        cursor = QApplication.overrideCursor()
+        if cursor is not None:
+            cursor = cursor.shape()
+        return cursor
+
+    def override_cursor(self, cursor):
+        self._cursor = cursor
+        if self.current_cursor() is None:
+            QApplication.setOverrideCursor(cursor)
+        else:
+            QApplication.changeOverrideCursor(cursor)
+
+    def restore_cursor(self):
+        QApplication.restoreOverrideCursor()
+
+    def reset_state(self):
+        self.de_select_shape()
+        self.un_highlight()
+        self.selected_shape_copy = None
+        self.restore_cursor()
+        self.pixmap = QPixmap()
+        self.load_shapes([])
+        self.update()
+
+    def set_drawing_shape_to_square(self, status):
+        self.draw_square = status
+
+    # Painting: the items paint themselves, the rest is drawn here.
+
+    def paintEvent(self, event):
+        if self.stats is None:
+            return super(SceneCanvas, self).paintEvent(event)
+        start = time.perf_counter()
+        self.painted_items = 0
+        super(SceneCanvas, self).paintEvent(event)
+        self.stats.add_paint(time.perf_counter() - start, self.painted_items,
+                             len(self.shapes) - self.painted_items)
+        painter = QPainter(self.viewport())
+        self.paint_hud(painter)
+        painter.end()
+
+    def set_hud(self, enabled):
+        """Show or hide the frame-time HUD; timings are only taken while it is shown."""
+        if enabled == (self.stats is not None):
+            return
+        if enabled:
+            self.stats = FrameStats({'overlay': self.overlay_cache})
+            self._hud_timer.start()
+        else:
+            self.stats = None
+            self._hud_timer.stop()
+        self.viewport().update()
+
+    def paint_hud(self, painter):
+        """Draw the HUD over the top left of the viewport."""
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        metrics = QFontMetrics(font)
+        lines = self.stats.hud_lines()
+        width = max(metrics.horizontalAdvance(line) for line in lines)
+        rect = QRect(0, 0, width + 12, metrics.height() * len(lines) + 8)
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setFont(font)
+        painter.setPen(QColor(255, 255, 255))
+        y = rect.top() + 4 + metrics.ascent()
+        for line in lines:
+            painter.drawText(rect.left() + 6, y, line)
+            y += metrics.height()
+
+    def drawBackground(self, painter, rect):
+        painter.fillRect(rect, QColor(184, 239, 38, 128) if self.verified else QColor(232, 232, 232, 255))
+
+    def drawForeground(self, painter, rect):
+        if not self.pixmap:
+            return
+        Shape.scale = self.view_scale
+        Shape.label_font_size = self.label_font_size
+        if self.current:
+            self.current.paint(painter)
+            self.line.paint(painter)
+        if self.selected_shape_copy:
+            self.selected_shape_copy.paint(painter)
+
+        if self.current is not None and len(self.line) == 2:
+            left_top, right_bottom = self.line[0], self.line[1]
+            painter.setPen(self.drawing_rect_color)
+            painter.setBrush(QBrush(Qt.BDiagPattern))
+            painter.drawRect(QRectF(left_top, right_bottom))
+
+        if self.drawing() and not self.prev_point.isNull() and not self.out_of_pixmap(self.prev_point):
+            painter.setPen(QColor(0, 0, 0))
+            painter.drawLine(QPointF(self.prev_point.x(), 0), QPointF(self.prev_point.x(), self.pixmap.height()))
+            painter.drawLine(QPointF(0, self.prev_point.y()), QPointF(self.pixmap.width(), self.prev_point.y()))
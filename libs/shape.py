@@ -1,13 +1,12 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-
+import math
+from array import array
 
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 
-from libs.utils import distance
-import sys
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -18,14 +17,21 @@ DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 
 
 class Shape(object):
+    """
+    A labelled box or polygon. Shapes are kept by the hundred thousand, so
+    an instance has no ``__dict__``: its points live in one flat array of
+    x, y doubles and become ``QPointF`` objects only when Qt needs them.
+    Inside a ShapeStore the points, label and flags live in the store's
+    columns instead, and the shape is a view on its row.
+    """
     P_SQUARE, P_ROUND = range(2)
 
     MOVE_VERTEX, NEAR_VERTEX = range(2)
 
     # The following class variables influence the drawing
     # of _all_ shape objects.
-    line_color = DEFAULT_LINE_COLOR
-    fill_color = DEFAULT_FILL_COLOR
+    default_line_color = DEFAULT_LINE_COLOR
+    default_fill_color = DEFAULT_FILL_COLOR
     select_line_color = DEFAULT_SELECT_LINE_COLOR
     select_fill_color = DEFAULT_SELECT_FILL_COLOR
     vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
@@ -34,10 +40,34 @@ class Shape(object):
     point_size = 16
     scale = 1.0
     label_font_size = 8
+    # Level of detail: on-screen sizes, in pixels, below which closed shapes
+    # are drawn without vertex handles, without a label, or by the canvas
+    # as a plain batched rectangle. Selected and highlighted shapes keep
+    # every detail. The main window sets them from the settings.
+    min_vertex_size = 8
+    min_label_size = 16
+    min_outline_size = 4
+    # Shared label resources: the font per point size, and each label text
+    # laid out once per (text, size) as a QStaticText with its ascent.
+    _label_fonts = {}
+    _label_texts = {}
+    max_label_texts = 4096
+    # Vertex marker size factor and type per highlight mode.
+    _highlight_settings = {
+        NEAR_VERTEX: (4, P_ROUND),
+        MOVE_VERTEX: (1.5, P_SQUARE),
+    }
+
+    __slots__ = ('_label', 'fill', 'selected', '_difficult', '_paint_label', '_line_color', '_fill_color',
+                 '_coords', '_closed', '_highlight_index', '_highlight_mode', '_store', '_row',
+                 '_path', '_line_path', '_rect', '_vertex_path', '_vertex_key')
 
     def __init__(self, label=None, line_color=None, difficult=False, paint_label=False):
+        self._store = None
+        self._row = 0
         self.label = label
-        self.points = []
+        self._coords = array('d')
+        self._invalidate()
         self.fill = False
         self.selected = False
         self.difficult = difficult
@@ -45,34 +75,130 @@ class Shape(object):
 
         self._highlight_index = None
         self._highlight_mode = self.NEAR_VERTEX
-        self._highlight_settings = {
-            self.NEAR_VERTEX: (4, self.P_ROUND),
-            self.MOVE_VERTEX: (1.5, self.P_SQUARE),
-        }
 
         self._closed = False
 
-        if line_color is not None:
-            # Override the class line_color attribute
-            # with an object attribute. Currently this
-            # is used for drawing the pending line a different color.
-            self.line_color = line_color
+        # None follows default_line_color and default_fill_color. An own
+        # line color is currently used for drawing the pending line a
+        # different color.
+        self._line_color = line_color
+        self._fill_color = None
+
+    @property
+    def label(self):
+        if self._store is None:
+            return self._label
+        return self._store.label_of(self._row)
+
+    @label.setter
+    def label(self, label):
+        if self._store is None:
+            self._label = label
+        else:
+            self._store.set_label(self._row, label)
+
+    @property
+    def difficult(self):
+        if self._store is None:
+            return self._difficult
+        return self._store.flag(self._row, self._store.DIFFICULT)
+
+    @difficult.setter
+    def difficult(self, value):
+        if self._store is None:
+            self._difficult = value
+        else:
+            self._store.set_flag(self._row, self._store.DIFFICULT, value)
+
+    @property
+    def paint_label(self):
+        if self._store is None:
+            return self._paint_label
+        return self._store.flag(self._row, self._store.PAINT_LABEL)
+
+    @paint_label.setter
+    def paint_label(self, value):
+        if self._store is None:
+            self._paint_label = value
+        else:
+            self._store.set_flag(self._row, self._store.PAINT_LABEL, value)
+
+    @property
+    def line_color(self):
+        return self.default_line_color if self._line_color is None else self._line_color
+
+    @line_color.setter
+    def line_color(self, color):
+        self._line_color = color
+
+    @property
+    def fill_color(self):
+        return self.default_fill_color if self._fill_color is None else self._fill_color
+
+    @fill_color.setter
+    def fill_color(self, color):
+        self._fill_color = color
+
+    @property
+    def points(self):
+        # A new list on every call: change points through the Shape
+        # methods, or assign a new list.
+        c = self._coords
+        return [QPointF(c[i], c[i + 1]) for i in range(0, len(c), 2)]
+
+    @points.setter
+    def points(self, points):
+        self._set_coords([v for p in points for v in (p.x(), p.y())])
+
+    def _set_coords(self, coords):
+        if self._store is None:
+            self._coords = array('d', coords)
+        else:
+            self._store.set_coords(self, coords)
+        self._invalidate()
+
+    def coords(self):
+        """Return the flat x, y array of the points; treat it as read only."""
+        return self._coords
+
+    def _invalidate(self):
+        """Drop the cached geometry after the points changed."""
+        self._path = None
+        self._line_path = None
+        self._rect = None
+        self._vertex_path = None
+        self._vertex_key = None
+        if self._store is not None:
+            self._store.refresh(self)
 
     def close(self):
         self._closed = True
+        self._line_path = None
 
     def reach_max_points(self):
-        if len(self.points) >= 4:
+        if len(self) >= 4:
             return True
         return False
 
     def add_point(self, point):
-        if not self.reach_max_points():
-            self.points.append(point)
+        if self.reach_max_points():
+            return
+        if self._store is None:
+            self._coords.append(point.x())
+            self._coords.append(point.y())
+            self._invalidate()
+        else:
+            self._set_coords(list(self._coords) + [point.x(), point.y()])
 
     def pop_point(self):
-        if self.points:
-            return self.points.pop()
+        if self._coords:
+            x, y = self._coords[-2], self._coords[-1]
+            if self._store is None:
+                del self._coords[-2:]
+                self._invalidate()
+            else:
+                self._set_coords(self._coords[:-2])
+            return QPointF(x, y)
         return None
 
     def is_closed(self):
@@ -80,79 +206,167 @@ class Shape(object):
 
     def set_open(self):
         self._closed = False
+        self._line_path = None
 
     def paint(self, painter):
-        if self.points:
-            color = self.select_line_color if self.selected else self.line_color
-            pen = QPen(color)
+        if self._coords:
+            pen = QPen(self.pen_color())
             # Try using integer sizes for smoother drawing(?)
-            pen.setWidth(max(1, int(round(2.0 / self.scale))))
+            pen.setWidth(self.pen_width())
             painter.setPen(pen)
 
-            line_path = QPainterPath()
-            vertex_path = QPainterPath()
-
-            line_path.moveTo(self.points[0])
-            # Uncommenting the following line will draw 2 paths
-            # for the 1st vertex, and make it non-filled, which
-            # may be desirable.
-            # self.drawVertex(vertex_path, 0)
-
-            for i, p in enumerate(self.points):
-                line_path.lineTo(p)
-                self.draw_vertex(vertex_path, i)
-            if self.is_closed():
-                line_path.lineTo(self.points[0])
-
+            line_path = self.line_path()
             painter.drawPath(line_path)
-            painter.drawPath(vertex_path)
-            painter.fillPath(vertex_path, self.vertex_fill_color)
+
+            if self.show_vertices():
+                vertex_path = self.vertex_path()
+                painter.drawPath(vertex_path)
+                painter.fillPath(vertex_path, self.vertex_color())
 
             # Draw text at the top-left
-            if self.paint_label:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                min_y_label = int(1.25 * self.label_font_size)
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(self.label_font_size)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    if self.label is None:
-                        self.label = ""
-                    if min_y < min_y_label:
-                        min_y += min_y_label
-                    painter.drawText(int(min_x), int(min_y), self.label)
+            if self.show_label():
+                painter.setFont(self.label_font())
+                if self.label is None:
+                    self.label = ""
+                self.draw_label(painter)
 
             if self.fill:
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
+    def pen_color(self):
+        return self.select_line_color if self.selected else self.line_color
+
+    @classmethod
+    def pen_width(cls):
+        return max(1, int(round(2.0 / cls.scale)))
+
+    def highlighted(self):
+        return self._highlight_index is not None
+
+    def vertex_color(self):
+        if self._highlight_index is not None:
+            return self.h_vertex_fill_color
+        return self.vertex_fill_color
+
+    @classmethod
+    def label_font(cls, size=None):
+        size = cls.label_font_size if size is None else size
+        font = cls._label_fonts.get(size)
+        if font is None:
+            font = QFont()
+            font.setPointSize(size)
+            font.setBold(True)
+            cls._label_fonts[size] = font
+        return font
+
+    @classmethod
+    def label_text(cls, label):
+        """Return label laid out in the label font as a QStaticText, and the font ascent."""
+        key = (label, cls.label_font_size)
+        cached = cls._label_texts.get(key)
+        if cached is None:
+            if len(cls._label_texts) >= cls.max_label_texts:
+                cls._label_texts.clear()
+            font = cls.label_font()
+            text = QStaticText(label)
+            text.setTextFormat(Qt.PlainText)
+            text.prepare(QTransform(), font)
+            cached = cls._label_texts[key] = text, QFontMetricsF(font).ascent()
+        return cached
+
+    def draw_label(self, painter):
+        """Draw the label with its baseline at label_anchor; the painter must use label_font."""
+        text, ascent = self.label_text(self.label or "")
+        anchor = self.label_anchor()
+        painter.drawStaticText(QPointF(anchor.x(), anchor.y() - ascent), text)
+
+    def label_anchor(self):
+        """Return the baseline origin of the label: the top-left point, moved
+        down when the text would not fit above the image."""
+        c = self._coords
+        min_x = min(c[0::2])
+        min_y = min(c[1::2])
+        min_y_label = int(1.25 * self.label_font_size)
+        if min_y < min_y_label:
+            min_y += min_y_label
+        return QPoint(int(min_x), int(min_y))
+
+    def show_vertices(self):
+        return self.screen_size() >= self.min_vertex_size or self.full_detail()
+
+    def show_label(self):
+        return self.paint_label and (self.screen_size() >= self.min_label_size or self.full_detail())
+
+    def screen_size(self):
+        """Return the larger side of the bounding box in screen pixels."""
+        rect = self.bounding_rect()
+        return max(rect.width(), rect.height()) * self.scale
+
+    def full_detail(self):
+        """Shapes being drawn, selected or hovered are never simplified."""
+        return not self.is_closed() or self.selected or self.fill or self._highlight_index is not None
+
+    def is_tiny(self):
+        """True when the shape can be drawn as a plain rectangle outline."""
+        return self.screen_size() < self.min_outline_size and not self.full_detail()
+
+    def is_box(self):
+        """True for a closed, axis-aligned rectangle, which can be drawn with drawRect."""
+        if len(self._coords) != 8 or not self._closed:
+            return False
+        x0, y0, x1, y1, x2, y2, x3, y3 = self._coords
+        return ((y0 == y1 and x1 == x2 and y2 == y3 and x3 == x0) or
+                (x0 == x1 and y1 == y2 and x2 == x3 and y3 == y0))
+
+    def line_path(self):
+        """Return the outline drawn by paint, cached until the points change."""
+        if self._line_path is None:
+            c = self._coords
+            line_path = QPainterPath()
+            line_path.moveTo(c[0], c[1])
+            for i in range(0, len(c), 2):
+                line_path.lineTo(c[i], c[i + 1])
+            if self.is_closed():
+                line_path.lineTo(c[0], c[1])
+            self._line_path = line_path
+        return self._line_path
+
+    def vertex_path(self):
+        """Return the vertex markers, cached per scale and highlighted vertex."""
+        key = (self.scale, self.point_size, self.point_type, self._highlight_index, self._highlight_mode)
+        if self._vertex_path is None or self._vertex_key != key:
+            vertex_path = QPainterPath()
+            # Uncommenting the following line will draw 2 paths
+            # for the 1st vertex, and make it non-filled, which
+            # may be desirable.
+            # self.drawVertex(vertex_path, 0)
+            for i in range(len(self)):
+                self.draw_vertex(vertex_path, i)
+            self._vertex_path = vertex_path
+            self._vertex_key = key
+        return self._vertex_path
+
     def draw_vertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
-        point = self.points[i]
+        x, y = self._coords[2 * i], self._coords[2 * i + 1]
         if i == self._highlight_index:
             size, shape = self._highlight_settings[self._highlight_mode]
             d *= size
-        if self._highlight_index is not None:
-            self.vertex_fill_color = self.h_vertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
-            path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
+            path.addRect(x - d / 2, y - d / 2, d, d)
         elif shape == self.P_ROUND:
-            path.addEllipse(point, d / 2.0, d / 2.0)
+            path.addEllipse(QPointF(x, y), d / 2.0, d / 2.0)
         else:
             assert False, "unsupported vertex shape"
 
     def nearest_vertex(self, point, epsilon):
         index = None
-        for i, p in enumerate(self.points):
-            dist = distance(p - point)
+        c = self._coords
+        px, py = point.x(), point.y()
+        for i in range(len(c) // 2):
+            dist = math.hypot(c[2 * i] - px, c[2 * i + 1] - py)
             if dist <= epsilon:
                 index = i
                 epsilon = dist
@@ -162,19 +376,51 @@ class Shape(object):
         return self.make_path().contains(point)
 
     def make_path(self):
-        path = QPainterPath(self.points[0])
-        for p in self.points[1:]:
-            path.lineTo(p)
-        return path
+        if self._path is None:
+            c = self._coords
+            path = QPainterPath(QPointF(c[0], c[1]))
+            for i in range(2, len(c), 2):
+                path.lineTo(c[i], c[i + 1])
+            self._path = path
+        return self._path
 
     def bounding_rect(self):
-        return self.make_path().boundingRect()
+        if self._rect is None:
+            c = self._coords
+            xs, ys = c[0::2], c[1::2]
+            x_min, y_min = min(xs), min(ys)
+            self._rect = QRectF(x_min, y_min, max(xs) - x_min, max(ys) - y_min)
+        return self._rect
 
     def move_by(self, offset):
-        self.points = [p + offset for p in self.points]
+        dx, dy = offset.x(), offset.y()
+        c = self._coords
+        for i in range(0, len(c), 2):
+            c[i] += dx
+            c[i + 1] += dy
+        self._translate(dx, dy)
+        if self._store is not None:
+            self._store.refresh(self)
+
+    def _translate(self, dx, dy):
+        """
+        Carry the cached geometry along after the points moved by (dx, dy)
+        instead of rebuilding it, so moving many selected shapes stays cheap.
+        """
+        if self._path is not None:
+            self._path = self._path.translated(dx, dy)
+        if self._line_path is not None:
+            self._line_path = self._line_path.translated(dx, dy)
+        if self._rect is not None:
+            self._rect = self._rect.translated(dx, dy)
+        if self._vertex_path is not None:
+            self._vertex_path = self._vertex_path.translated(dx, dy)
 
     def move_vertex_by(self, i, offset):
-        self.points[i] = self.points[i] + offset
+        i = self._index(i)
+        self._coords[2 * i] += offset.x()
+        self._coords[2 * i + 1] += offset.y()
+        self._invalidate()
 
     def highlight_vertex(self, i, action):
         self._highlight_index = i
@@ -185,22 +431,39 @@ class Shape(object):
 
     def copy(self):
         shape = Shape("%s" % self.label)
-        shape.points = [p for p in self.points]
+        shape._coords = array('d', self._coords)
+        # Paths and rects are implicitly shared values, so the copy reuses
+        # the cached geometry until either shape changes.
+        shape._path = self._path
+        shape._line_path = self._line_path
+        shape._rect = self._rect
         shape.fill = self.fill
         shape.selected = self.selected
         shape._closed = self._closed
-        if self.line_color != Shape.line_color:
-            shape.line_color = self.line_color
-        if self.fill_color != Shape.fill_color:
-            shape.fill_color = self.fill_color
+        shape._line_color = self._line_color
+        shape._fill_color = self._fill_color
         shape.difficult = self.difficult
         return shape
 
+    def _index(self, i):
+        n = len(self._coords) // 2
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('point index out of range')
+        return i
+
     def __len__(self):
-        return len(self.points)
+        return len(self._coords) // 2
 
     def __getitem__(self, key):
-        return self.points[key]
+        if isinstance(key, slice):
+            return self.points[key]
+        i = self._index(key)
+        return QPointF(self._coords[2 * i], self._coords[2 * i + 1])
 
     def __setitem__(self, key, value):
-        self.points[key] = value
+        i = self._index(key)
+        self._coords[2 * i] = value.x()
+        self._coords[2 * i + 1] = value.y()
+        self._invalidate()
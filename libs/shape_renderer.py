@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import math
+
+from PySide6.QtCore import QPointF, Qt
+from PySide6.QtGui import QColor, QPainter, QPainterPath, QPen, QPixmap
+
+from libs.shape import Shape
+
+
+class ShapeRenderer(object):
+    """
+    Paint many shapes with a few draw calls.
+
+    Shapes are grouped by line colour, so pens and the label font are
+    created once per frame. Boxes go out in one drawRects call per colour,
+    shapes a few pixels across included. Vertex handles are rendered once
+    into a sprite per line and fill colour and stamped as pixmaps. Filled
+    (selected or hovered) and highlighted shapes are painted last through
+    Shape.paint, so they stay on top as before.
+    """
+
+    SUBPIXEL_STEPS = 4
+
+    def __init__(self):
+        self._sprites = {}
+
+    def paint(self, painter, shapes):
+        tiny = {}
+        outlines = {}
+        vertices = {}
+        labels = {}
+        detailed = []
+        for shape in shapes:
+            if not len(shape):
+                continue
+            if shape.fill or shape.highlighted():
+                detailed.append(shape)
+                continue
+            line_rgba = shape.pen_color().rgba()
+            if shape.is_tiny():
+                tiny.setdefault(line_rgba, []).append(shape.bounding_rect())
+                continue
+            outlines.setdefault(line_rgba, []).append(shape)
+            if shape.show_vertices():
+                vertices.setdefault((line_rgba, shape.vertex_color().rgba()), []).append(shape)
+            if shape.show_label():
+                labels.setdefault(line_rgba, []).append(shape)
+
+        width = Shape.pen_width()
+        painter.setBrush(Qt.NoBrush)
+        for line_rgba, rects in tiny.items():
+            painter.setPen(QPen(QColor.fromRgba(line_rgba), width))
+            painter.drawRects(rects)
+        for line_rgba, group in outlines.items():
+            painter.setPen(QPen(QColor.fromRgba(line_rgba), width))
+            rects = []
+            for shape in group:
+                if shape.is_box():
+                    rects.append(shape.bounding_rect())
+                else:
+                    painter.drawPath(shape.line_path())
+            painter.drawRects(rects)
+        if vertices:
+            # Stamp the sprites in device pixels, untransformed.
+            transform = painter.transform()
+            ratio = painter.device().devicePixelRatioF()
+            painter.save()
+            painter.resetTransform()
+            steps = self.SUBPIXEL_STEPS
+            for (line_rgba, fill_rgba), group in vertices.items():
+                for shape in group:
+                    coords = shape.coords()
+                    for i in range(0, len(coords), 2):
+                        # Keep the sub-pixel position in a quarter of a
+                        # screen pixel, with one sprite per offset.
+                        pos_x, pos_y = transform.map(coords[i], coords[i + 1])
+                        x, step_x = divmod(int(round(pos_x * ratio * steps)), steps)
+                        y, step_y = divmod(int(round(pos_y * ratio * steps)), steps)
+                        sprite, half = self.vertex_sprite(line_rgba, fill_rgba, ratio, step_x, step_y)
+                        painter.drawPixmap(QPointF((x - half) / ratio, (y - half) / ratio), sprite)
+            painter.restore()
+        if labels:
+            painter.setFont(Shape.label_font())
+            for line_rgba, labelled in labels.items():
+                painter.setPen(QPen(QColor.fromRgba(line_rgba), width))
+                for shape in labelled:
+                    shape.draw_label(painter)
+        for shape in detailed:
+            shape.paint(painter)
+
+    def vertex_sprite(self, line_rgba, fill_rgba, ratio=1.0, step_x=0, step_y=0):
+        """Return a vertex handle as drawn by Shape.paint, in device pixels, and
+        the distance from its left edge to the centre's pixel."""
+        key = line_rgba, fill_rgba, ratio, step_x, step_y, Shape.point_size, Shape.point_type, Shape.scale
+        cached = self._sprites.get(key)
+        if cached is None:
+            if len(self._sprites) > 1024:
+                self._sprites.clear()
+            diameter = Shape.point_size
+            width = Shape.pen_width() * Shape.scale
+            half = int(math.ceil((diameter + width) * ratio / 2.0)) + 1
+            sprite = QPixmap(2 * half + 1, 2 * half + 1)
+            sprite.fill(Qt.transparent)
+            path = QPainterPath()
+            if Shape.point_type == Shape.P_SQUARE:
+                path.addRect(-diameter / 2.0, -diameter / 2.0, diameter, diameter)
+            else:
+                path.addEllipse(QPointF(0, 0), diameter / 2.0, diameter / 2.0)
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.translate(half + step_x / float(self.SUBPIXEL_STEPS), half + step_y / float(self.SUBPIXEL_STEPS))
+            painter.scale(ratio, ratio)
+            painter.setPen(QPen(QColor.fromRgba(line_rgba), width))
+            painter.drawPath(path)
+            painter.fillPath(path, QColor.fromRgba(fill_rgba))
+            painter.end()
+            sprite.setDevicePixelRatio(ratio)
+            cached = self._sprites[key] = sprite, half
+        return cached
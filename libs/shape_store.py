@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from libs.shape import Shape
+from libs.spatial_index import SpatialIndex
+
+MAX_POINTS = 4
+STRIDE = 2 * MAX_POINTS
+NAN = float('nan')
+
+
+class ShapeStore(object):
+    """
+    Columnar storage behind Canvas.shapes, a sequence of shapes in paint order.
+
+    Each shape takes one row: up to MAX_POINTS x, y pairs in a flat array of
+    doubles, next to columns with the four sides of its bounding box, its
+    point count, label id and flags. A shape added to the store keeps its identity but becomes a
+    view on its row: its points are a memoryview on the coordinate column
+    and its label, difficult and paint_label attributes read and write the
+    other columns, so the geometry and flags stay in step with the store.
+    Loading, snapping and large rectangle queries then run over whole
+    columns with NumPy, and without it the columns are walked in Python.
+    Point hit-tests and small rectangle queries go through a SpatialIndex
+    kept next to the columns, so they only look at the shapes near them.
+    """
+    VISIBLE, DIFFICULT, PAINT_LABEL = 1, 2, 4
+    # Rectangle queries over at most this many index cells (a 512 x 512
+    # area with the default cell size) go through the index; larger ones,
+    # such as whole viewport repaints, scan the bounds columns.
+    max_index_cells = 64
+
+    def __init__(self, shapes=()):
+        self._shapes = []
+        self._coords = array('d')
+        self._view = memoryview(self._coords)
+        # x_min, y_min, x_max and y_max columns of the bounding boxes.
+        self._bounds = tuple(array('d') for _ in range(4))
+        self._counts = array('B')
+        self._label_ids = array('i')
+        self._flags = array('B')
+        # Label texts by id, and back.
+        self.labels = []
+        self._label_index = {}
+        self._index = SpatialIndex()
+        self.extend(shapes)
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __iter__(self):
+        return iter(self._shapes)
+
+    def __reversed__(self):
+        return reversed(self._shapes)
+
+    def __getitem__(self, key):
+        return self._shapes[key]
+
+    def __contains__(self, shape):
+        return getattr(shape, '_store', None) is self
+
+    def __bool__(self):
+        return bool(self._shapes)
+
+    def index(self, shape):
+        if shape not in self:
+            raise ValueError('shape is not in the store')
+        return shape._row
+
+    # Rows
+
+    def label_id(self, label):
+        label_id = self._label_index.get(label)
+        if label_id is None:
+            label_id = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def label_of(self, row):
+        return self.labels[self._label_ids[row]]
+
+    def set_label(self, row, label):
+        self._label_ids[row] = self.label_id(label)
+
+    def flag(self, row, flag):
+        return bool(self._flags[row] & flag)
+
+    def set_flag(self, row, flag, value):
+        if value:
+            self._flags[row] |= flag
+        else:
+            self._flags[row] &= ~flag & 0xff
+
+    def is_visible(self, shape):
+        """Shapes outside the store count as visible."""
+        return shape not in self or self.flag(shape._row, self.VISIBLE)
+
+    def set_visible(self, shape, value):
+        if shape in self:
+            self.set_flag(shape._row, self.VISIBLE, value)
+
+    def _reserve(self, count):
+        """Make room for count more rows in the coordinate column."""
+        needed = (len(self._shapes) + count) * STRIDE
+        if needed <= len(self._coords):
+            return
+        # Bound shapes hold views on the column, so it cannot be resized
+        # in place: copy it into a larger one and move the views over.
+        coords = array('d', self._coords[:len(self._shapes) * STRIDE])
+        coords.extend([0.0] * (max(needed, 2 * len(self._coords)) - len(coords)))
+        self._coords = coords
+        self._view = memoryview(coords)
+        for shape in self._shapes:
+            self._bind(shape, shape._row)
+
+    def _bind(self, shape, row):
+        start = row * STRIDE
+        shape._store = self
+        shape._row = row
+        shape._coords = self._view[start:start + 2 * self._counts[row]]
+
+    def set_coords(self, shape, coords):
+        """Replace the flat x, y values of a shape in the store; the shape refreshes its bounds."""
+        count = len(coords) // 2
+        if count > MAX_POINTS:
+            raise ValueError('a stored shape has at most %d points' % MAX_POINTS)
+        row = shape._row
+        start = row * STRIDE
+        self._coords[start:start + 2 * count] = array('d', coords)
+        self._counts[row] = count
+        self._bind(shape, row)
+
+    def refresh(self, shape):
+        """Recompute the bounding box of a shape after its points changed."""
+        row = shape._row
+        c = shape._coords
+        if len(c):
+            xs, ys = c[0::2], c[1::2]
+            box = min(xs), min(ys), max(xs), max(ys)
+        else:
+            box = (NAN,) * 4
+        for column, value in zip(self._bounds, box):
+            column[row] = value
+        # Adds the shape to the index on its first refresh.
+        self._index.insert(shape, box if len(c) else None)
+
+    def move_rows(self, rows, dx, dy):
+        """
+        Move the shapes of rows by (dx, dy): their points and bounding boxes
+        are shifted column-wise, and the index is updated in the same pass.
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        if np is not None:
+            count = len(self._shapes)
+            index = np.asarray(rows, dtype=np.intp)
+            coords = np.frombuffer(self._coords, dtype=np.float64,
+                                   count=count * STRIDE).reshape(count, MAX_POINTS, 2)
+            # Only the points in use: the padding of a row stays as it is.
+            used = np.arange(MAX_POINTS) < np.frombuffer(self._counts, dtype=np.uint8, count=count)[index, None]
+            coords[index] += np.where(used[..., None], (dx, dy), 0.0)
+            for column, delta in zip(self._bounds, (dx, dy, dx, dy)):
+                np.frombuffer(column, dtype=np.float64, count=count)[index] += delta
+        else:
+            coords = self._coords
+            for row in rows:
+                start = row * STRIDE
+                for i in range(start, start + 2 * self._counts[row], 2):
+                    coords[i] += dx
+                    coords[i + 1] += dy
+                for column, delta in zip(self._bounds, (dx, dy, dx, dy)):
+                    column[row] += delta
+        x_min, y_min, x_max, y_max = self._bounds
+        for row in rows:
+            shape = self._shapes[row]
+            shape._translate(dx, dy)
+            if self._counts[row]:
+                self._index.update(shape, (x_min[row], y_min[row], x_max[row], y_max[row]))
+
+    def append(self, shape):
+        """Add shape on top of the others; it becomes a view on its new row."""
+        if shape in self:
+            raise ValueError('shape is already in the store')
+        if getattr(shape, '_store', None) is not None:
+            shape._store.remove(shape)
+        if len(shape) > MAX_POINTS:
+            raise ValueError('a stored shape has at most %d points' % MAX_POINTS)
+        self._reserve(1)
+        row = len(self._shapes)
+        coords = array('d', shape._coords)
+        self._coords[row * STRIDE:row * STRIDE + len(coords)] = coords
+        self._counts.append(len(coords) // 2)
+        for column in self._bounds:
+            column.append(NAN)
+        self._label_ids.append(self.label_id(shape._label))
+        self._flags.append(self.VISIBLE |
+                           (self.DIFFICULT if shape._difficult else 0) |
+                           (self.PAINT_LABEL if shape._paint_label else 0))
+        self._shapes.append(shape)
+        self._bind(shape, row)
+        self.refresh(shape)
+
+    def extend(self, shapes):
+        shapes = list(shapes)
+        self._reserve(len(shapes))
+        for shape in shapes:
+            self.append(shape)
+
+    def _detach(self, shape):
+        """Give shape its own copy of its row, as a plain Shape."""
+        row = shape._row
+        shape._label = self.label_of(row)
+        shape._difficult = self.flag(row, self.DIFFICULT)
+        shape._paint_label = self.flag(row, self.PAINT_LABEL)
+        shape._coords = array('d', shape._coords)
+        shape._store = None
+        shape._row = 0
+        self._index.remove(shape)
+
+    def pop(self, index=-1):
+        shape = self._shapes[index]
+        if shape is self._shapes[-1]:
+            # The last row goes without moving any other.
+            self._detach(shape)
+            self._shapes.pop()
+            del self._counts[-1]
+            for column in self._bounds:
+                del column[-1]
+            del self._label_ids[-1]
+            del self._flags[-1]
+        else:
+            self.remove_shapes([shape])
+        return shape
+
+    def remove(self, shape):
+        self.remove_shapes([shape])
+
+    def remove_shapes(self, shapes):
+        """Remove shapes from the store; the rows after them move up."""
+        removed = set(s for s in shapes if s in self)
+        if not removed:
+            return
+        kept = [shape for shape in self._shapes if shape not in removed]
+        for shape in removed:
+            self._detach(shape)
+        coords, bounds = array('d'), tuple(array('d') for _ in range(4))
+        counts, label_ids, flags = array('B'), array('i'), array('B')
+        for shape in kept:
+            row = shape._row
+            coords.extend(self._coords[row * STRIDE:(row + 1) * STRIDE])
+            for column, old in zip(bounds, self._bounds):
+                column.append(old[row])
+            counts.append(self._counts[row])
+            label_ids.append(self._label_ids[row])
+            flags.append(self._flags[row])
+        self._coords, self._view = coords, memoryview(coords)
+        self._bounds, self._counts, self._label_ids, self._flags = bounds, counts, label_ids, flags
+        self._shapes = kept
+        for row, shape in enumerate(kept):
+            self._bind(shape, row)
+
+    def clear(self):
+        for shape in self._shapes:
+            self._detach(shape)
+        self.__init__()
+
+    def load(self, shapes):
+        """Replace the contents of the store with shapes."""
+        shapes = list(shapes)
+        self.clear()
+        self.extend(shapes)
+
+    def load_boxes(self, boxes, width, height):
+        """
+        Replace the contents of the store with new closed shapes, from
+        (label, points, difficult) tuples where points holds up to
+        MAX_POINTS (x, y) pairs. Points are snapped into the width x height
+        image; returns the new shapes and whether any point was snapped.
+        """
+        boxes = list(boxes)
+        self.clear()
+        count = len(boxes)
+        coords = array('d')
+        counts = array('B')
+        for _, points, _ in boxes:
+            points = list(points)[:MAX_POINTS]
+            counts.append(len(points))
+            for x, y in points:
+                coords.append(x)
+                coords.append(y)
+            # Pad the row with its last point so it does not change the bounds.
+            last = points[-1] if points else (NAN, NAN)
+            coords.extend(last * (MAX_POINTS - len(points)))
+        if np is not None and count:
+            values = np.frombuffer(coords, dtype=np.float64).reshape(count, MAX_POINTS, 2)
+            clipped = np.clip(values, 0.0, [width, height])
+            snapped = bool((clipped != values).any())
+            low, high = clipped.min(axis=1), clipped.max(axis=1)
+            coords = array('d', clipped.tobytes())
+            bounds = tuple(array('d', np.ascontiguousarray(side).tobytes())
+                           for side in (low[:, 0], low[:, 1], high[:, 0], high[:, 1]))
+        else:
+            snapped = False
+            limits = (width, height)
+            for i, value in enumerate(coords):
+                v = min(max(value, 0.0), limits[i % 2])
+                if v != value:
+                    snapped = True
+                    coords[i] = v
+            bounds = tuple(array('d') for _ in range(4))
+            for row in range(count):
+                row_coords = coords[row * STRIDE:(row + 1) * STRIDE]
+                xs, ys = row_coords[0::2], row_coords[1::2]
+                for column, value in zip(bounds, (min(xs), min(ys), max(xs), max(ys))):
+                    column.append(value)
+        self._coords, self._view = coords, memoryview(coords)
+        self._bounds = bounds
+        self._counts = counts
+        self._label_ids = array('i', [self.label_id(label) for label, _, _ in boxes])
+        self._flags = array('B', [self.VISIBLE | (self.DIFFICULT if difficult else 0) for _, _, difficult in boxes])
+        for row in range(count):
+            shape = Shape()
+            shape.close()
+            self._shapes.append(shape)
+            self._bind(shape, row)
+        self._index.extend((shape, box if points else None)
+                           for shape, points, box in zip(self._shapes, counts, zip(*bounds)))
+        return list(self._shapes), snapped
+
+    # Queries over the columns
+
+    def _rows_in(self, x_min, y_min, x_max, y_max):
+        """Return the visible rows whose bounding box intersects the rectangle, in paint order."""
+        count = len(self._shapes)
+        left, top, right, bottom = (np.frombuffer(column, dtype=np.float64, count=count)
+                                    for column in self._bounds)
+        # Narrow down on x first, then test the few remaining rows.
+        rows = np.flatnonzero((left <= x_max) & (right >= x_min))
+        flags = np.frombuffer(self._flags, dtype=np.uint8, count=count)[rows]
+        return rows[(top[rows] <= y_max) & (bottom[rows] >= y_min) & ((flags & self.VISIBLE) != 0)]
+
+    def query(self, x, y, margin=0.0):
+        """Return the visible shapes whose bounding box grown by margin contains (x, y), topmost first."""
+        return [shape for shape in self._index.query(x, y, margin) if self.is_visible(shape)]
+
+    def query_rect(self, x_min, y_min, x_max, y_max):
+        """Return the visible shapes whose bounding box intersects the rectangle, in paint order."""
+        if np is None or self._index.cell_count(x_min, y_min, x_max, y_max) <= self.max_index_cells:
+            return [shape for shape in self._index.query_rect(x_min, y_min, x_max, y_max)
+                    if self.is_visible(shape)]
+        if not self._shapes:
+            return []
+        return [self._shapes[row] for row in self._rows_in(x_min, y_min, x_max, y_max)]
+
+    def painted_labels(self):
+        """Return the set of label texts drawn next to their shapes."""
+        count = len(self._shapes)
+        if np is None:
+            return set(self.labels[self._label_ids[row]] for row in range(count)
+                       if self._flags[row] & self.PAINT_LABEL)
+        if not count:
+            return set()
+        flags = np.frombuffer(self._flags, dtype=np.uint8, count=count)
+        label_ids = np.frombuffer(self._label_ids, dtype=np.int32, count=count)
+        used = np.bincount(label_ids[(flags & self.PAINT_LABEL) != 0], minlength=len(self.labels))
+        return set(self.labels[i] for i in np.flatnonzero(used))
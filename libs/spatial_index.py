@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+
+class SpatialIndex(object):
+    """
+    Uniform grid over the bounding boxes of the canvas shapes.
+
+    Every shape is registered in the grid cells its bounding box overlaps, so
+    finding the shapes near a point only looks at the few cells around it
+    instead of every shape. The index keeps the order shapes were inserted
+    in, which is the canvas paint order, and returns hits topmost first.
+    """
+
+    def __init__(self, cell_size=64.0):
+        self.cell_size = cell_size
+        self._cells = {}
+        # shape -> (insertion order, bounding box, cells)
+        self._entries = {}
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, shape):
+        return shape in self._entries
+
+    def clear(self):
+        self._cells = {}
+        self._entries = {}
+        self._next_order = 0
+
+    def rebuild(self, shapes):
+        self.clear()
+        for shape in shapes:
+            self.insert(shape)
+
+    @staticmethod
+    def bounds(shape):
+        rect = shape.bounding_rect()
+        return rect.left(), rect.top(), rect.right(), rect.bottom()
+
+    def _cell_range(self, x_min, y_min, x_max, y_max):
+        size = self.cell_size
+        return (int(x_min // size), int(y_min // size),
+                int(x_max // size), int(y_max // size))
+
+    def cell_count(self, x_min, y_min, x_max, y_max):
+        """Return the number of grid cells the rectangle overlaps."""
+        col_min, row_min, col_max, row_max = self._cell_range(x_min, y_min, x_max, y_max)
+        return (col_max - col_min + 1) * (row_max - row_min + 1)
+
+    def _cells_of(self, box):
+        col_min, row_min, col_max, row_max = self._cell_range(*box)
+        return [(col, row) for col in range(col_min, col_max + 1) for row in range(row_min, row_max + 1)]
+
+    def insert(self, shape, box=None):
+        """
+        Add shape on top of the others, or refresh it if already indexed.
+        box is its (x_min, y_min, x_max, y_max) bounding box when the caller
+        already has it.
+        """
+        if shape in self._entries:
+            self.update(shape, box)
+            return
+        order = self._next_order
+        self._next_order += 1
+        self._place(shape, order, box)
+
+    def extend(self, items):
+        """
+        Add new shapes on top of the others from (shape, box) pairs, where
+        box is the bounding box of a shape or None if it has no points.
+        Same as insert, but quicker for a whole image of shapes.
+        """
+        size = self.cell_size
+        cells = self._cells
+        entries = self._entries
+        order = self._next_order
+        for shape, box in items:
+            if box is None:
+                entries[shape] = (order, None, ())
+                order += 1
+                continue
+            col_min, row_min = int(box[0] // size), int(box[1] // size)
+            col_max, row_max = int(box[2] // size), int(box[3] // size)
+            if col_min == col_max and row_min == row_max:
+                shape_cells = ((col_min, row_min),)
+            else:
+                shape_cells = [(col, row) for col in range(col_min, col_max + 1)
+                               for row in range(row_min, row_max + 1)]
+            for cell in shape_cells:
+                members = cells.get(cell)
+                if members is None:
+                    cells[cell] = {shape}
+                else:
+                    members.add(shape)
+            entries[shape] = (order, box, shape_cells)
+            order += 1
+        self._next_order = order
+
+    def _place(self, shape, order, box=None):
+        if not len(shape):
+            self._entries[shape] = (order, None, ())
+            return
+        if box is None:
+            box = self.bounds(shape)
+        cells = self._cells_of(box)
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(shape)
+        self._entries[shape] = (order, box, cells)
+
+    def _unplace(self, shape):
+        order, _, cells = self._entries.pop(shape)
+        for cell in cells:
+            members = self._cells[cell]
+            members.discard(shape)
+            if not members:
+                del self._cells[cell]
+        return order
+
+    def update(self, shape, box=None):
+        """Refresh the cells of shape after its points changed; unknown shapes are ignored."""
+        entry = self._entries.get(shape)
+        if entry is None:
+            return
+        if len(shape):
+            if box is None:
+                box = self.bounds(shape)
+            if entry[1] == box:
+                return
+        self._place(shape, self._unplace(shape), box)
+
+    def remove(self, shape):
+        if shape in self._entries:
+            self._unplace(shape)
+
+    def query_rect(self, x_min, y_min, x_max, y_max):
+        """Return the shapes whose bounding box intersects the rectangle, in insertion order."""
+        col_min, row_min, col_max, row_max = self._cell_range(x_min, y_min, x_max, y_max)
+        found = set()
+        if (col_max - col_min + 1) * (row_max - row_min + 1) > len(self._cells):
+            # Large rectangle: walking the occupied cells is cheaper.
+            for (col, row), members in self._cells.items():
+                if col_min <= col <= col_max and row_min <= row <= row_max:
+                    found.update(members)
+        else:
+            for col in range(col_min, col_max + 1):
+                for row in range(row_min, row_max + 1):
+                    members = self._cells.get((col, row))
+                    if members:
+                        found.update(members)
+        hits = []
+        for shape in found:
+            order, box, _ = self._entries[shape]
+            if box[0] <= x_max and x_min <= box[2] and box[1] <= y_max and y_min <= box[3]:
+                hits.append((order, shape))
+        hits.sort(key=lambda hit: hit[0])
+        return [shape for _, shape in hits]
+
+    def query(self, x, y, margin=0.0):
+        """Return the shapes whose bounding box grown by margin contains (x, y), topmost first."""
+        col_min, row_min, col_max, row_max = self._cell_range(x - margin, y - margin, x + margin, y + margin)
+        found = set()
+        for col in range(col_min, col_max + 1):
+            for row in range(row_min, row_max + 1):
+                members = self._cells.get((col, row))
+                if members:
+                    found.update(members)
+        hits = []
+        for shape in found:
+            order, box, _ = self._entries[shape]
+            if box[0] - margin <= x <= box[2] + margin and box[1] - margin <= y <= box[3] + margin:
+                hits.append((order, shape))
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [shape for _, shape in hits]
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from PySide6.QtCore import QObject, QTimer
+
+
+class StatusThrottle(QObject):
+    """
+    Rate limits the coordinate text and tooltips a canvas sets on every
+    mouse move, so pointer tracking does not wait on label relayouts.
+
+    ``show(text)`` puts text in the window's ``label_coordinates`` right
+    away when nothing was shown in the last ``interval`` milliseconds, and
+    otherwise keeps only the latest text until the interval is over. Texts
+    and tips equal to what is already shown are skipped.
+    """
+
+    def __init__(self, widget, interval=33):
+        super(StatusThrottle, self).__init__(widget)
+        self.widget = widget
+        self._pending = None
+        self._tip = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def show(self, text):
+        self._pending = text
+        if not self._timer.isActive():
+            self.flush()
+            self._timer.start()
+
+    def flush(self):
+        text, self._pending = self._pending, None
+        if text is None:
+            return
+        label = getattr(self.widget.window(), 'label_coordinates', None)
+        if label is not None and label.text() != text:
+            label.setText(text)
+
+    def set_tip(self, text, status=True):
+        """Set the widget tooltip, and its status tip too unless status is False."""
+        if (text, status) == self._tip:
+            return
+        self._tip = text, status
+        self.widget.setToolTip(text)
+        if status:
+            self.widget.setStatusTip(text)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from libs.constants import DEFAULT_ENCODING
+
+WAL_EXT = '.wal'
+ENCODE_METHOD = DEFAULT_ENCODING
+
+
+class WriteAheadLogStore(object):
+    """
+    Base class of the in-memory indexes of single-file datasets.
+
+    Updates are applied to the index and appended to a write-ahead log
+    (``<json>.wal``, one JSON record per line) instead of rewriting the whole
+    dataset. The log is folded back into the dataset file by ``compact``,
+    which runs on a background timer after updates settle, right away once
+    the log outgrows ``compact_ratio`` times the dataset file (and
+    ``min_compact_bytes``), so a run of updates costs time linear in its
+    size, and on ``close``. Inside ``with store.batch():`` only the log is
+    written and one compaction runs when the block ends. Records left in a
+    log by a crashed session are replayed on the next open.
+
+    Subclasses implement ``_load_file`` (read the dataset into the index),
+    ``_apply`` (apply one logged record), ``__len__`` and ``_write`` (write
+    the index as a dataset file), and call ``_log`` from their update methods.
+
+    Use ``open(path)`` to share one store per file in the process, and
+    ``snapshot(path)`` for a read-only index that is reused until the file
+    or its log changes.
+    """
+    compact_delay = 5.0
+    compact_ratio = 1.0
+    min_compact_bytes = 1 << 20
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+    _snapshots = {}
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        self.wal_path = json_path + WAL_EXT
+        self._lock = threading.RLock()
+        # A single timer, re-armed when it fires before the latest deadline,
+        # and one append handle on the log, kept open between updates.
+        self._timer = None
+        self._compact_due = None
+        self._wal = None
+        self._wal_entries = 0
+        self._wal_bytes = 0
+        self._file_bytes = 0
+        self._batch = 0
+        self.load()
+
+    @classmethod
+    def open(cls, json_path):
+        key = (cls, os.path.realpath(json_path))
+        with cls._stores_lock:
+            store = cls._stores.get(key)
+            if store is None:
+                store = cls._stores[key] = cls(json_path)
+            return store
+
+    @classmethod
+    def find(cls, json_path):
+        """Return the store already open for json_path, if any."""
+        with cls._stores_lock:
+            return cls._stores.get((cls, os.path.realpath(json_path)))
+
+    @classmethod
+    def close_all(cls):
+        """Close every open store of this class and its subclasses."""
+        with cls._stores_lock:
+            stores = [store for store in cls._stores.values() if isinstance(store, cls)]
+        for store in stores:
+            store.close()
+
+    @classmethod
+    def snapshot(cls, json_path):
+        """
+        Return a read-only store of json_path, shared by the process. The file
+        is only parsed again when the mtime or size of the file or of its
+        write-ahead log changes.
+        """
+        key = (cls, os.path.realpath(json_path))
+        stamp = (_file_stamp(json_path), _file_stamp(json_path + WAL_EXT))
+        cached = cls._snapshots.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = cls._snapshots[key] = (stamp, cls(json_path))
+        return cached[1]
+
+    def load(self):
+        with self._lock:
+            self._close_wal()
+            self._load_file()
+            self._file_bytes = _file_size(self.json_path)
+            self._wal_entries = 0
+            for wal_path in (self.wal_path + '.compacting', self.wal_path):
+                for record in self._read_wal(wal_path):
+                    self._apply(record)
+                    self._wal_entries += 1
+            self._wal_bytes = _file_size(self.wal_path + '.compacting') + _file_size(self.wal_path)
+
+    @staticmethod
+    def _read_wal(wal_path):
+        if not os.path.isfile(wal_path):
+            return
+        with open(wal_path, 'r', encoding=ENCODE_METHOD) as wal:
+            for line in wal:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn line of an interrupted append; a log left by a
+                    # failed compaction may have newer records after it.
+                    continue
+
+    def _log(self, record):
+        """Append an already applied record to the log and schedule compaction."""
+        with self._lock:
+            if self._wal is None:
+                self._wal = open(self.wal_path, 'a', encoding=ENCODE_METHOD)
+            line = json.dumps(record) + '\n'
+            self._wal.write(line)
+            self._wal.flush()
+            self._wal_entries += 1
+            self._wal_bytes += len(line.encode(ENCODE_METHOD))
+            if self._batch:
+                return
+            if self._wal_bytes >= max(self.min_compact_bytes, self.compact_ratio * self._file_bytes):
+                self.compact()
+            else:
+                self._schedule_compact(self.compact_delay)
+
+    @contextmanager
+    def batch(self):
+        """Only log the updates made inside the block, then compact once."""
+        with self._lock:
+            self._batch += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch -= 1
+                if not self._batch:
+                    self.compact()
+
+    def commit(self):
+        """Make the updates logged so far durable, also inside a batch."""
+        with self._lock:
+            if self._wal is not None:
+                self._wal.flush()
+                os.fsync(self._wal.fileno())
+
+    def _schedule_compact(self, delay):
+        self._compact_due = time.monotonic() + delay
+        if self._timer is None:
+            self._start_timer(delay)
+
+    def _start_timer(self, delay):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            if self._timer is not threading.current_thread():
+                # Cancelled, or replaced by a newer timer, while waiting for the lock.
+                return
+            self._timer = None
+            if self._compact_due is None:
+                return
+            remaining = self._compact_due - time.monotonic()
+            if remaining > 0:
+                # Updates came in since the timer was started.
+                self._start_timer(remaining)
+            else:
+                self.compact()
+
+    def _close_wal(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def compact(self):
+        """Write the index back as the dataset file and drop the log."""
+        with self._lock:
+            self._compact_due = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._wal_entries:
+                return
+            self._close_wal()
+            compacting_path = self.wal_path + '.compacting'
+            if os.path.isfile(compacting_path):
+                # Left by a compaction that failed: keep its records and
+                # add the newer ones after them.
+                if os.path.isfile(self.wal_path):
+                    with open(compacting_path, 'ab+') as compacting, open(self.wal_path, 'rb') as wal:
+                        if compacting.tell():
+                            compacting.seek(-1, os.SEEK_END)
+                            if compacting.read(1) != b'\n':
+                                # End a torn last line before the newer records.
+                                compacting.write(b'\n')
+                        shutil.copyfileobj(wal, compacting)
+                    os.remove(self.wal_path)
+            elif os.path.isfile(self.wal_path):
+                os.replace(self.wal_path, compacting_path)
+            tmp_path = self.json_path + '.tmp'
+            result = self._write(tmp_path)
+            os.replace(tmp_path, self.json_path)
+            # The records are in the dataset file now; drop the log.
+            self._wal_entries = 0
+            self._wal_bytes = 0
+            self._file_bytes = _file_size(self.json_path)
+            if os.path.isfile(compacting_path):
+                os.remove(compacting_path)
+            self._compacted(result)
+
+    def _compacted(self, result):
+        """Called with the return value of _write once it replaced the file."""
+        pass
+
+    def close(self):
+        self.compact()
+        with self._stores_lock:
+            key = (type(self), os.path.realpath(self.json_path))
+            if self._stores.get(key) is self:
+                del self._stores[key]
+
+
+atexit.register(WriteAheadLogStore.close_all)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -1,12 +1,39 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
 import codecs
+import hashlib
 import os
+import struct
+from collections import namedtuple
 
+from libs.annotation import Annotation
 from libs.constants import DEFAULT_ENCODING
+from libs.image_meta import read_image_size
 
 TXT_EXT = '.txt'
 ENCODE_METHOD = DEFAULT_ENCODING
+CLASSES_FILENAME = 'classes.txt'
+LABEL_CACHE_FILENAME = 'labelimg_yolo.cache'
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+_class_list_cache = {}
+
+
+def load_class_list(class_list_path):
+    """
+    Return the classes listed in ``class_list_path``.
+    The parsed list is cached per file and only re-read when its mtime or size changes.
+    """
+    stat = os.stat(class_list_path)
+    key = os.path.realpath(class_list_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _class_list_cache.get(key)
+    if cached is None or cached[0] != stamp:
+        with open(class_list_path, 'r') as classes_file:
+            classes = tuple(classes_file.read().strip('\n').split('\n'))
+        cached = _class_list_cache[key] = (stamp, classes)
+    return list(cached[1])
+
 
 class YOLOWriter:
 
@@ -15,58 +42,54 @@ class YOLOWriter:
         self.filename = filename
         self.database_src = database_src
         self.img_size = img_size
-        self.box_list = []
+        self.annotation = Annotation(filename, img_size)
         self.local_img_path = local_img_path
         self.verified = False
 
     def add_bnd_box(self, x_min, y_min, x_max, y_max, name, difficult):
-        bnd_box = {'xmin': x_min, 'ymin': y_min, 'xmax': x_max, 'ymax': y_max}
-        bnd_box['name'] = name
-        bnd_box['difficult'] = difficult
-        self.box_list.append(bnd_box)
-
-    def bnd_box_to_yolo_line(self, box, class_list=[]):
-        x_min = box['xmin']
-        x_max = box['xmax']
-        y_min = box['ymin']
-        y_max = box['ymax']
+        self.annotation.add_box(x_min, y_min, x_max, y_max, name, difficult)
 
+    def class_indices(self, class_list):
+        """Map the annotation's label ids to class_list indices."""
+        # PR387
+        indices = []
+        for box_name in self.annotation.labels:
+            if box_name not in class_list:
+                class_list.append(box_name)
+            indices.append(class_list.index(box_name))
+        return indices
+
+    def bnd_box_to_yolo_line(self, x_min, y_min, x_max, y_max):
         x_center = float((x_min + x_max)) / 2 / self.img_size[1]
         y_center = float((y_min + y_max)) / 2 / self.img_size[0]
 
         w = float((x_max - x_min)) / self.img_size[1]
         h = float((y_max - y_min)) / self.img_size[0]
 
-        # PR387
-        box_name = box['name']
-        if box_name not in class_list:
-            class_list.append(box_name)
-
-        class_index = class_list.index(box_name)
-
-        return class_index, x_center, y_center, w, h
+        return x_center, y_center, w, h
 
-    def save(self, class_list=[], target_file=None):
+    def save(self, class_list=[], target_file=None, update_cache=True):
 
         out_file = None  # Update yolo .txt
         out_class_file = None   # Update class list .txt
 
         if target_file is None:
-            out_file = open(
-            self.filename + TXT_EXT, 'w', encoding=ENCODE_METHOD)
-            classes_file = os.path.join(os.path.dirname(os.path.abspath(self.filename)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
-
+            target_file = self.filename + TXT_EXT
+            out_file = open(target_file, 'w', encoding=ENCODE_METHOD)
         else:
             out_file = codecs.open(target_file, 'w', encoding=ENCODE_METHOD)
-            classes_file = os.path.join(os.path.dirname(os.path.abspath(target_file)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
-
-
-        for box in self.box_list:
-            class_index, x_center, y_center, w, h = self.bnd_box_to_yolo_line(box, class_list)
+        classes_file = os.path.join(os.path.dirname(os.path.abspath(target_file)), CLASSES_FILENAME)
+        out_class_file = open(classes_file, 'w')
+
+        class_indices = self.class_indices(class_list)
+        coords = self.annotation.coords
+        boxes = []
+        for i, label_id in enumerate(self.annotation.label_ids):
+            class_index = class_indices[label_id]
+            x_center, y_center, w, h = self.bnd_box_to_yolo_line(*coords[4 * i:4 * i + 4])
             # print (classIndex, x_center, y_center, w, h)
             out_file.write("%d %.6f %.6f %.6f %.6f\n" % (class_index, x_center, y_center, w, h))
+            boxes.append((class_index, x_center, y_center, w, h))
 
         # print (classList)
         # print (out_class_file)
@@ -76,6 +99,9 @@ class YOLOWriter:
         out_class_file.close()
         out_file.close()
 
+        if update_cache:
+            update_label_cache(target_file, self.img_size, boxes)
+        return boxes
 
 
 class YoloReader:
@@ -83,7 +109,8 @@ class YoloReader:
     def __init__(self, file_path, image, class_list_path=None):
         # shapes type:
         # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
-        self.shapes = []
+        # image is either a decoded QImage, the path of the image file (only
+        # its header is read) or an already known [height, width, depth].
         self.file_path = file_path
 
         if class_list_path is None:
@@ -94,15 +121,21 @@ class YoloReader:
 
         # print (file_path, self.class_list_path)
 
-        classes_file = open(self.class_list_path, 'r')
-        self.classes = classes_file.read().strip('\n').split('\n')
+        self.classes = load_class_list(self.class_list_path)
+        self.annotation = Annotation(labels=self.classes)
 
         # print (self.classes)
 
-        img_size = [image.height(), image.width(),
-                    1 if image.isGrayscale() else 3]
+        if isinstance(image, str):
+            img_size = read_image_size(image)
+        elif isinstance(image, (list, tuple)):
+            img_size = list(image)
+        else:
+            img_size = [image.height(), image.width(),
+                        1 if image.isGrayscale() else 3]
 
         self.img_size = img_size
+        self.annotation.img_size = img_size
 
         self.verified = False
         # try:
@@ -110,13 +143,14 @@ class YoloReader:
         # except:
         #     pass
 
+    def get_annotation(self):
+        return self.annotation
+
     def get_shapes(self):
-        return self.shapes
+        return self.annotation.to_shapes()
 
     def add_shape(self, label, x_min, y_min, x_max, y_max, difficult):
-
-        points = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
-        self.shapes.append((label, points, None, None, difficult))
+        self.annotation.add_box(x_min, y_min, x_max, y_max, label, difficult)
 
     def yolo_line_to_shape(self, class_index, x_center, y_center, w, h):
         label = self.classes[int(class_index)]
@@ -134,10 +168,257 @@ class YoloReader:
         return label, x_min, y_min, x_max, y_max
 
     def parse_yolo_format(self):
-        bnd_box_file = open(self.file_path, 'r')
-        for bndBox in bnd_box_file:
-            class_index, x_center, y_center, w, h = bndBox.strip().split(' ')
-            label, x_min, y_min, x_max, y_max = self.yolo_line_to_shape(class_index, x_center, y_center, w, h)
-
-            # Caveat: difficult flag is discarded when saved as yolo format.
-            self.add_shape(label, x_min, y_min, x_max, y_max, False)
+        with open(self.file_path, 'r') as bnd_box_file:
+            for bndBox in bnd_box_file:
+                class_index, x_center, y_center, w, h = bndBox.strip().split(' ')
+                label, x_min, y_min, x_max, y_max = self.yolo_line_to_shape(class_index, x_center, y_center, w, h)
+
+                # Caveat: difficult flag is discarded when saved as yolo format.
+                self.annotation.add_box_id(x_min, y_min, x_max, y_max, int(class_index), False)
+
+
+# ------------------------------------------------------------------------------
+# Label cache
+#
+# A binary file next to classes.txt holding, per label file, the SHA-1 and
+# mtime of the .txt file, the image size and all boxes, so training and QA
+# scripts can read a whole labels directory without parsing any text:
+#
+#     classes, entries = load_label_cache('/data/labels')
+#     for name, entry in entries.items():
+#         height, width, depth = entry.img_size
+#         for class_index, x_center, y_center, w, h in entry.boxes:
+#             ...
+#
+# YOLOWriter.save appends a record for the saved file, and build_label_cache
+# creates or refreshes the cache for an existing dataset.
+#
+# Layout (little endian): the 8 byte magic, then a sequence of records. A record
+# is the label file stem (uint16 length + UTF-8), the 20 byte SHA-1, the mtime
+# in nanoseconds (int64), height and width (uint32), depth (uint8), the box
+# count (uint32) and per box the class index (uint32) plus normalized x_center,
+# y_center, w, h (float32). Records are only ever appended; the last record of
+# a stem wins. update_label_cache compacts the file once superseded records
+# outnumber the live ones, and compact_label_cache drops them on demand.
+# ------------------------------------------------------------------------------
+_CACHE_MAGIC = b'LIMGYC\x00\x02'
+_CACHE_NAME = struct.Struct('<H')
+_CACHE_META = struct.Struct('<20sqIIBI')
+_CACHE_BOX = struct.Struct('<Iffff')
+
+# update_label_cache compacts the cache when more records than this, and
+# more than there are live ones, have been superseded.
+LABEL_CACHE_MAX_SUPERSEDED = 1024
+
+LabelCacheEntry = namedtuple('LabelCacheEntry', ['sha1', 'img_size', 'boxes', 'mtime_ns'])
+
+# cache path -> (file size after our last write, stems, record count), so
+# saves do not have to read the cache back to count superseded records.
+_label_cache_state = {}
+
+
+def label_cache_path(labels_dir):
+    return os.path.join(labels_dir, LABEL_CACHE_FILENAME)
+
+
+def file_sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def parse_yolo_lines(txt_path):
+    boxes = []
+    with open(txt_path, 'r') as f:
+        for line in f:
+            values = line.split()
+            if len(values) == 5:
+                boxes.append((int(values[0]),) + tuple(float(v) for v in values[1:]))
+    return boxes
+
+
+def _encode_cache_record(name, entry):
+    name = name.encode('utf-8')
+    height, width, depth = entry.img_size
+    parts = [_CACHE_NAME.pack(len(name)), name,
+             _CACHE_META.pack(entry.sha1, entry.mtime_ns, height, width, depth, len(entry.boxes))]
+    parts.extend(_CACHE_BOX.pack(*box) for box in entry.boxes)
+    return b''.join(parts)
+
+
+def _iter_cache_records(data):
+    """Yield (stem, LabelCacheEntry) for every complete record, superseded ones included."""
+    offset = len(_CACHE_MAGIC)
+    end = len(data)
+    while offset + _CACHE_NAME.size <= end:
+        (name_len,) = _CACHE_NAME.unpack_from(data, offset)
+        meta_start = offset + _CACHE_NAME.size + name_len
+        if meta_start + _CACHE_META.size > end:
+            break
+        name = data[offset + _CACHE_NAME.size:meta_start].decode('utf-8')
+        sha1, mtime_ns, height, width, depth, count = _CACHE_META.unpack_from(data, meta_start)
+        boxes_start = meta_start + _CACHE_META.size
+        boxes_end = boxes_start + count * _CACHE_BOX.size
+        if boxes_end > end:
+            # Incomplete trailing record left by an interrupted write.
+            break
+        boxes = list(_CACHE_BOX.iter_unpack(data[boxes_start:boxes_end]))
+        yield name, LabelCacheEntry(sha1, (height, width, depth), boxes, mtime_ns)
+        offset = boxes_end
+
+
+def _read_label_cache(labels_dir):
+    """Return the cache file content, or None when it is missing or not a cache."""
+    try:
+        with open(label_cache_path(labels_dir), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data if data.startswith(_CACHE_MAGIC) else None
+
+
+def label_file_mtimes(labels_dir):
+    """Return the mtime in nanoseconds of each .txt label file in labels_dir by stem, from one listing."""
+    mtimes = {}
+    with os.scandir(labels_dir) as listing:
+        for dir_entry in listing:
+            stem, ext = os.path.splitext(dir_entry.name)
+            if ext.lower() != TXT_EXT or dir_entry.name == CLASSES_FILENAME:
+                continue
+            try:
+                if dir_entry.is_file():
+                    mtimes[stem] = dir_entry.stat().st_mtime_ns
+            except OSError:
+                continue
+    return mtimes
+
+
+def load_label_cache(labels_dir, validate=True, mtimes=None):
+    """
+    Return (classes, entries) for labels_dir: the list read from classes.txt
+    (empty if missing) and a dict mapping each label file stem to its
+    LabelCacheEntry. A missing or unreadable cache gives no entries. Unless
+    validate is False, records whose .txt file was deleted or modified
+    since are left out; they are checked against mtimes, as returned by
+    label_file_mtimes, which is called when not given.
+    """
+    classes_path = os.path.join(labels_dir, CLASSES_FILENAME)
+    classes = load_class_list(classes_path) if os.path.isfile(classes_path) else []
+    data = _read_label_cache(labels_dir)
+    if data is None:
+        return classes, {}
+    entries = dict(_iter_cache_records(data))
+    if validate:
+        if mtimes is None:
+            mtimes = label_file_mtimes(labels_dir)
+        entries = dict((name, entry) for name, entry in entries.items()
+                       if mtimes.get(name) == entry.mtime_ns)
+    return classes, entries
+
+
+def _cache_state(labels_dir):
+    """Return (stems, record count) of the cache, re-reading it only if someone else wrote to it."""
+    cache_path = label_cache_path(labels_dir)
+    size = os.path.getsize(cache_path) if os.path.exists(cache_path) else 0
+    state = _label_cache_state.get(cache_path)
+    if state is not None and state[0] == size:
+        return state[1], state[2]
+    stems, count = set(), 0
+    if size:
+        data = _read_label_cache(labels_dir)
+        if data is None:
+            # Not a cache of this version: start over.
+            _write_label_cache(labels_dir, {})
+        else:
+            for name, _ in _iter_cache_records(data):
+                stems.add(name)
+                count += 1
+    return stems, count
+
+
+def update_label_cache(txt_path, img_size, boxes):
+    """
+    Append the record of txt_path to the cache of its directory, creating the
+    cache if needed. boxes are the (class_index, x_center, y_center, w, h)
+    tuples written to the file.
+    """
+    labels_dir = os.path.dirname(os.path.abspath(txt_path))
+    name = os.path.splitext(os.path.basename(txt_path))[0]
+    depth = img_size[2] if len(img_size) > 2 else 3
+    entry = LabelCacheEntry(file_sha1(txt_path), (img_size[0], img_size[1], depth), boxes,
+                            os.stat(txt_path).st_mtime_ns)
+    stems, count = _cache_state(labels_dir)
+    cache_path = label_cache_path(labels_dir)
+    with open(cache_path, 'ab') as f:
+        if f.tell() == 0:
+            f.write(_CACHE_MAGIC)
+        f.write(_encode_cache_record(name, entry))
+        size = f.tell()
+    stems.add(name)
+    count += 1
+    superseded = count - len(stems)
+    if superseded > LABEL_CACHE_MAX_SUPERSEDED and superseded > len(stems):
+        compact_label_cache(labels_dir)
+    else:
+        _label_cache_state[cache_path] = (size, stems, count)
+
+
+def _write_label_cache(labels_dir, entries):
+    cache_path = label_cache_path(labels_dir)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_CACHE_MAGIC)
+        for name, entry in entries.items():
+            f.write(_encode_cache_record(name, entry))
+        size = f.tell()
+    os.replace(tmp_path, cache_path)
+    _label_cache_state[cache_path] = (size, set(entries), len(entries))
+
+
+def compact_label_cache(labels_dir):
+    """
+    Rewrite the cache keeping only the latest record of each label file
+    that still exists unchanged.
+    """
+    _, entries = load_label_cache(labels_dir)
+    _write_label_cache(labels_dir, entries)
+    return entries
+
+
+def build_label_cache(labels_dir, image_dir=None):
+    """
+    Create or refresh the cache for every .txt label file in labels_dir.
+    Files whose SHA-1 still matches their cached record are not parsed again.
+    Image sizes are probed from the image with the same stem in image_dir
+    (defaults to labels_dir); label files without an image are skipped.
+    Returns the entries written.
+    """
+    if image_dir is None:
+        image_dir = labels_dir
+    _, cached = load_label_cache(labels_dir, validate=False)
+
+    images = {}
+    for file_name in os.listdir(image_dir):
+        stem, ext = os.path.splitext(file_name)
+        if ext.lower() in IMAGE_EXTS:
+            images[stem] = os.path.join(image_dir, file_name)
+
+    entries = {}
+    mtimes = label_file_mtimes(labels_dir)
+    for stem in sorted(mtimes):
+        txt_path = os.path.join(labels_dir, stem + TXT_EXT)
+        sha1 = file_sha1(txt_path)
+        mtime_ns = mtimes[stem]
+        entry = cached.get(stem)
+        if entry is not None and entry.sha1 == sha1:
+            entries[stem] = entry._replace(mtime_ns=mtime_ns)
+            continue
+        if stem not in images:
+            continue
+        try:
+            img_size = read_image_size(images[stem])
+        except (OSError, ValueError):
+            continue
+        entries[stem] = LabelCacheEntry(sha1, tuple(img_size), parse_yolo_lines(txt_path), mtime_ns)
+
+    _write_label_cache(labels_dir, entries)
+    return entries
@@ -0,0 +1,100 @@
+import unittest
+
+from PySide6.QtCore import QEvent, QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QMouseEvent, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.canvas import Canvas
+from libs.shape import Shape
+
+
+def make_box(x_min, y_min, x_max, y_max):
+    shape = Shape(label='box')
+    for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+class TestCanvasSelection(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.canvas = Canvas()
+        pixmap = QPixmap(600, 400)
+        pixmap.fill(QColor(90, 90, 90))
+        self.canvas.load_pixmap(pixmap)
+        self.canvas.resize(600, 400)
+        self.shapes = [make_box(10, 10, 50, 50), make_box(100, 10, 150, 60), make_box(300, 300, 350, 350)]
+        self.canvas.load_shapes(self.shapes)
+        self.changes = []
+        self.canvas.selectionChanged.connect(self.changes.append)
+
+    def press(self, event_type, x, y, modifiers=Qt.NoModifier, button=Qt.LeftButton):
+        pos = QPointF(x, y)
+        buttons = Qt.NoButton if event_type == QEvent.MouseButtonRelease else button
+        event = QMouseEvent(event_type, pos, pos, button, buttons, modifiers)
+        {QEvent.MouseButtonPress: self.canvas.mousePressEvent,
+         QEvent.MouseMove: self.canvas.mouseMoveEvent,
+         QEvent.MouseButtonRelease: self.canvas.mouseReleaseEvent}[event_type](event)
+
+    def test_modifier_click_and_rubber_band(self):
+        first, second, third = self.shapes
+        self.press(QEvent.MouseButtonPress, 30, 30, Qt.ControlModifier)
+        self.press(QEvent.MouseButtonPress, 120, 30, Qt.ControlModifier)
+        self.assertEqual([first, second], self.canvas.selected_shapes)
+        self.assertIs(second, self.canvas.selected_shape)
+        # A second modifier click takes the shape out again.
+        self.press(QEvent.MouseButtonPress, 30, 30, Qt.ControlModifier)
+        self.assertEqual([second], self.canvas.selected_shapes)
+        self.assertFalse(first.selected)
+
+        # Only shapes wholly inside the band are added.
+        self.press(QEvent.MouseButtonPress, 5, 200, Qt.ShiftModifier)
+        self.press(QEvent.MouseMove, 360, 5, Qt.ShiftModifier)
+        self.press(QEvent.MouseButtonRelease, 360, 5, Qt.ShiftModifier)
+        self.assertEqual([second, first], self.canvas.selected_shapes)
+        self.assertIsNone(self.canvas.rubber_band)
+        self.assertEqual([True] * 4, self.changes)
+
+    def test_group_move_and_delete(self):
+        first, second, third = self.shapes
+        self.canvas.select_shapes([first, second])
+        self.assertEqual([True], self.changes)
+
+        # Dragging a selected shape moves the group, kept inside the image.
+        self.press(QEvent.MouseButtonPress, 120, 30)
+        self.press(QEvent.MouseMove, 120, 5)
+        self.assertEqual([first, second], self.canvas.selected_shapes)
+        self.assertEqual(QPointF(10, 0), first[0])
+        self.assertEqual(QPointF(100, 0), second[0])
+        self.assertEqual(QRectF(100, 0, 50, 50), second.bounding_rect())
+        self.assertEqual([second], self.canvas.shapes_at(QPointF(120, 5)))
+
+        self.assertEqual([first, second], self.canvas.delete_selected())
+        self.assertEqual([third], list(self.canvas.shapes))
+        self.assertEqual([], self.canvas.shapes_at(QPointF(120, 5)))
+        self.assertIsNone(self.canvas.selected_shape)
+
+    def test_crosshair_repaint_covers_drawn_line(self):
+        canvas = self.canvas
+        canvas.scale = 4.0
+        canvas.prev_point = QPointF(10.9, 20.6)
+        updated = []
+        canvas.update = lambda *args: updated.extend(args)
+        canvas.update_drawing_area()
+        vertical, horizontal = updated[-2:]
+
+        # The crosshair is drawn one image pixel wide at int(prev_point).
+        offset = canvas.offset_to_center()
+        self.assertLessEqual(vertical.left(), (10 - 0.5 + offset.x()) * 4)
+        self.assertGreaterEqual(vertical.right(), (10 + 0.5 + offset.x()) * 4)
+        self.assertLessEqual(horizontal.top(), (20 - 0.5 + offset.y()) * 4)
+        self.assertGreaterEqual(horizontal.bottom(), (20 + 0.5 + offset.y()) * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from libs.constants import FORMAT_BINARY, FORMAT_COCO, FORMAT_CREATEML, FORMAT_PASCALVOC, FORMAT_PROJECTDB, FORMAT_YOLO
+from libs import convert as convert_module
+from libs.convert import CONVERTED, SKIPPED, ConvertJob, Progress, convert, journal_path, read_journal, scan_images
+from libs.pascal_voc_io import PascalVocReader, PascalVocWriter
+from libs.project_db import ProjectDatabase
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        self.root = tempfile.mkdtemp()
+        self.images = os.path.join(self.root, 'images')
+        os.makedirs(self.images)
+        for name in ('a', 'b', 'c'):
+            shutil.copy(os.path.join(dir_name, 'test.512.512.bmp'), os.path.join(self.images, name + '.bmp'))
+        # c.bmp has no annotation
+        for name in ('a', 'b'):
+            writer = PascalVocWriter('images', name + '.bmp', (512, 512, 3))
+            writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+            writer.add_bnd_box(113, 40, 450, 403, 'face', 1)
+            writer.save(os.path.join(self.images, name + '.xml'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def run_convert(self, source_format, target_format, labels, output):
+        job = ConvertJob(source_format, target_format, labels, output)
+        progress = Progress(3, stream=io.StringIO())
+        counts, failures = convert(job, scan_images(self.images), jobs=2, progress=progress)
+        self.assertEqual([], failures)
+        return counts
+
+    def test_round_trip(self):
+        yolo_dir = os.path.join(self.root, 'yolo')
+        create_ml_file = os.path.join(self.root, 'dataset.json')
+        coco_file = os.path.join(self.root, 'instances.json')
+        db_file = os.path.join(self.root, 'labelImg.db')
+        bin_dir = os.path.join(self.root, 'bin')
+        voc_dir = os.path.join(self.root, 'voc')
+
+        counts = self.run_convert(FORMAT_PASCALVOC, FORMAT_YOLO, self.images, yolo_dir)
+        self.assertEqual(2, counts[CONVERTED])
+        self.assertEqual(1, counts[SKIPPED])
+        self.run_convert(FORMAT_YOLO, FORMAT_CREATEML, yolo_dir, create_ml_file)
+        self.run_convert(FORMAT_CREATEML, FORMAT_COCO, create_ml_file, coco_file)
+        self.run_convert(FORMAT_COCO, FORMAT_PROJECTDB, coco_file, db_file)
+        self.run_convert(FORMAT_PROJECTDB, FORMAT_BINARY, db_file, bin_dir)
+        self.run_convert(FORMAT_BINARY, FORMAT_PASCALVOC, bin_dir, voc_dir)
+
+        shapes = PascalVocReader(os.path.join(voc_dir, 'b.xml')).get_shapes()
+        self.assertEqual(['face', 'person'], sorted(shape[0] for shape in shapes))
+        self.assertEqual([(60, 40), (430, 40), (430, 504), (60, 504)],
+                         [shape[1] for shape in shapes if shape[0] == 'person'][0])
+
+        # A second run resumes from the journal and converts nothing again.
+        counts = self.run_convert(FORMAT_PASCALVOC, FORMAT_YOLO, self.images, yolo_dir)
+        self.assertEqual([0, 0, 0], counts)
+
+    def test_single_file_target_resumes(self):
+        db_file = os.path.join(self.root, 'labelImg.db')
+        job = ConvertJob(FORMAT_PASCALVOC, FORMAT_PROJECTDB, self.images, db_file)
+        put = ProjectDatabase.put
+        calls = []
+
+        def interrupted_put(database, *args):
+            calls.append(args)
+            if len(calls) > 1:
+                raise KeyboardInterrupt
+            put(database, *args)
+
+        # The run stops while writing the second converted image.
+        with mock.patch.object(convert_module, 'JOURNAL_CHUNK', 1), \
+                mock.patch.object(ProjectDatabase, 'put', interrupted_put):
+            with self.assertRaises(KeyboardInterrupt):
+                convert(job, scan_images(self.images), jobs=2, progress=Progress(3, stream=io.StringIO()))
+        journaled = read_journal(journal_path(job))
+        self.assertLessEqual(1, len(journaled))
+        self.assertIn(calls[0][0], journaled)
+        self.assertIn(calls[0][0], ProjectDatabase.open(db_file))
+
+        counts, failures = convert(job, scan_images(self.images), jobs=2,
+                                   progress=Progress(3, stream=io.StringIO()))
+        self.assertEqual(3, len(journaled) + sum(counts))
+        self.assertEqual(2, len(ProjectDatabase.open(db_file).images()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor, QImage, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.canvas import Canvas
+from libs.frame_stats import BUCKETS_MS, FrameStats
+from libs.shape import Shape
+
+
+class Counter(object):
+    hits = 3
+    misses = 1
+
+
+class TestFrameStats(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_histograms_and_dump(self):
+        cache = Counter()
+        stats = FrameStats({'scaled': cache}, size=3)
+        for ms in (0.5, 3, 20, 2000):
+            stats.add_paint(ms / 1000.0, 10, 90)
+        cache.hits += 4
+        # Only the last three frames are kept.
+        expected = [0] * (len(BUCKETS_MS) + 1)
+        expected[BUCKETS_MS.index(4)] = expected[BUCKETS_MS.index(33)] = expected[-1] = 1
+        self.assertEqual(expected, stats.paint.histogram())
+        self.assertEqual(4, stats.paint.count)
+        self.assertEqual({'scaled': (4, 0)}, stats.hit_rates())
+
+        path = os.path.join(tempfile.mkdtemp(), 'stats.json')
+        stats.dump(path)
+        with open(path) as f:
+            dumped = json.load(f)
+        self.assertEqual({'drawn': 10, 'culled': 90}, dumped['last_frame'])
+        self.assertEqual({'hits': 4, 'misses': 0}, dumped['caches']['scaled'])
+        self.assertEqual(1, dumped['paint']['histogram']['>1000 ms'])
+
+    def test_canvas_hud(self):
+        canvas = Canvas()
+        pixmap = QPixmap(400, 300)
+        pixmap.fill(QColor(90, 90, 90))
+        canvas.load_pixmap(pixmap)
+        canvas.resize(400, 300)
+        shapes = []
+        for x in (10, 300):
+            shape = Shape(label='box')
+            for dx, dy in ((0, 0), (20, 0), (20, 20), (0, 20)):
+                shape.add_point(QPointF(x + dx, 10 + dy))
+            shape.close()
+            shapes.append(shape)
+        canvas.load_shapes(shapes)
+        self.assertIsNone(canvas.stats)
+
+        canvas.set_hud(True)
+        image = QImage(400, 300, QImage.Format_ARGB32_Premultiplied)
+        canvas.render(image)
+        self.assertEqual(1, canvas.stats.paint.count)
+        self.assertEqual((2, 0), (canvas.stats.drawn, canvas.stats.culled))
+        canvas.set_hud(False)
+        self.assertIsNone(canvas.stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from PySide6.QtCore import QThreadPool
+from PySide6.QtGui import QColor, QImage, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.image_adjust import Adjustment, adjust_image, adjustment_available
+from libs.overlay_cache import OverlayCache, _OverlayTask
+
+
+@unittest.skipUnless(adjustment_available(), 'NumPy is not installed')
+class TestImageAdjust(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_lut(self):
+        self.assertTrue(Adjustment().is_identity())
+        self.assertEqual(list(range(256)), Adjustment().lut()[1].tolist())
+        self.assertEqual(128, Adjustment(gamma=2.0).lut()[0][64])
+        lut = Adjustment(levels=[(0, 255), (50, 150), (0, 255)]).lut()
+        self.assertEqual([0, 0, 128, 255, 255], lut[1][[0, 50, 100, 150, 255]].tolist())
+        self.assertEqual([0, 100, 255], lut[2][[0, 100, 255]].tolist())
+
+    def test_adjust_rgb_and_grey(self):
+        image = QImage(30, 20, QImage.Format_RGB32)
+        image.fill(QColor(10, 100, 200))
+        adjusted = adjust_image(image, Adjustment(brightness=0.2, levels=[(0, 255), (0, 200), (0, 255)]))
+        self.assertEqual((61, 178, 251), adjusted.pixelColor(29, 19).getRgb()[:3])
+        # The source is left alone.
+        self.assertEqual((10, 100, 200), image.pixelColor(29, 19).getRgb()[:3])
+
+        grey = image.convertToFormat(QImage.Format_Grayscale8)
+        adjusted = adjust_image(grey, Adjustment(contrast=2.0))
+        self.assertEqual(QImage.Format_Grayscale8, adjusted.format())
+        value = grey.pixelColor(0, 0).red()
+        self.assertEqual(round(255 * min(1, max(0, (value / 255.0 - 0.5) * 2 + 0.5))),
+                         adjusted.pixelColor(0, 0).red())
+
+    def test_display_cache(self):
+        source = QPixmap(64, 32)
+        source.fill(QColor(100, 100, 100))
+        cache = OverlayCache()
+        self.assertIs(source, cache.pixmap(source, None, Adjustment()))
+
+        adjustment = Adjustment(brightness=0.2)
+        cache.pixmap(source, None, adjustment)
+        QThreadPool.globalInstance().waitForDone()
+        self.app.processEvents()
+        adjusted = cache.pixmap(source, None, adjustment)
+        self.assertEqual(151, QColor(adjusted.toImage().pixel(0, 0)).red())
+
+        # A queued request that is no longer wanted is skipped.
+        key = (source.cacheKey(), None, Adjustment(brightness=-0.2))
+        _OverlayTask(key, source.toImage(), None, key[2], cache).run()
+        self.app.processEvents()
+        self.assertNotIn(key, cache._cache)
+        self.assertIs(adjusted, cache.pixmap(source, None, adjustment))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -96,6 +96,512 @@ class TestCreateMLRW(unittest.TestCase):
         self.assertEqual(250, y_min, 'ymin is wrong')
         self.assertEqual(365, y_max, 'ymax is wrong')
 
+    def test_c_store_write_ahead_log(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from create_ml_io import CreateMLReader, CreateMLStore, CreateMLWriter
+
+        output_file = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        store = CreateMLStore.open(output_file)
+        store.compact_delay = 3600
+
+        face = {'label': 'face', 'points': ((245, 250), (350, 250), (350, 365), (245, 365))}
+        for name in ('a.jpg', 'b.jpg', 'a.jpg'):
+            CreateMLWriter('tests', name, (512, 512, 3), [face], output_file).write()
+
+        # Nothing compacted yet: updates only live in the index and the log.
+        self.assertFalse(os.path.isfile(output_file))
+        self.assertTrue(os.path.isfile(store.wal_path))
+        self.assertEqual(1, len(CreateMLReader(output_file, 'a.jpg').get_shapes()))
+
+        # A fresh store (e.g. after a crash) replays the log.
+        self.assertEqual(['a.jpg', 'b.jpg'], list(CreateMLStore(output_file).entries))
+
+        store.close()
+        self.assertFalse(os.path.isfile(store.wal_path))
+        with open(output_file, 'r') as file:
+            data = json.loads(file.read())
+        self.assertEqual(['a.jpg', 'b.jpg'], [entry['image'] for entry in data])
+
+    def test_c_store_compacts_by_log_size(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from create_ml_io import CreateMLStore
+
+        output_file = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        store = CreateMLStore(output_file)
+        store.compact_delay = 3600
+        store.min_compact_bytes = 0
+        store.compact_ratio = 3.0
+
+        def entry(name):
+            return {'image': name, 'verified': False, 'annotations': []}
+
+        # With no dataset file yet the first update is folded in right away,
+        # then the log is only compacted once it outgrows three times the file.
+        store.put(entry('0.jpg'))
+        self.assertFalse(os.path.isfile(store.wal_path))
+        store.put(entry('1.jpg'))
+        self.assertTrue(os.path.isfile(store.wal_path))
+        timer = store._timer
+        store.put(entry('2.jpg'))
+        store.put(entry('3.jpg'))
+        self.assertIs(timer, store._timer)
+        self.assertTrue(os.path.isfile(store.wal_path))
+        store.put(entry('4.jpg'))
+        self.assertFalse(os.path.isfile(store.wal_path))
+        self.assertIsNone(store._timer)
+
+        store.min_compact_bytes = 1 << 20
+        with store.batch():
+            for i in range(5, 100):
+                store.put(entry('%d.jpg' % i))
+            self.assertIsNone(store._timer)
+            self.assertTrue(os.path.isfile(store.wal_path))
+        self.assertFalse(os.path.isfile(store.wal_path))
+        with open(output_file, 'r') as file:
+            self.assertEqual(100, len(json.loads(file.read())))
+        store.close()
+
+    def test_c_store_failed_compaction_keeps_log(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from unittest import mock
+        from create_ml_io import CreateMLStore
+
+        output_file = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        store = CreateMLStore(output_file)
+        store.compact_delay = 3600
+
+        def entry(name):
+            return {'image': name, 'verified': False, 'annotations': []}
+
+        store.put(entry(u'\u4eba.jpg'))
+        # Sizes are counted in encoded bytes, not characters.
+        self.assertEqual(os.path.getsize(store.wal_path), store._wal_bytes)
+
+        with mock.patch.object(store, '_write', side_effect=OSError):
+            self.assertRaises(OSError, store.compact)
+        self.assertTrue(store._wal_entries)
+        store.put(entry('b.jpg'))
+        # Both the log left by the failed compaction and the newer one are replayed.
+        self.assertEqual([u'\u4eba.jpg', 'b.jpg'], list(CreateMLStore(output_file).entries))
+
+        with mock.patch.object(store, '_write', side_effect=OSError):
+            self.assertRaises(OSError, store.compact)
+        store.put(entry('c.jpg'))
+        store.close()
+        self.assertFalse(os.path.isfile(store.wal_path))
+        self.assertFalse(os.path.isfile(store.wal_path + '.compacting'))
+        with open(output_file, 'r', encoding='utf-8') as file:
+            data = json.loads(file.read())
+        self.assertEqual([u'\u4eba.jpg', 'b.jpg', 'c.jpg'], [item['image'] for item in data])
+
+    def test_d_index_cache(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from create_ml_io import CreateMLReader, load_create_ml_index
+
+        json_path = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        box = {'label': 'face', 'coordinates': {'x': 20, 'y': 20, 'width': 10, 'height': 10}}
+        with open(json_path, 'w') as file:
+            file.write(json.dumps([{'image': 'a.jpg', 'verified': True, 'annotations': [box]}]))
+
+        index = load_create_ml_index(json_path)
+        self.assertIs(index, load_create_ml_index(json_path))
+        reader = CreateMLReader(json_path, 'images/a.jpg')
+        self.assertTrue(reader.verified)
+        self.assertEqual(1, len(reader.get_shapes()))
+
+        with open(json_path, 'w') as file:
+            file.write(json.dumps([{'image': 'a.jpg', 'verified': False, 'annotations': [box, box]}]))
+        self.assertIsNot(index, load_create_ml_index(json_path))
+        self.assertEqual(2, len(CreateMLReader(json_path, 'images/a.jpg').get_shapes()))
+
+    def test_e_streaming(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from create_ml_io import CreateMLStore, EntrySpan, iter_create_ml_entries, read_create_ml_entry
+
+        json_path = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        box = {'label': u'\u81c9\u66f8', 'coordinates': {'x': 20, 'y': 20, 'width': 10, 'height': 10}}
+        data = [{'image': u'%d-\u81c9.jpg' % i, 'verified': False, 'annotations': [box] * (i % 3)}
+                for i in range(50)]
+        with open(json_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(data, ensure_ascii=False, indent=1))
+
+        entries = list(iter_create_ml_entries(json_path, chunk_size=64))
+        self.assertEqual(data, [entry for _, entry in entries])
+        for span, entry in entries:
+            self.assertEqual(entry, read_create_ml_entry(json_path, span))
+
+        class StreamingStore(CreateMLStore):
+            streaming_threshold = 0
+            compact_delay = 3600
+
+        store = StreamingStore(json_path)
+        self.assertTrue(all(isinstance(span, EntrySpan) for span in store.entries.values()))
+        self.assertEqual(data[7], store.get(data[7]['image']))
+        store.put({'image': data[7]['image'], 'verified': True, 'annotations': []})
+        store.compact()
+        with open(json_path, 'r', encoding='utf-8') as file:
+            compacted = json.loads(file.read())
+        data[7] = {'image': data[7]['image'], 'verified': True, 'annotations': []}
+        self.assertEqual(data, compacted)
+        self.assertEqual(data[8], store.get(data[8]['image']))
+
+        # Compacting below the threshold leaves streaming mode without
+        # keeping spans of the previous file.
+        store.streaming_threshold = os.path.getsize(json_path)
+        data[2] = {'image': data[2]['image'], 'verified': False, 'annotations': []}
+        store.put(data[2])
+        store.compact()
+        self.assertFalse(store.streaming)
+        self.assertEqual(data[8], store.get(data[8]['image']))
+        data[9] = {'image': data[9]['image'], 'verified': True, 'annotations': []}
+        store.put(data[9])
+        store.compact()
+        with open(json_path, 'r', encoding='utf-8') as file:
+            self.assertEqual(data, json.loads(file.read()))
+
+
+class TestYoloRW(unittest.TestCase):
+
+    def test_read_without_decoded_image(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        from yolo_io import YOLOWriter, YoloReader
+        from image_meta import read_image_size
+
+        image_path = os.path.join(dir_name, 'test.512.512.bmp')
+        self.assertEqual([512, 512, 3], read_image_size(image_path))
+
+        out_dir = tempfile.mkdtemp()
+        target_file = os.path.join(out_dir, 'test.txt')
+        writer = YOLOWriter('tests', 'test', (512, 512, 3), local_img_path=image_path)
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        writer.add_bnd_box(113, 40, 450, 403, 'face', 0)
+        writer.save(class_list=[], target_file=target_file)
+
+        from_path = YoloReader(target_file, image_path).get_shapes()
+        from_size = YoloReader(target_file, (512, 512, 3)).get_shapes()
+        self.assertEqual(from_path, from_size)
+        self.assertEqual('person', from_path[0][0])
+        self.assertEqual([(60, 40), (430, 40), (430, 504), (60, 504)], from_path[0][1])
+        self.assertEqual('face', from_path[1][0])
+
+    def test_label_cache(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import shutil
+        import tempfile
+        from yolo_io import YOLOWriter, build_label_cache, compact_label_cache, load_label_cache, label_cache_path
+
+        out_dir = tempfile.mkdtemp()
+        target_file = os.path.join(out_dir, 'test.txt')
+        writer = YOLOWriter('tests', 'test', (512, 512, 3))
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        writer.add_bnd_box(113, 40, 450, 403, 'face', 0)
+        writer.save(class_list=[], target_file=target_file)
+
+        classes, entries = load_label_cache(out_dir)
+        self.assertEqual(['person', 'face'], classes)
+        self.assertEqual((512, 512, 3), entries['test'].img_size)
+        self.assertEqual(2, len(entries['test'].boxes))
+        self.assertEqual(1, entries['test'].boxes[1][0])
+
+        writer = YOLOWriter('tests', 'test', (512, 512, 3))
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+        writer.save(class_list=classes, target_file=target_file)
+        size_before = os.path.getsize(label_cache_path(out_dir))
+        self.assertEqual(1, len(load_label_cache(out_dir)[1]['test'].boxes))
+        compact_label_cache(out_dir)
+        self.assertLess(os.path.getsize(label_cache_path(out_dir)), size_before)
+
+        os.remove(label_cache_path(out_dir))
+        shutil.copy(os.path.join(dir_name, 'test.512.512.bmp'), os.path.join(out_dir, 'test.bmp'))
+        rebuilt = build_label_cache(out_dir)
+        self.assertEqual(entries['test'].img_size, rebuilt['test'].img_size)
+        self.assertEqual(1, len(load_label_cache(out_dir)[1]['test'].boxes))
+
+    def test_label_cache_stays_current(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        import yolo_io
+        from yolo_io import YOLOWriter, load_label_cache, label_cache_path, label_file_mtimes
+
+        out_dir = tempfile.mkdtemp()
+        classes = []
+        for stem in ('a', 'b', 'c'):
+            writer = YOLOWriter('tests', stem, (512, 512, 3))
+            writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+            writer.save(class_list=classes, target_file=os.path.join(out_dir, stem + '.txt'))
+        self.assertEqual({'a', 'b', 'c'}, set(load_label_cache(out_dir)[1]))
+        mtimes = label_file_mtimes(out_dir)
+        self.assertEqual({'a', 'b', 'c'}, set(mtimes))
+
+        # Deleted and externally edited label files are not served.
+        os.remove(os.path.join(out_dir, 'b.txt'))
+        stat = os.stat(os.path.join(out_dir, 'c.txt'))
+        os.utime(os.path.join(out_dir, 'c.txt'), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual({'a'}, set(load_label_cache(out_dir)[1]))
+        # Records are checked against the listing they are given.
+        self.assertEqual({'a', 'b', 'c'}, set(load_label_cache(out_dir, mtimes=mtimes)[1]))
+
+        # Saving over and over compacts the cache once superseded records pile up.
+        limit = yolo_io.LABEL_CACHE_MAX_SUPERSEDED
+        yolo_io.LABEL_CACHE_MAX_SUPERSEDED = 4
+        try:
+            sizes = []
+            for _ in range(12):
+                writer = YOLOWriter('tests', 'a', (512, 512, 3))
+                writer.add_bnd_box(60, 40, 430, 504, 'person', 0)
+                writer.save(class_list=classes, target_file=os.path.join(out_dir, 'a.txt'))
+                sizes.append(os.path.getsize(label_cache_path(out_dir)))
+        finally:
+            yolo_io.LABEL_CACHE_MAX_SUPERSEDED = limit
+        self.assertLess(max(sizes), 8 * sizes[0])
+        self.assertLess(sizes[-1], max(sizes))
+        self.assertEqual({'a'}, set(load_label_cache(out_dir)[1]))
+
+
+class TestCocoRW(unittest.TestCase):
+
+    def test_store(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import tempfile
+        from coco_io import CocoReader, CocoStore, CocoWriter, is_coco_file, load_coco_index
+
+        output_file = os.path.join(tempfile.mkdtemp(), 'instances.json')
+        with open(output_file, 'w') as file:
+            file.write(json.dumps({'info': {'year': 2020}, 'images': [], 'annotations': [],
+                                   'categories': [{'id': 7, 'name': 'face', 'supercategory': 'none'}]}))
+        store = CocoStore.open(output_file)
+        store.compact_delay = 3600
+
+        face = {'label': 'face', 'points': ((245, 250), (350, 250), (350, 365), (245, 365))}
+        person = {'label': 'person', 'points': ((60, 40), (430, 504))}
+        CocoWriter('tests', 'a.jpg', (512, 512, 3), [face, person], output_file).write()
+        CocoWriter('tests', 'b.jpg', (512, 256, 3), [face], output_file).write()
+        CocoWriter('tests', 'a.jpg', (512, 512, 3), [person], output_file).write()
+
+        # Updates only live in the index and the log until compacted.
+        self.assertTrue(os.path.isfile(store.wal_path))
+        with open(output_file, 'r') as file:
+            self.assertEqual([], json.loads(file.read())['images'])
+        shapes = CocoReader(output_file, 'images/a.jpg').get_shapes()
+        self.assertEqual([('person', [(60, 40), (430, 40), (430, 504), (60, 504)], None, None, False)], shapes)
+        # A snapshot (e.g. after a crash) replays the log.
+        self.assertEqual(2, len(load_coco_index(output_file).images))
+
+        store.close()
+        self.assertFalse(os.path.isfile(store.wal_path))
+        self.assertTrue(is_coco_file(output_file))
+        with open(output_file, 'r') as file:
+            data = json.loads(file.read())
+        self.assertEqual({'year': 2020}, data['info'])
+        self.assertEqual(['a.jpg', 'b.jpg'], [image['file_name'] for image in data['images']])
+        self.assertEqual(['face', 'person'], [category['name'] for category in data['categories']])
+        self.assertEqual([1, 1], [len([a for a in data['annotations'] if a['image_id'] == image['id']])
+                                  for image in data['images']])
+        self.assertEqual(7, CocoStore(output_file).category_ids['face'])
+        self.assertEqual(1, len(CocoReader(output_file, 'b.jpg').get_shapes()))
+
+    def test_verified_image_without_boxes(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        from coco_io import CocoReader, CocoStore, CocoWriter
+
+        output_file = os.path.join(tempfile.mkdtemp(), 'instances.json')
+        writer = CocoWriter('tests', 'a.jpg', (512, 256, 3), [], output_file)
+        writer.verified = True
+        writer.write()
+        CocoStore.open(output_file).close()
+
+        reader = CocoReader(output_file, 'images/a.jpg')
+        self.assertTrue(reader.verified)
+        self.assertEqual([512, 256, 3], reader.get_annotation().img_size)
+        self.assertEqual([], reader.get_shapes())
+
+
+class TestProjectDatabase(unittest.TestCase):
+
+    def test_put_get(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        from annotation import Annotation
+        from project_db import ProjectDatabase, ProjectDatabaseReader, ProjectDatabaseWriter, project_db_path
+
+        root = tempfile.mkdtemp()
+        db_path = project_db_path(root)
+        face = {'label': 'face', 'points': ((245, 250), (350, 250), (350, 365), (245, 365)), 'difficult': True}
+        person = {'label': 'person', 'points': ((60, 40), (430, 504))}
+        writer = ProjectDatabaseWriter('images', 'a.jpg', (512, 512, 3), [face, person], db_path,
+                                       local_img_path=os.path.join(root, 'images', 'a.jpg'))
+        writer.verified = True
+        writer.write()
+        ProjectDatabaseWriter('images', 'b.jpg', (512, 256, 1), [person], db_path,
+                              local_img_path=os.path.join(root, 'images', 'b.jpg')).write()
+
+        reader = ProjectDatabaseReader(db_path, os.path.join(root, 'images', 'a.jpg'))
+        self.assertTrue(reader.verified)
+        self.assertEqual([('face', [(245, 250), (350, 250), (350, 365), (245, 365)], None, None, True),
+                          ('person', [(60, 40), (430, 40), (430, 504), (60, 504)], None, None, False)],
+                         reader.get_shapes())
+
+        database = ProjectDatabase.open(db_path)
+        self.assertEqual(['face', 'person'], database.classes())
+        self.assertEqual(2, len(database.images(label='person')))
+        self.assertEqual([os.path.join(root, 'images', 'a.jpg')], database.images(label='face'))
+        self.assertEqual([os.path.join(root, 'images', 'b.jpg')], database.images(verified=False))
+
+        # Saving again replaces the boxes of the image.
+        database.put(os.path.join(root, 'images', 'a.jpg'), (512, 512, 3), Annotation())
+        self.assertEqual(0, len(database.get(os.path.join(root, 'images', 'a.jpg'))))
+        self.assertNotIn(os.path.join(root, 'images', 'c.jpg'), database)
+
+        # A batch is one transaction: nothing is visible to other connections before it ends.
+        with database.batch():
+            for name in ('c.jpg', 'd.jpg'):
+                database.put(os.path.join(root, 'images', name), (512, 512, 3), Annotation())
+            self.assertIn(os.path.join(root, 'images', 'c.jpg'), database)
+            self.assertNotIn(os.path.join(root, 'images', 'c.jpg'), ProjectDatabase(db_path))
+        self.assertIn(os.path.join(root, 'images', 'd.jpg'), ProjectDatabase(db_path))
+        database.close()
+
+    def test_verified_image_without_boxes(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        from project_db import ProjectDatabaseReader, ProjectDatabaseWriter, project_db_path
+
+        root = tempfile.mkdtemp()
+        db_path = project_db_path(root)
+        image_path = os.path.join(root, 'images', 'a.jpg')
+        writer = ProjectDatabaseWriter('images', 'a.jpg', (512, 256, 1), [], db_path, local_img_path=image_path)
+        writer.verified = True
+        writer.write()
+
+        reader = ProjectDatabaseReader(db_path, image_path)
+        self.assertTrue(reader.verified)
+        self.assertEqual([512, 256, 1], reader.get_annotation().img_size)
+        self.assertEqual([], reader.get_shapes())
+
+
+class TestBinaryRW(unittest.TestCase):
+
+    def test_round_trip(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import tempfile
+        from binary_io import BinaryReader, BinaryWriter
+
+        target_file = os.path.join(tempfile.mkdtemp(), 'test.lbin')
+        writer = BinaryWriter('tests', 'test.512.512.bmp', (512, 512, 1))
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 1)
+        writer.add_bnd_box(113.5, 40, 450, 403, u'\u4e2d\u6587', 0)
+        writer.add_bnd_box(1, 2, 3, 4, 'person', 0)
+        writer.verified = True
+        writer.save(target_file)
+
+        reader = BinaryReader(target_file)
+        self.assertTrue(reader.verified)
+        annotation = reader.get_annotation()
+        self.assertEqual('test.512.512.bmp', annotation.filename)
+        self.assertEqual([512, 512, 1], annotation.img_size)
+        self.assertEqual(['person', u'\u4e2d\u6587'], annotation.labels)
+        self.assertEqual([('person', 60, 40, 430, 504, True), (u'\u4e2d\u6587', 113.5, 40, 450, 403, False),
+                          ('person', 1, 2, 3, 4, False)], list(annotation.boxes()))
+
+    def test_save_annotation_from_label_file(self):
+        import tempfile
+        from libs.annotation import Annotation
+        from libs.binary_io import BinaryReader
+        from libs.labelFile import LabelFile
+
+        # The GUI saves an Annotation built from the canvas, without filename or size.
+        annotation = Annotation()
+        annotation.add_box(60, 40, 430, 504, 'person', True)
+        image_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'test.512.512.bmp')
+        target_file = os.path.join(tempfile.mkdtemp(), 'test.lbin')
+        label_file = LabelFile()
+        label_file.verified = True
+        label_file.save_binary_format(target_file, annotation, image_path, None)
+
+        reader = BinaryReader(target_file)
+        self.assertTrue(reader.verified)
+        saved = reader.get_annotation()
+        self.assertEqual('test.512.512.bmp', saved.filename)
+        self.assertEqual(512, saved.img_size[0])
+        self.assertEqual([('person', 60, 40, 430, 504, True)], list(saved.boxes()))
+
+    def test_save_coco_reads_image_header(self):
+        import tempfile
+        from unittest import mock
+        from libs import labelFile
+        from libs.annotation import Annotation
+        from libs.coco_io import CocoReader, CocoStore
+        from libs.labelFile import LabelFile
+
+        annotation = Annotation()
+        annotation.add_box(60, 40, 430, 504, 'person', False)
+        image_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'test.512.512.bmp')
+        target_file = os.path.join(tempfile.mkdtemp(), 'dataset.json')
+        with mock.patch.object(labelFile.QImage, 'load', side_effect=AssertionError('decoded the image')):
+            LabelFile().save_coco_format(target_file, annotation, image_path, None, [])
+        self.assertEqual([512, 512], CocoReader(target_file, image_path).get_annotation().img_size[:2])
+        CocoStore.open(target_file).close()
+
+
+class TestAnnotation(unittest.TestCase):
+
+    def test_columns(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        from annotation import Annotation
+
+        annotation = Annotation.from_shapes([
+            dict(label='person', points=[(60, 40), (430, 40), (430, 504), (60, 504)], difficult=False),
+            dict(label='face', points=[(450, 403), (113, 40)], difficult=True),
+            dict(label='person', points=[(1, 2), (3, 4)]),
+        ])
+        self.assertEqual(['person', 'face'], annotation.labels)
+        self.assertEqual([0, 1, 0], list(annotation.label_ids))
+        self.assertEqual((113, 40, 450, 403), annotation.box(1))
+        self.assertEqual(('face', [(113, 40), (450, 40), (450, 403), (113, 403)], None, None, True),
+                         annotation.to_shapes()[1])
+        self.assertIs(annotation, Annotation.from_shapes(annotation))
+
 
 if __name__ == '__main__':
     unittest.main()
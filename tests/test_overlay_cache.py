@@ -0,0 +1,48 @@
+import unittest
+
+from PySide6.QtCore import QThreadPool
+from PySide6.QtGui import QColor, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.overlay_cache import OverlayCache
+
+
+class TestOverlayCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def wait(self):
+        QThreadPool.globalInstance().waitForDone()
+        self.app.processEvents()
+
+    def test_background_composite(self):
+        source = QPixmap(64, 32)
+        source.fill(QColor(100, 100, 100))
+        cache = OverlayCache()
+        ready = []
+        cache.ready.connect(lambda: ready.append(True))
+
+        self.assertIs(source, cache.pixmap(source, None))
+        bright = QColor(230, 230, 230)
+        # The unadjusted pixmap is shown until the composite is ready.
+        self.assertIs(source, cache.pixmap(source, bright))
+        self.wait()
+        self.assertEqual([True], ready)
+
+        adjusted = cache.pixmap(source, bright)
+        self.assertIsNot(source, adjusted)
+        self.assertEqual(source.size(), adjusted.size())
+        self.assertGreater(QColor(adjusted.toImage().pixel(0, 0)).red(), 100)
+        # Cached: the same pixmap comes back without another composite.
+        self.assertIs(adjusted, cache.pixmap(source, bright))
+
+        # While another value is computed, the last adjusted version stays.
+        self.assertIs(adjusted, cache.pixmap(source, QColor(20, 20, 20)))
+        self.wait()
+        self.assertEqual(2, len(ready))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from PySide6.QtCore import QPointF, QRect, QThreadPool
+from PySide6.QtGui import QColor, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.scaled_pixmap_cache import ScaledPixmapCache
+
+
+class TestScaledPixmapCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def wait(self, cache):
+        # Skip the quiet period instead of sleeping through it.
+        cache._timer.stop()
+        cache._start()
+        QThreadPool.globalInstance().waitForDone()
+        self.app.processEvents()
+
+    def test_rebuild_after_request(self):
+        source = QPixmap(400, 200)
+        source.fill(QColor(10, 200, 30))
+        cache = ScaledPixmapCache()
+        ready = []
+        cache.ready.connect(lambda: ready.append(True))
+        offset = QPointF(0, 0)
+        visible = QRect(0, 0, 100, 50)
+
+        self.assertIsNone(cache.pixmap(source, 0.5, offset, visible))
+        cache.request(source, 0.5, offset, QRect(0, 0, 200, 100))
+        self.assertTrue(cache._timer.isActive())
+        self.wait(cache)
+        self.assertEqual([True], ready)
+
+        scaled, area = cache.pixmap(source, 0.5, offset, visible)
+        self.assertEqual(QRect(0, 0, 200, 100), area)
+        self.assertEqual(area.size(), scaled.size())
+        self.assertEqual(QColor(10, 200, 30).rgb(), scaled.toImage().pixel(50, 50))
+
+        # Areas outside the cached one, or another zoom, miss.
+        self.assertIsNone(cache.pixmap(source, 0.5, offset, QRect(150, 50, 100, 100)))
+        self.assertIsNone(cache.pixmap(source, 0.25, offset, visible))
+
+        # A result for a zoom that is no longer wanted is dropped.
+        cache.request(source, 0.25, offset, QRect(0, 0, 100, 50))
+        cache._start()
+        cache.request(source, 0.75, offset, QRect(0, 0, 300, 150))
+        QThreadPool.globalInstance().waitForDone()
+        self.app.processEvents()
+        self.assertEqual(1, len(ready))
+        self.assertIsNone(cache.pixmap(source, 0.25, offset, visible))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.scene_canvas import SceneCanvas
+
+
+class TestSceneCanvas(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.canvas = SceneCanvas()
+        pixmap = QPixmap(600, 400)
+        pixmap.fill(QColor(90, 90, 90))
+        self.canvas.load_pixmap(pixmap)
+
+    def draw_box(self, x_min, y_min, x_max, y_max):
+        canvas = self.canvas
+        canvas.set_editing(False)
+        canvas.handle_drawing(QPointF(x_min, y_min))
+        canvas.line[1] = QPointF(x_max, y_max)
+        canvas.handle_drawing(QPointF(x_max, y_max))
+        canvas.set_editing(True)
+        return canvas.shapes[-1]
+
+    def test_draw_select_and_move(self):
+        canvas = self.canvas
+        new_shapes = []
+        canvas.newShape.connect(lambda: new_shapes.append(True))
+        shape = self.draw_box(100, 100, 200, 150)
+        self.assertEqual([True], new_shapes)
+        self.assertEqual([QPointF(100, 100), QPointF(200, 100), QPointF(200, 150), QPointF(100, 150)],
+                         shape.points)
+
+        self.assertIs(shape, canvas.select_shape_point(QPointF(150, 120)))
+        canvas.prev_point = QPointF(150, 120)
+        canvas.bounded_move_shape(shape, QPointF(450, 320))
+        self.assertEqual(QPointF(400, 300), shape[0])
+        # The scene index follows the move.
+        self.assertEqual([], canvas.shapes_at(QPointF(150, 120)))
+        self.assertEqual([shape], canvas.shapes_at(QPointF(450, 320)))
+
+        # Moves are bounded by the image.
+        canvas.bounded_move_shape(shape, QPointF(590, 390))
+        self.assertEqual(QPointF(500, 350), shape[0])
+
+        self.assertEqual([shape], canvas.delete_selected())
+        self.assertEqual([], canvas.shapes_at(QPointF(550, 370)))
+
+    def test_shapes_at_is_topmost_first(self):
+        bottom = self.draw_box(10, 10, 300, 300)
+        top = self.draw_box(50, 50, 100, 100)
+        self.assertEqual([top, bottom], self.canvas.shapes_at(QPointF(60, 60)))
+        self.canvas.load_shapes([top])
+        self.assertEqual([top], self.canvas.shapes_at(QPointF(60, 60)))
+
+    def test_follows_canvas_api(self):
+        canvas = self.canvas
+        canvas.set_scale(2.0)
+        self.assertEqual(2.0, canvas.transform().m11())
+        # QGraphicsView.scale(sx, sy) is not shadowed.
+        canvas.scale(0.5, 0.5)
+        self.assertEqual(1.0, canvas.transform().m11())
+
+        shape = self.draw_box(100, 100, 200, 150)
+        canvas.select_shape(shape)
+        canvas.move_one_pixel('Right')
+        self.assertEqual(QPointF(101, 100), shape[0])
+
+        canvas.set_hud(True)
+        canvas.resize(300, 200)
+        canvas.grab()
+        self.assertEqual(1, canvas.stats.paint.count)
+        canvas.set_hud(False)
+        self.assertIsNone(canvas.stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
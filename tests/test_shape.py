@@ -0,0 +1,119 @@
+import unittest
+
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QApplication
+
+from libs.shape import Shape
+
+
+def make_box(size):
+    shape = Shape(label='box', paint_label=True)
+    for x, y in ((0, 0), (size, 0), (size, size), (0, size)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+class TestShapeLevelOfDetail(unittest.TestCase):
+
+    def tearDown(self):
+        Shape.scale = 1.0
+
+    def test_thresholds_use_screen_size(self):
+        shape = make_box(40)
+        Shape.scale = 1.0
+        self.assertEqual(40, shape.screen_size())
+        self.assertFalse(shape.is_tiny())
+
+        Shape.scale = 0.05
+        self.assertEqual(2, shape.screen_size())
+        self.assertTrue(shape.is_tiny())
+
+    def test_small_boxes_keep_handles_at_full_size(self):
+        shape = make_box(10)
+        self.assertTrue(shape.show_vertices())
+        Shape.scale = 0.5
+        self.assertFalse(shape.show_vertices())
+
+    def test_full_detail_when_edited(self):
+        Shape.scale = 0.05
+        shape = make_box(40)
+        shape.selected = True
+        self.assertFalse(shape.is_tiny())
+        shape.selected = False
+        shape.highlight_vertex(0, Shape.MOVE_VERTEX)
+        self.assertFalse(shape.is_tiny())
+        shape.highlight_clear()
+        shape.set_open()
+        self.assertFalse(shape.is_tiny())
+
+
+class TestShapeLabels(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def tearDown(self):
+        Shape.label_font_size = 8
+
+    def test_fonts_and_texts_are_shared(self):
+        Shape.label_font_size = 11
+        font = Shape.label_font()
+        self.assertIs(font, Shape.label_font(11))
+        self.assertEqual((11, True), (font.pointSize(), font.bold()))
+
+        text, ascent = Shape.label_text('box')
+        self.assertIs(text, Shape.label_text('box')[0])
+        self.assertEqual('box', text.text())
+        self.assertGreater(ascent, 0)
+        Shape.label_font_size = 12
+        self.assertIsNot(text, Shape.label_text('box')[0])
+
+
+class TestShapePoints(unittest.TestCase):
+
+    def test_slotted(self):
+        shape = make_box(10)
+        self.assertFalse(hasattr(shape, '__dict__'))
+        with self.assertRaises(AttributeError):
+            shape.color = None
+
+    def test_points_round_trip(self):
+        shape = make_box(10)
+        self.assertEqual(4, len(shape))
+        self.assertEqual([0, 0, 10, 0, 10, 10, 0, 10], list(shape.coords()))
+        self.assertEqual(QPointF(0, 10), shape[-1])
+        self.assertEqual([QPointF(10, 0), QPointF(10, 10)], shape[1:3])
+        shape[2] = QPointF(12, 11)
+        self.assertEqual(QRectF(0, 0, 12, 11), shape.bounding_rect())
+        self.assertEqual(QPointF(0, 10), shape.pop_point())
+        self.assertEqual(3, len(shape.points))
+        with self.assertRaises(IndexError):
+            shape[3]
+
+    def test_move_and_copy(self):
+        shape = make_box(10)
+        shape.bounding_rect()
+        shape.move_by(QPointF(5, 1))
+        self.assertEqual(QRectF(5, 1, 10, 10), shape.bounding_rect())
+        self.assertEqual(QPointF(15, 11), shape[2])
+        self.assertEqual(2, shape.nearest_vertex(QPointF(14, 11), 2))
+
+        other = shape.copy()
+        other.move_vertex_by(0, QPointF(-5, -1))
+        self.assertEqual(QPointF(5, 1), shape[0])
+        self.assertEqual(QRectF(0, 0, 15, 11), other.bounding_rect())
+
+    def test_colors_follow_class_default(self):
+        shape = make_box(10)
+        self.assertIs(Shape.default_line_color, shape.line_color)
+        color = QColor(1, 2, 3)
+        shape.fill_color = color
+        self.assertEqual(color, shape.copy().fill_color)
+        self.assertIs(Shape.default_line_color, shape.copy().line_color)
+
+
+if __name__ == '__main__':
+    unittest.main()
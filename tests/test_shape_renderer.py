@@ -0,0 +1,53 @@
+import unittest
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor, QImage, QPainter
+from PySide6.QtWidgets import QApplication
+
+from libs.shape import Shape
+from libs.shape_renderer import ShapeRenderer
+
+
+def make_box(x_min, y_min, x_max, y_max):
+    shape = Shape(label='box', paint_label=True)
+    for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+def render(paint):
+    image = QImage(200, 160, QImage.Format_ARGB32_Premultiplied)
+    image.fill(QColor(90, 90, 90))
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    paint(painter)
+    painter.end()
+    return image
+
+
+class TestShapeRenderer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_matches_per_shape_paint(self):
+        shapes = [make_box(30.3, 40.6, 150.2, 120.9), make_box(10, 10, 60, 50)]
+        shapes[1].line_color = QColor(200, 30, 30, 128)
+
+        expected = render(lambda painter: [shape.paint(painter) for shape in shapes])
+        actual = render(lambda painter: ShapeRenderer().paint(painter, shapes))
+
+        different = 0
+        for y in range(expected.height()):
+            for x in range(expected.width()):
+                a, b = QColor(expected.pixel(x, y)), QColor(actual.pixel(x, y))
+                if max(abs(a.red() - b.red()), abs(a.green() - b.green()), abs(a.blue() - b.blue())) > 32:
+                    different += 1
+        # Only anti-aliased edges may differ, where handles overlap outlines.
+        self.assertLess(different, expected.width() * expected.height() // 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from unittest import mock
+
+from PySide6.QtCore import QPointF, QRectF
+
+from libs import shape_store
+from libs.shape import Shape
+from libs.shape_store import ShapeStore
+
+
+def make_box(x_min, y_min, x_max, y_max, label='box'):
+    shape = Shape(label=label)
+    for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+class TestShapeStore(unittest.TestCase):
+
+    def test_shapes_become_views(self):
+        store = ShapeStore()
+        shapes = [make_box(i * 10, 0, i * 10 + 5, 5) for i in range(20)]
+        store.extend(shapes[:1])
+        store.extend(shapes[1:])
+        self.assertEqual(shapes, list(store))
+        self.assertIn(shapes[7], store)
+        self.assertEqual(7, store.index(shapes[7]))
+
+        shape = shapes[7]
+        shape.label = 'car'
+        shape.difficult = True
+        shape.paint_label = True
+        self.assertEqual('car', store.label_of(7))
+        self.assertEqual({'car'}, store.painted_labels())
+        self.assertTrue(store.flag(7, store.DIFFICULT))
+
+        shape.move_by(QPointF(0, 100))
+        self.assertEqual([shape], store.query(72, 102))
+        shape[0] = QPointF(60, 90)
+        self.assertEqual([shape], store.query(62, 92))
+        shape.points = [QPointF(1000, 1000), QPointF(1010, 1010)]
+        self.assertEqual(2, len(shape))
+        self.assertEqual([shape], store.query_rect(990, 990, 1001, 1001))
+
+    def test_remove_detaches(self):
+        store = ShapeStore([make_box(0, 0, 10, 10), make_box(5, 5, 15, 15), make_box(20, 20, 30, 30)])
+        first, second, third = store
+        second.label = 'gone'
+        store.remove_shapes([second])
+        self.assertEqual([first, third], list(store))
+        self.assertNotIn(second, store)
+        self.assertEqual('gone', second.label)
+        self.assertEqual(QRectF(5, 5, 10, 10), second.bounding_rect())
+        second.move_by(QPointF(100, 100))
+        self.assertEqual([first], store.query(7, 7))
+        self.assertEqual([third], store.query(25, 25))
+
+        self.assertIs(third, store.pop())
+        self.assertEqual(QPointF(20, 30), third.pop_point())
+        self.assertEqual(3, len(third))
+        self.assertEqual([first], list(store))
+        self.assertEqual([], store.query(25, 25))
+
+    def test_visibility_and_order(self):
+        store = ShapeStore()
+        bottom, top = make_box(0, 0, 200, 200), make_box(50, 50, 100, 100)
+        store.extend([bottom, top])
+        self.assertEqual([top, bottom], store.query(60, 60))
+        self.assertEqual([bottom, top], store.query_rect(0, 0, 300, 300))
+        store.set_visible(top, False)
+        self.assertFalse(store.is_visible(top))
+        self.assertEqual([bottom], store.query(60, 60))
+        self.assertEqual([bottom], store.query_rect(0, 0, 300, 300))
+        self.assertTrue(store.is_visible(Shape()))
+
+    def test_load_boxes_snaps(self):
+        store = ShapeStore()
+        boxes = [('a', [(-5, 10), (50, 10), (50, 40), (-5, 40)], False),
+                 ('b', [(10, 10), (20, 10), (20, 20), (10, 20)], True)]
+        shapes, snapped = store.load_boxes(boxes, 100, 100)
+        self.assertTrue(snapped)
+        self.assertEqual(QPointF(0, 10), shapes[0][0])
+        self.assertEqual(['a', 'b'], [shape.label for shape in shapes])
+        self.assertEqual([False, True], [shape.difficult for shape in shapes])
+        self.assertTrue(shapes[1].is_closed())
+        self.assertEqual([shapes[0]], store.query(2, 20))
+        self.assertFalse(store.load_boxes(boxes[1:], 100, 100)[1])
+
+    def test_move_rows(self):
+        store = ShapeStore([make_box(0, 0, 10, 10), make_box(20, 20, 30, 30), make_box(40, 40, 50, 50)])
+        first, second, third = store
+        second.points = [QPointF(20, 20), QPointF(30, 30)]
+        rect = first.bounding_rect()
+        store.move_rows([0, 1], 100, 5)
+        self.assertEqual(QPointF(110, 15), first[2])
+        self.assertEqual([QPointF(120, 25), QPointF(130, 35)], second.points)
+        self.assertEqual(rect.translated(100, 5), first.bounding_rect())
+        self.assertEqual(QPointF(50, 50), third[2])
+        self.assertEqual([first], store.query(105, 10))
+        self.assertEqual([second], store.query(125, 30))
+        self.assertEqual([], store.query(5, 5))
+        self.assertEqual([first, second], store.query_rect(100, 0, 200, 100))
+
+    def test_small_query_rect_uses_index(self):
+        store = ShapeStore([make_box(i * 100, i * 100, i * 100 + 50, i * 100 + 50) for i in range(20)])
+        shapes = list(store)
+        with mock.patch.object(store, '_rows_in', side_effect=AssertionError('scanned the columns')):
+            self.assertEqual(shapes[1:3], store.query_rect(120, 120, 220, 220))
+        self.assertEqual(shapes[1:20], store.query_rect(120, 120, 5000, 5000))
+
+
+class TestShapeStoreWithoutNumpy(TestShapeStore):
+
+    def setUp(self):
+        patcher = mock.patch.object(shape_store, 'np', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+if __name__ == '__main__':
+    unittest.main()
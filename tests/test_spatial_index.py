@@ -0,0 +1,86 @@
+import unittest
+
+from PySide6.QtCore import QPointF
+
+from libs.shape import Shape
+from libs.spatial_index import SpatialIndex
+
+
+def make_box(x_min, y_min, x_max, y_max):
+    shape = Shape(label='box')
+    for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_query_order_and_margin(self):
+        index = SpatialIndex(cell_size=32)
+        bottom = make_box(0, 0, 200, 200)
+        top = make_box(50, 50, 100, 100)
+        far = make_box(500, 500, 510, 510)
+        index.rebuild([bottom, top, far])
+
+        self.assertEqual([top, bottom], index.query(60, 60))
+        self.assertEqual([bottom], index.query(150, 150))
+        self.assertEqual([], index.query(490, 490))
+        self.assertEqual([far], index.query(490, 490, margin=24))
+
+    def test_query_rect_keeps_paint_order(self):
+        index = SpatialIndex(cell_size=32)
+        bottom = make_box(0, 0, 200, 200)
+        top = make_box(50, 50, 100, 100)
+        far = make_box(500, 500, 510, 510)
+        index.rebuild([bottom, top, far])
+
+        self.assertEqual([bottom, top], index.query_rect(90, 90, 120, 120))
+        self.assertEqual([bottom], index.query_rect(150, 150, 160, 160))
+        # Rectangles covering more cells than are occupied take another path.
+        self.assertEqual([bottom, top, far], index.query_rect(-1000, -1000, 1000, 1000))
+        self.assertEqual([], index.query_rect(300, 300, 400, 400))
+
+    def test_incremental_updates(self):
+        index = SpatialIndex(cell_size=32)
+        a = make_box(0, 0, 10, 10)
+        b = make_box(0, 0, 10, 10)
+        index.insert(a)
+        index.insert(b)
+
+        a.move_by(QPointF(300, 300))
+        index.update(a)
+        self.assertEqual([b], index.query(5, 5))
+        self.assertEqual([a], index.query(305, 305))
+
+        # Moving keeps the paint order.
+        a.move_by(QPointF(-300, -300))
+        index.update(a)
+        self.assertEqual([b, a], index.query(5, 5))
+
+        index.remove(b)
+        self.assertEqual([a], index.query(5, 5))
+        self.assertEqual(1, len(index))
+
+        # Shapes that are not indexed, e.g. a move preview copy, are ignored.
+        index.update(make_box(0, 0, 1, 1))
+        self.assertEqual(1, len(index))
+
+    def test_extend_with_known_boxes(self):
+        index = SpatialIndex(cell_size=32)
+        bottom = make_box(0, 0, 200, 200)
+        top = make_box(50, 50, 60, 60)
+        empty = Shape()
+        index.insert(bottom)
+        index.extend([(top, (50, 50, 60, 60)), (empty, None)])
+
+        self.assertEqual(3, len(index))
+        self.assertEqual([top, bottom], index.query(55, 55))
+        top.move_by(QPointF(100, 100))
+        index.update(top)
+        self.assertEqual([bottom], index.query(55, 55))
+        self.assertEqual([top, bottom], index.query(155, 155))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from PySide6.QtWidgets import QApplication, QLabel, QWidget
+
+from libs.status_throttle import StatusThrottle
+
+
+class Window(QWidget):
+
+    def __init__(self):
+        super(Window, self).__init__()
+        self.label_coordinates = QLabel('', self)
+
+
+class TestStatusThrottle(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_coalesces_texts(self):
+        window = Window()
+        throttle = StatusThrottle(QWidget(window))
+        throttle.show('X: 1; Y: 1')
+        self.assertEqual('X: 1; Y: 1', window.label_coordinates.text())
+
+        # Within the interval only the latest text is kept, and shown when it ends.
+        throttle.show('X: 2; Y: 2')
+        throttle.show('X: 3; Y: 3')
+        self.assertEqual('X: 1; Y: 1', window.label_coordinates.text())
+        throttle._timer.stop()
+        throttle.flush()
+        self.assertEqual('X: 3; Y: 3', window.label_coordinates.text())
+
+    def test_tip_only_set_when_changed(self):
+        widget = QWidget()
+        throttle = StatusThrottle(widget)
+        throttle.set_tip('Image', status=False)
+        self.assertEqual(('Image', ''), (widget.toolTip(), widget.statusTip()))
+        throttle.set_tip('Click & drag to move point')
+        self.assertEqual('Click & drag to move point', widget.statusTip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long the canvas takes to load, paint, hit-test and drag among
+many boxes, for either canvas engine. Run it from the repository root (set
+QT_QPA_PLATFORM=offscreen on a headless box):
+
+    python tools/bench_canvas.py --shapes 5000 --engine both
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PySide6.QtCore import QPointF  # noqa: E402
+from PySide6.QtGui import QColor, QPixmap  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from libs.canvas import Canvas  # noqa: E402
+from libs.scene_canvas import SceneCanvas  # noqa: E402
+from libs.shape import Shape  # noqa: E402
+
+IMAGE_WIDTH, IMAGE_HEIGHT = 4000, 3000
+ENGINES = {'widget': Canvas, 'scene': SceneCanvas}
+
+
+def make_shapes(count, rng, paint_label=False):
+    shapes = []
+    for i in range(count):
+        x = rng.uniform(0, IMAGE_WIDTH - 80)
+        y = rng.uniform(0, IMAGE_HEIGHT - 80)
+        w, h = rng.uniform(10, 80), rng.uniform(10, 80)
+        shape = Shape(label='object%d' % (i % 20), paint_label=paint_label)
+        for px, py in ((x, y), (x + w, y), (x + w, y + h), (x, y + h)):
+            shape.add_point(QPointF(px, py))
+        shape.close()
+        shapes.append(shape)
+    return shapes
+
+
+def timed(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(count, repeat, paint_label=False, seed=0, engine='widget'):
+    rng = random.Random(seed)
+    canvas = ENGINES[engine]()
+    pixmap = QPixmap(IMAGE_WIDTH, IMAGE_HEIGHT)
+    pixmap.fill(QColor(90, 90, 90))
+    canvas.load_pixmap(pixmap)
+    shapes = make_shapes(count, rng, paint_label)
+    # Loading a label file: raw boxes in, snapped shapes out.
+    boxes = [(shape.label, [(p.x(), p.y()) for p in shape.points], False) for shape in shapes]
+    load = timed(lambda: canvas.load_boxes(boxes), max(1, repeat // 5))
+    canvas.load_shapes(shapes)
+    canvas.set_scale(0.25)
+    canvas.resize(IMAGE_WIDTH // 4, IMAGE_HEIGHT // 4)
+    canvas.update()
+
+    results = [('load', load), ('paint', timed(canvas.grab, repeat))]
+    canvas.shapes[len(canvas.shapes) // 2].selected = True
+    results.append(('paint with selection', timed(canvas.grab, repeat)))
+    canvas.shapes[len(canvas.shapes) // 2].selected = False
+    points = [QPointF(rng.uniform(0, IMAGE_WIDTH), rng.uniform(0, IMAGE_HEIGHT)) for _ in range(100)]
+    results.append(('hit-test', timed(lambda: [s.contains_point(p) for p in points
+                                               for s in canvas.shapes_at(p, canvas.epsilon)], repeat) / 100))
+
+    # One drag frame: move a box by a pixel and let the canvas repaint.
+    canvas.show()
+    QApplication.processEvents()
+    shape = canvas.shapes[len(canvas.shapes) // 2]
+    start = shape.bounding_rect().center()
+    canvas.select_shape_point(start)
+    canvas.prev_point = start
+    steps = iter(range(1, 1000000))
+
+    def drag():
+        step = next(steps) % 40
+        canvas.bounded_move_shape(canvas.selected_shape, start + QPointF(step, step))
+        QApplication.processEvents()
+    results.append(('drag frame', timed(drag, repeat)))
+    canvas.hide()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark canvas painting.')
+    parser.add_argument('--shapes', type=int, default=5000, help='number of boxes')
+    parser.add_argument('--repeat', type=int, default=20, help='timed repetitions')
+    parser.add_argument('--labels', action='store_true', help='paint the label text of every box')
+    parser.add_argument('--engine', choices=sorted(ENGINES) + ['both'], default='widget',
+                        help='canvas engine to measure')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    engines = sorted(ENGINES) if args.engine == 'both' else [args.engine]
+    print('%d shapes' % args.shapes)
+    for engine in engines:
+        for name, ms in run(args.shapes, args.repeat, args.labels, engine=engine):
+            print('%-8s %-24s %8.3f ms' % (engine, name, ms))
+    del app
+
+
+if __name__ == '__main__':
+    main()
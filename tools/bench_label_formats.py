@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure label file write and parse throughput of the Pascal VOC, YOLO and
+binary formats. Run it from the repository root:
+
+    python tools/bench_label_formats.py --files 2000 --boxes 20
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libs.binary_io import BIN_EXT, BinaryReader, BinaryWriter  # noqa: E402
+from libs.pascal_voc_io import XML_EXT, PascalVocReader, PascalVocWriter  # noqa: E402
+from libs.yolo_io import TXT_EXT, YoloReader, YOLOWriter  # noqa: E402
+
+IMG_SIZE = (720, 1280, 3)
+LABELS = ['person', 'car', 'bicycle', 'dog', 'cat', 'traffic light']
+
+
+def make_boxes(count, rng):
+    boxes = []
+    for _ in range(count):
+        x_min = rng.randint(1, IMG_SIZE[1] - 100)
+        y_min = rng.randint(1, IMG_SIZE[0] - 100)
+        boxes.append((x_min, y_min, x_min + rng.randint(10, 99), y_min + rng.randint(10, 99),
+                      rng.choice(LABELS), rng.random() < 0.1))
+    return boxes
+
+
+def write_voc(path, name, boxes):
+    writer = PascalVocWriter('images', name, IMG_SIZE)
+    for x_min, y_min, x_max, y_max, label, difficult in boxes:
+        writer.add_bnd_box(x_min, y_min, x_max, y_max, label, difficult)
+    writer.save(path + XML_EXT)
+
+
+def write_yolo(path, name, boxes):
+    writer = YOLOWriter('images', name, IMG_SIZE)
+    for x_min, y_min, x_max, y_max, label, difficult in boxes:
+        writer.add_bnd_box(x_min, y_min, x_max, y_max, label, difficult)
+    writer.save(list(LABELS), path + TXT_EXT, update_cache=False)
+
+
+def write_binary(path, name, boxes):
+    writer = BinaryWriter('images', name, IMG_SIZE)
+    for x_min, y_min, x_max, y_max, label, difficult in boxes:
+        writer.add_bnd_box(x_min, y_min, x_max, y_max, label, difficult)
+    writer.save(path + BIN_EXT)
+
+
+FORMATS = [
+    ('PascalVOC', write_voc, lambda path: PascalVocReader(path + XML_EXT).get_annotation()),
+    ('YOLO', write_yolo, lambda path: YoloReader(path + TXT_EXT, list(IMG_SIZE)).get_annotation()),
+    ('Binary', write_binary, lambda path: BinaryReader(path + BIN_EXT).get_annotation()),
+]
+
+
+def run(files, boxes_per_file, seed=0):
+    rng = random.Random(seed)
+    dataset = [('img%06d.jpg' % i, make_boxes(boxes_per_file, rng)) for i in range(files)]
+    results = []
+    for name, write, read in FORMATS:
+        out_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(out_dir, os.path.splitext(image)[0]) for image, _ in dataset]
+            start = time.perf_counter()
+            for path, (image, boxes) in zip(paths, dataset):
+                write(path, image, boxes)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for path in paths:
+                read(path)
+            read_time = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+            results.append((name, files / write_time, files / read_time, size / files))
+        finally:
+            shutil.rmtree(out_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark label file formats.')
+    parser.add_argument('--files', type=int, default=2000, help='number of label files')
+    parser.add_argument('--boxes', type=int, default=20, help='boxes per file')
+    args = parser.parse_args()
+
+    print('%d files, %d boxes each' % (args.files, args.boxes))
+    print('%-10s %14s %14s %12s' % ('format', 'write files/s', 'parse files/s', 'bytes/file'))
+    for name, write_rate, read_rate, size in run(args.files, args.boxes):
+        print('%-10s %14.0f %14.0f %12.0f' % (name, write_rate, read_rate, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the memory taken by many boxes, and how long it takes to create,
+copy and move them. Run it from the repository root:
+
+    python tools/bench_shape_memory.py --shapes 100000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PySide6.QtCore import QPointF  # noqa: E402
+
+from libs.shape import Shape  # noqa: E402
+
+
+def rss_bytes():
+    """Resident set size, which also counts what Qt allocates in C++."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def make_shapes(count):
+    shapes = []
+    for i in range(count):
+        x, y = float(i % 1000) * 4, float(i // 1000) * 4
+        shape = Shape(label='object%d' % (i % 20))
+        for px, py in ((x, y), (x + 3, y), (x + 3, y + 3), (x, y + 3)):
+            shape.add_point(QPointF(px, py))
+        shape.close()
+        shapes.append(shape)
+    return shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark shape memory.')
+    parser.add_argument('--shapes', type=int, default=100000, help='number of boxes')
+    args = parser.parse_args()
+
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    shapes = make_shapes(args.shapes)
+    create_time = time.perf_counter() - start
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    gc.collect()
+    rss_used = rss_bytes() - rss_before
+
+    start = time.perf_counter()
+    copies = [shape.copy() for shape in shapes]
+    copy_time = time.perf_counter() - start
+    del copies
+
+    offset = QPointF(1.0, 1.0)
+    start = time.perf_counter()
+    for shape in shapes:
+        shape.move_by(offset)
+    move_time = time.perf_counter() - start
+
+    count = len(shapes)
+    print('%d shapes' % count)
+    print('  memory (RSS)      %8.1f MB  (%d bytes per shape)' % (rss_used / 1e6, rss_used // count))
+    print('  Python objects    %8.1f MB  (%d bytes per shape)' % (python_bytes / 1e6, python_bytes // count))
+    print('  create            %8.1f ms' % (create_time * 1000))
+    print('  copy              %8.1f ms' % (copy_time * 1000))
+    print('  move              %8.1f ms' % (move_time * 1000))
+
+
+if __name__ == '__main__':
+    main()